@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# benchmarks/bench_embedding_backends.py
+"""
+Parity and docs/sec of the ONNX embedding backend against PyTorch.
+
+    internal-export-onnx                       # once
+    python benchmarks/bench_embedding_backends.py --docs 512 --threads 4
+
+Encodes the same texts with SentenceTransformer (torch), the float32 ONNX
+export and the int8-quantized export, then reports per-text cosine
+similarity to the torch vectors (min / p1 / mean), top-10 neighbour
+overlap and docs/sec. Exits non-zero when a backend's minimum cosine falls
+below its threshold (--min-cosine-fp32 / --min-cosine-int8), so it doubles
+as the parity check after re-exporting or upgrading onnxruntime.
+
+Texts are windows of real raw text from the raw-text store when there is
+any (--from-raw), otherwise generated sentences of mixed length.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from pr_agent.settings import settings
+
+WORDS = ("contract renewal vendor invoice quarterly roadmap security review onboarding "
+         "budget forecast hiring plan incident postmortem customer escalation pricing "
+         "migration database latency release notes compliance audit policy travel").split()
+
+
+def sample_texts(n: int, from_raw: bool, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    if from_raw:
+        from pr_agent.core.chunker import chunk_text
+        from pr_agent.core.raw_store import get_raw_store
+
+        store = get_raw_store()
+        for doc_id in sorted(store.get_all_ids()):
+            texts.extend(c.text for c in chunk_text(store.read_text(doc_id)))
+            if len(texts) >= n:
+                break
+    while len(texts) < n:
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 200))))
+    return texts[:n]
+
+
+def timed_encode(model, texts: list[str], batch_size: int) -> tuple[np.ndarray, float]:
+    model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm-up
+    t0 = time.perf_counter()
+    vecs = model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    return np.asarray(vecs, dtype=np.float32), time.perf_counter() - t0
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    a = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    b = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cos = (a * b).sum(axis=1)
+    # do both backends rank the corpus the same way?
+    k = min(10, len(a) - 1)
+    top_a = np.argsort(-(a @ a.T), axis=1)[:, 1:k + 1]
+    top_b = np.argsort(-(b @ b.T), axis=1)[:, 1:k + 1]
+    overlap = np.mean([len(set(x) & set(y)) / k for x, y in zip(top_a, top_b)]) if k else 1.0
+    return {"cos_min": round(float(cos.min()), 5), "cos_p1": round(float(np.percentile(cos, 1)), 5),
+            "cos_mean": round(float(cos.mean()), 5), "top10_overlap": round(float(overlap), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=settings.ONNX_THREADS)
+    parser.add_argument("--from-raw", action="store_true", help="Use chunks of stored raw text")
+    parser.add_argument("--min-cosine-fp32", type=float, default=0.9999)
+    parser.add_argument("--min-cosine-int8", type=float, default=0.98)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    from pr_agent.core.onnx_embedder import OnnxEncoder
+
+    texts = sample_texts(args.docs, args.from_raw)
+    torch_model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu")
+    reference, secs = timed_encode(torch_model, texts, args.batch_size)
+    report = [{"backend": "torch", "docs_per_sec": round(len(texts) / secs, 1)}]
+
+    failures = []
+    for name, quantized, threshold in (("onnx-fp32", False, args.min_cosine_fp32),
+                                       ("onnx-int8", True, args.min_cosine_int8)):
+        model = OnnxEncoder(settings.ONNX_MODEL_DIR, quantized=quantized, threads=args.threads)
+        vecs, secs = timed_encode(model, texts, args.batch_size)
+        row = {"backend": name, "docs_per_sec": round(len(texts) / secs, 1), **parity(reference, vecs)}
+        report.append(row)
+        if row["cos_min"] < threshold:
+            failures.append(f"{name}: min cosine {row['cos_min']} < {threshold}")
+
+    print(json.dumps({"docs": len(texts), "batch_size": args.batch_size, "threads": args.threads,
+                      "results": report}, indent=2))
+    if failures:
+        print("\nPARITY FAIL:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
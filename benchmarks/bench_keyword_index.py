@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# benchmarks/bench_keyword_index.py
+"""
+Build time, size and query latency of the BM25 keyword index.
+
+    python benchmarks/bench_keyword_index.py --docs 100000 --queries 500
+
+Documents are synthetic: words drawn from a Zipf-distributed vocabulary
+(so common terms have posting lists covering most of the corpus, as in
+real text) plus a unique ticket id per document, and are written to a
+temporary raw-text store (ticket ids are phrases, confirmed against the
+text). The index is built in KEYWORD_DOC_BATCH transactions, then queried
+with 1–3 word queries and ticket-id lookups. Also times an incremental
+update of 1% of the corpus.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench_vector_index import percentiles
+from pr_agent.core.keyword_index import KeywordIndex
+from pr_agent.core.raw_store import get_raw_store
+from pr_agent.settings import settings
+
+
+def synthetic_corpus(docs: int, vocab: int, words: int, seed: int = 0) -> dict[str, str]:
+    rng = np.random.default_rng(seed)
+    terms = np.array([f"w{i}" for i in range(vocab)])
+    corpus = {}
+    for i in range(docs):
+        n = int(rng.integers(words // 4, words * 2))
+        ids = np.minimum(rng.zipf(1.1, n), vocab) - 1
+        corpus[f"DOC_{i:07d}"] = f"ticket OPS-{i} " + " ".join(terms[ids])
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--words", type=int, default=300, help="Mean words per document")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.docs, args.vocab, args.words)
+    ids = list(corpus)
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.RAW_DIR = Path(tmp) / "raw"
+        raw_store = get_raw_store()
+        for doc_id, text in corpus.items():
+            raw_store.write_text(doc_id, text)
+
+        path = os.path.join(tmp, "bm25.sqlite")
+        index = KeywordIndex(path)
+        t0 = time.perf_counter()
+        for start in range(0, len(ids), settings.KEYWORD_DOC_BATCH):
+            index.update({d: corpus[d] for d in ids[start:start + settings.KEYWORD_DOC_BATCH]})
+        build_secs = time.perf_counter() - t0
+        size_mb = os.path.getsize(path) / 2**20
+        raw_mb = sum(len(t) for t in corpus.values()) / 2**20
+
+        changed = {d: corpus[d] + " revised w7 w7" for d in rng.choice(ids, len(ids) // 100, replace=False)}
+        for doc_id, text in changed.items():
+            raw_store.write_text(doc_id, text)
+        t0 = time.perf_counter()
+        index.update(changed)
+        update_secs = time.perf_counter() - t0
+
+        report = {"docs": args.docs, "raw_mb": round(raw_mb, 1), "index_mb": round(size_mb, 1),
+                  "build_s": round(build_secs, 1), "docs_per_s": round(args.docs / build_secs),
+                  "update_1pct_s": round(update_secs, 2), "queries": {}}
+        index.search("w1", args.k)   # load the document table
+        for name, make in (
+            ("1-term", lambda: f"w{rng.zipf(1.3)}"),
+            ("3-term", lambda: " ".join(f"w{rng.zipf(1.3)}" for _ in range(3))),
+            ("common", lambda: "w0 w1 w2"),
+            ("ticket-id", lambda: f"OPS-{rng.integers(args.docs)}"),
+        ):
+            samples, found = [], 0
+            for _ in range(args.queries):
+                q = make()
+                t0 = time.perf_counter()
+                hits = index.search(q, args.k)
+                samples.append(time.perf_counter() - t0)
+                found += bool(hits)
+            report["queries"][name] = {**percentiles(samples), "answered": found}
+            print(json.dumps({name: report["queries"][name]}))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# benchmarks/bench_pipeline.py
+"""
+End-to-end throughput of discovery and processing against local fakes of
+Drive, Notion, Gemini and Pinecone (see fakes.py).
+
+    python benchmarks/bench_pipeline.py --docs 1k 10k 100k
+    python benchmarks/bench_pipeline.py --docs 1k --latency gemini=0.4 --rate gemini=5
+    python benchmarks/bench_pipeline.py --docs 1k --save-baseline
+
+For each corpus size, in a fresh process (so peak RSS is per size):
+  1. internal-discover over a synthetic mixed-format Drive folder tree
+     (discovery time, Drive calls and bytes);
+  2. internal-process on an evenly spread sample of --process documents
+     (docs/sec, API calls per document for every service, throttling;
+     only Processed and Duplicate outcomes count, and the run exits 1 if
+     any sampled document fails);
+  3. the Notion connector over a --notion-pages page tree, twice: the
+     re-crawl of the unchanged tree shows what the HTTP cache saves.
+Processing samples the corpus to keep Gemini-bound runs short; Drive
+metadata goes out in batch requests (calls inside a batch are listed
+under "batched" and are not round trips).
+
+Results are compared with benchmarks/baselines/pipeline.json (recorded
+with --save-baseline on the reference machine) and the run exits 1 if
+any metric is worse by more than --tolerance. Wall-clock numbers are only
+comparable on the same machine; call counts are comparable anywhere.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from fakes import DEFAULT_LATENCY, Corpus, Fakes
+
+BASELINE = Path(__file__).parent / "baselines" / "pipeline.json"
+DIRS = ("METADATA_DIR", "RAW_DIR", "EMBEDDINGS_DIR", "KEYWORD_INDEX_DIR", "DEDUP_DIR", "CHECKPOINT_DIR",
+        "LEASE_DIR", "METRICS_DIR", "PROFILE_DIR", "DOWNLOAD_DIR", "OCR_CACHE_DIR",
+        "HTTP_CACHE_DIR")
+
+
+def count(spec: str) -> int:
+    """1000, 10k, 1m → int."""
+    spec = spec.lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(spec[-1], 1)
+    return int(float(spec.rstrip("km")) * scale)
+
+
+def overrides(specs: list[str], cast=float) -> dict:
+    """['gemini=0.4', …] → {'gemini': 0.4}, for the four fake APIs."""
+    out = {}
+    for spec in specs:
+        name, _, value = spec.partition("=")
+        if name not in DEFAULT_LATENCY:
+            raise SystemExit(f"Unknown API {name!r} (expected one of {', '.join(DEFAULT_LATENCY)})")
+        out[name] = cast(value)
+    return out
+
+
+def peak_rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / 1024 if sys.platform != "darwin" else kb / 2**20, 1)
+
+
+def run(docs: int, args: argparse.Namespace) -> dict:
+    from pr_agent.settings import settings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in DIRS:
+            setattr(settings, name, Path(tmp) / name.lower())
+        fakes = Fakes(Corpus(docs, seed=args.seed), overrides(args.latency), overrides(args.rate),
+                      notion_pages=args.notion_pages, gemini_error_rate=args.gemini_error_rate, seed=args.seed)
+        fakes.install()
+
+        from pr_agent.connectors.notion_connector import list_new_items as list_notion_items
+        from pr_agent.core.metadata_manager import DirectoryMetadataStore
+        from pr_agent.scripts.discover_sources import discover_sources
+        from pr_agent.scripts.process_pending import process_pending
+
+        quiet = contextlib.redirect_stdout(open(os.devnull, "w"))
+
+        # 1) discovery
+        t0 = time.perf_counter()
+        with quiet:
+            discover_sources()
+        discover_s = time.perf_counter() - t0
+        discover_calls = fakes.snapshot()
+
+        # 2) processing, on an evenly spread sample
+        store = DirectoryMetadataStore(settings.METADATA_DIR)
+        ids = sorted(store.get_all_ids())
+        sample = set(ids[::max(len(ids) // max(args.process, 1), 1)][:args.process])
+        for doc_id in ids:
+            if doc_id not in sample:
+                meta = store.read(doc_id)
+                meta["Status"] = "Not Sampled"
+                store.upsert(doc_id, meta)
+        fakes.reset()
+        t0 = time.perf_counter()
+        with quiet:
+            process_pending()
+        process_s = time.perf_counter() - t0
+        process_calls = fakes.snapshot()
+        outcomes = Counter()
+        for doc_id in sample:
+            meta = store.read(doc_id)
+            outcomes[meta.get("status") or meta.get("Status")] += 1
+        # failed or still-pending documents are cheap: counting them would
+        # inflate docs/sec and dilute calls/doc
+        finished = sum(c for status, c in outcomes.items()
+                       if status == "Processed" or str(status).startswith("Duplicate"))
+
+        # 3) Notion discovery
+        notion = {}
+        for crawl in ("crawl", "recrawl")[:2 if args.notion_pages else 0]:
+            fakes.reset()
+            t0 = time.perf_counter()
+            items = list_notion_items(set())
+            calls = fakes.snapshot()["notion"]
+            notion.update({"pages": args.notion_pages, "items": len(items),
+                           f"{crawl}_s": round(time.perf_counter() - t0, 3),
+                           f"{crawl}_calls_per_page": round(calls["calls"] / args.notion_pages, 2),
+                           f"{crawl}_kb": round(calls["bytes"] / 1024, 1)})
+
+    n = max(finished, 1)
+    return {
+        "docs": docs,
+        "discovered": len(ids),
+        "discover_s": round(discover_s, 3),
+        "discover_calls": {api: s["calls"] for api, s in discover_calls.items() if s["calls"]},
+        "discover_batched": discover_calls["drive"]["batched"],
+        "discover_mb": round(discover_calls["drive"]["bytes"] / 2**20, 2),
+        "processed": len(sample),
+        "finished": finished,
+        "outcomes": dict(outcomes),
+        "process_s": round(process_s, 3),
+        "docs_per_s": round(finished / process_s, 3) if process_s else None,
+        "calls_per_doc": {api: round(s["calls"] / n, 2) for api, s in process_calls.items()},
+        "throttled_s": {api: s["throttled_s"] for api, s in process_calls.items() if s["throttled"]},
+        "notion": notion,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# metric → True if higher is better
+CHECKS = {"discover_s": False, "docs_per_s": True, "peak_rss_mb": False}
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print result against baseline; returns the metrics that regressed."""
+    rows = [(key, baseline.get(key), result.get(key), higher) for key, higher in CHECKS.items()]
+    rows += [(f"calls_per_doc.{api}", baseline["calls_per_doc"].get(api), value, False)
+             for api, value in result["calls_per_doc"].items()]
+    regressed = []
+    for key, old, new, higher in rows:
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"  {result['docs']:>7} docs  {key:<22} {old:>10} → {new:<10} {change:+.1%}{flag}")
+        if flag:
+            regressed.append(f"{result['docs']}:{key}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=count, nargs="+", default=[1_000], help="Corpus sizes, e.g. 1k 10k 100k")
+    parser.add_argument("--process", type=int, default=50, help="Documents to process per corpus")
+    parser.add_argument("--notion-pages", type=int, default=30, help="Notion pages to crawl (0 skips Notion)")
+    parser.add_argument("--latency", nargs="*", default=[], metavar="API=SECONDS",
+                        help=f"Override fake latencies (default {DEFAULT_LATENCY})")
+    parser.add_argument("--rate", nargs="*", default=[], metavar="API=PER_SECOND",
+                        help="Override fake rate limits (0 = unlimited)")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="Share of Gemini calls failing with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Record these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+    overrides(args.latency), overrides(args.rate)     # fail fast on typos
+
+    results = []
+    # a fresh process per size: peak RSS is a per-process high-water mark
+    ctx = multiprocessing.get_context("spawn")
+    for docs in args.docs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            results.append(pool.submit(run, docs, args).result())
+        print(json.dumps(results[-1], indent=2))
+    unfinished = [f"{r['docs']}:{r['processed'] - r['finished']}" for r in results
+                  if r["finished"] < r["processed"]]
+    if unfinished:
+        # a run where documents failed is not a valid measurement
+        print(f"Sampled documents not processed (docs:count): {', '.join(unfinished)}")
+        sys.exit(1)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baseline.update({str(r["docs"]): r for r in results})
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline for {', '.join(str(r['docs']) for r in results)} docs to {args.baseline}")
+        return
+
+    regressed = []
+    print(f"Against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for result in results:
+        if str(result["docs"]) not in baseline:
+            print(f"  {result['docs']:>7} docs  no baseline (record one with --save-baseline)")
+            continue
+        regressed += compare(result, baseline[str(result["docs"])], args.tolerance)
+    if regressed:
+        print(f"Regressions: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
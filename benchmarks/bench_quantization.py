@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# benchmarks/bench_quantization.py
+"""
+Memory footprint, search throughput and recall loss of float16 / int8
+embedding stores against float32.
+
+    python benchmarks/bench_quantization.py --rows 200000 --dim 384 --queries 200
+
+For every store layout the same synthetic corpus is written to a temporary
+EmbeddingStore and searched through LocalBackend (exact scan, so the only
+difference is the stored dtype). Recall@k is measured against float32
+exact search, with and without full-precision rescoring of
+SEARCH_RESCORE_FACTOR × k candidates.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from bench_vector_index import percentiles, synthetic_vectors
+from pr_agent.core.embedding_store import EmbeddingStore
+from pr_agent.core.vector_backends import LocalBackend
+from pr_agent.settings import settings
+
+LAYOUTS = [
+    ("float32", False),
+    ("float16", False),
+    ("float16", True),
+    ("int8", False),
+    ("int8", True),
+]
+
+
+def store_bytes(store: EmbeddingStore) -> dict:
+    """Bytes the search scan touches (resident) vs. bytes on disk."""
+    files = [store.vectors_path, store.scales_path, store.full_path]
+    disk = sum(p.stat().st_size for p in files if p.exists())
+    scanned = store.vectors_path.stat().st_size
+    if store.scales_path.exists():
+        scanned += store.scales_path.stat().st_size
+    return {"scan_mb": round(scanned / 2**20, 1), "disk_mb": round(disk / 2**20, 1)}
+
+
+def recall(found: list[list[str]], truth: list[list[str]]) -> float:
+    return float(np.mean([len(set(f) & set(t)) / max(len(t), 1) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=32, help="Queries per search() call")
+    args = parser.parse_args()
+
+    settings.LOCAL_INDEX_TYPE = "exact"
+    data = synthetic_vectors(args.rows + args.queries, args.dim, args.clusters)
+    corpus, queries = data[:args.rows], data[args.rows:]
+    ids = [f"DOC_{i:07d}" for i in range(args.rows)]
+
+    report, truth = [], None
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype, keep_full in LAYOUTS:
+            root = f"{tmp}/{dtype}-{int(keep_full)}"
+            store = EmbeddingStore(root, dtype=dtype, keep_full=keep_full)
+            t0 = time.perf_counter()
+            for start in range(0, args.rows, 50_000):
+                store.put_many(zip(ids[start:start + 50_000], corpus[start:start + 50_000]))
+            write_secs = time.perf_counter() - t0
+            backend = LocalBackend(store, f"{root}/local-index")
+
+            backend.search(queries[:1], args.k)  # warm the page cache
+            samples, found, total = [], [], 0.0
+            for start in range(0, args.queries, args.batch):
+                t0 = time.perf_counter()
+                hits = backend.search(queries[start:start + args.batch], args.k)
+                secs = time.perf_counter() - t0
+                total += secs
+                samples.append(secs / len(hits))    # amortised per-query latency
+                found.extend([doc_id for doc_id, _ in h] for h in hits)
+            if truth is None:
+                truth = found
+
+            row = {"dtype": dtype, "rescore": keep_full, **store_bytes(store),
+                   "write_s": round(write_secs, 2),
+                   "qps": round(args.queries / total, 1),
+                   **percentiles(samples),
+                   f"recall@{args.k}": round(recall(found, truth), 4)}
+            report.append(row)
+            print(json.dumps(row))
+
+    print(json.dumps({"rows": args.rows, "dim": args.dim, "rescore_factor": settings.SEARCH_RESCORE_FACTOR,
+                      "results": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
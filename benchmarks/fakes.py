@@ -0,0 +1,539 @@
+# benchmarks/fakes.py
+"""
+Local fakes of the four remote APIs the pipeline calls, for benchmarks:
+
+    Drive     FakeDrive           what drive_client.get_drive_service() returns
+    Notion    FakeNotion          the session notion_client sends requests on
+    Gemini    FakeAgent           the pydantic_ai agent summarizer.call_gemini() runs
+    Pinecone  FakePineconeIndex   the index behind PineconeBackend
+
+plus FakeEncoder for the embedding model. They sit exactly where the real
+clients are created, so everything above them (connectors, retries,
+pagination, chunked downloads, batching) is the code under test. Each fake
+goes through a FakeAPI: a latency model and a token-bucket rate limit, and
+per-operation call / byte counters. Over the limit, a call waits for its
+turn, the way a throttled client would after backing off.
+
+Documents come from Corpus: a deterministic, mixed-format synthetic corpus
+(txt, md, html, docx, pdf and Google Docs exported as PDF, with a share of
+near-duplicate "Copy of …" files), generated on demand so 100k documents
+need no disk space.
+"""
+import hashlib
+import io
+import random
+import re
+import threading
+import time
+import zipfile
+import zlib
+from collections import Counter
+from json import dumps
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+# Latency (seconds) and rate limit (requests/second) per API. Rates follow
+# the published quotas (Notion averages 3 requests/s per integration);
+# latencies are typical round trips, scaled down so a 1k run takes minutes.
+DEFAULT_LATENCY = {"drive": 0.02, "notion": 0.03, "gemini": 0.08, "pinecone": 0.01}
+DEFAULT_RATE = {"drive": 200.0, "notion": 3.0, "gemini": 30.0, "pinecone": 100.0}
+
+# (extension, Drive mimeType, share of the corpus)
+FORMATS = (
+    (".txt",  "text/plain", 0.25),
+    (".md",   "text/markdown", 0.15),
+    (".html", "text/html", 0.10),
+    (".docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", 0.20),
+    (".pdf",  "application/pdf", 0.20),
+    ("",      "application/vnd.google-apps.document", 0.10),    # exported as PDF
+)
+FOLDER_MIME = "application/vnd.google-apps.folder"
+PAGE_SIZE = 100     # Drive's and Notion's default page size
+
+
+class FakeAPI:
+    """Latency, a token-bucket rate limit and call counters for one fake service."""
+    def __init__(self, name: str, latency: float = 0.0, rate: Optional[float] = None,
+                 jitter: float = 0.25, seed: int = 0):
+        self.name = name
+        self.latency = latency
+        self.rate = rate
+        self.jitter = jitter
+        self.calls: Counter = Counter()         # round trips
+        self.batched: Counter = Counter()       # calls that went out inside a batch request
+        self.bytes = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self._tokens = rate or 0.0          # a one-second burst
+        self._last = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, op: str, nbytes: int = 0, batched: bool = False):
+        """One call; `batched` calls ride on a batch round trip (no latency of their own, same quota)."""
+        with self._lock:
+            (self.batched if batched else self.calls)[op] += 1
+            self.bytes += nbytes
+            wait = self._reserve()
+            delay = 0.0 if batched or not self.latency else \
+                max(self._rng.gauss(self.latency, self.latency * self.jitter), 0.0)
+        if wait:
+            with self._lock:
+                self.throttled += 1
+                self.throttled_seconds += wait
+        if wait + delay:
+            time.sleep(wait + delay)
+
+    def _reserve(self) -> float:
+        """Take a token; returns how long to wait until it is ours (tokens may go negative)."""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._last) * self.rate, self.rate)
+        self._last = now
+        self._tokens -= 1
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.batched.clear()
+            self.bytes = 0
+            self.throttled = 0
+            self.throttled_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"calls": sum(self.calls.values()), "by_op": dict(self.calls),
+                    "batched": dict(self.batched), "bytes": self.bytes,
+                    "throttled": self.throttled, "throttled_s": round(self.throttled_seconds, 3)}
+
+
+# ─── Synthetic corpus ──────────────────────────────────────────────────────
+
+def _vocabulary(size: int, seed: int) -> np.ndarray:
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ne", "ra", "to", "su", "vi", "de", "po", "an", "el", "or", "is", "ul"]
+    return np.array(["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)])
+
+
+def _docx(paragraphs: list[str]) -> bytes:
+    from xml.sax.saxutils import escape
+
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml",
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/word/document.xml" ContentType="application/'
+                   'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        z.writestr("_rels/.rels",
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                   'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+        z.writestr("word/document.xml",
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                   f"<w:body>{body}</w:body></w:document>")
+    return buf.getvalue()
+
+
+def _pdf(paragraphs: list[str]) -> bytes:
+    """A one-page PDF with the text as Helvetica lines (enough for PyPDF2's extract_text)."""
+    lines = []
+    for p in paragraphs:
+        words = p.split()
+        lines += [" ".join(words[i:i + 14]) for i in range(0, len(words), 14)]
+    esc = [l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for l in lines]
+    stream = "BT /F1 9 Tf 11 TL 36 806 Td " + " ".join(f"({l}) '" for l in esc) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream",
+    ]
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{n} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+class Corpus:
+    """
+    `docs` synthetic documents in Drive folders of `per_folder`. Word counts
+    are log-normal around ~600 words, so all three summarizer branches
+    (short / mid / chunked) are exercised; every `duplicate_every`-th file
+    is a lightly edited copy of the one before it.
+    """
+    def __init__(self, docs: int, seed: int = 0, per_folder: int = 100, duplicate_every: int = 20):
+        self.docs, self.seed, self.duplicate_every = docs, seed, duplicate_every
+        self.vocab = _vocabulary(20_000, seed)
+        rng = np.random.default_rng(seed)
+        shares = np.array([s for _, _, s in FORMATS])
+        self.formats = rng.choice(len(FORMATS), docs, p=shares / shares.sum())
+        self.folders: dict[str, list[dict]] = {"root": []}
+        self.files: dict[str, int] = {}
+        for i in range(docs):
+            folder = f"fld{i // per_folder:05d}"
+            if folder not in self.folders:
+                self.folders[folder] = []
+                self.folders["root"].append({"id": folder, "name": folder, "mimeType": FOLDER_MIME,
+                                             "modifiedTime": "2024-01-01T00:00:00.000Z"})
+            self.folders[folder].append(self.meta(i))
+            self.files[f"f{i:07d}"] = i
+
+    def source(self, i: int) -> int:
+        """The document whose text doc i carries (itself, or the original it copies)."""
+        return i - 1 if i and i % self.duplicate_every == self.duplicate_every - 1 else i
+
+    def name(self, i: int) -> str:
+        ext = FORMATS[self.formats[i]][0]
+        j = self.source(i)
+        base = f"report-{j:07d}{ext}"
+        return base if j == i else f"Copy of {base[:len(base) - len(ext)]} ({i}){ext}"
+
+    def meta(self, i: int) -> dict:
+        file_id = f"f{i:07d}"
+        return {"id": file_id, "name": self.name(i), "mimeType": FORMATS[self.formats[i]][1],
+                "modifiedTime": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00.000Z",
+                "webViewLink": f"https://drive.google.com/file/d/{file_id}/view"}
+
+    def paragraphs(self, i: int) -> list[str]:
+        j = self.source(i)
+        rng = np.random.default_rng((self.seed, j))
+        n = int(np.clip(rng.lognormal(6.4, 0.8), 40, 8000))
+        words = self.vocab[np.minimum(rng.zipf(1.2, n), len(self.vocab)) - 1]
+        paras, start = [], 0
+        while start < n:
+            size = int(rng.integers(40, 120))
+            sentence_words = list(words[start:start + size])
+            paras.append(f"Ticket OPS-{j}-{start}. " + " ".join(sentence_words).capitalize() + ".")
+            start += size
+        if j != i:
+            paras.append(f"Revised copy {i}.")
+        return paras
+
+    def content(self, i: int) -> tuple[bytes, str]:
+        """(bytes, mimeType) as Drive serves them; Google Docs come back exported as PDF."""
+        ext, mime, _ = FORMATS[self.formats[i]]
+        paras = self.paragraphs(i)
+        if ext in (".pdf", ""):
+            return _pdf(paras), "application/pdf"
+        if ext == ".docx":
+            return _docx(paras), mime
+        if ext == ".html":
+            body = "".join(f"<p>{p}</p>" for p in paras)
+            return f"<html><head><title>Report {i}</title></head><body>{body}</body></html>".encode(), mime
+        if ext == ".md":
+            return (f"# Report {i}\n\n" + "\n\n".join(paras)).encode(), mime
+        return "\n\n".join(paras).encode(), mime
+
+
+# ─── Drive ─────────────────────────────────────────────────────────────────
+
+class _MediaResponse(dict):
+    """httplib2-style response: a dict of headers with a .status."""
+    def __init__(self, status: int, headers: dict):
+        super().__init__(headers)
+        self.status = status
+        self.reason = {304: "Not Modified", 404: "Not Found"}.get(status, "OK")
+
+
+class _Call:
+    """
+    googleapiclient HttpRequest stand-in for a metadata call returning
+    `fn()` (a KeyError is a 404). Responses carry an ETag, and an
+    If-None-Match that matches it is answered 304 (HttpError) with no
+    body, as Drive does.
+    """
+    def __init__(self, api: "FakeAPI", op: str, fn):
+        self._api, self._op, self._fn = api, op, fn
+        self.headers = {}
+        self.postproc = lambda resp, content: content
+
+    def respond(self, batched: bool = False):
+        """(response, error), as a batch callback receives them."""
+        from googleapiclient.errors import HttpError
+
+        try:
+            body = self._fn()
+        except KeyError:
+            self._api.call(self._op, batched=batched)
+            return None, HttpError(_MediaResponse(404, {}), b'{"error": {"code": 404}}')
+        data = dumps(body).encode()
+        etag = f'"{zlib.crc32(data):08x}"'
+        modified = self.headers.get("If-None-Match") != etag
+        self._api.call(self._op, len(data) if modified else 0, batched=batched)
+        if not modified:
+            return None, HttpError(_MediaResponse(304, {"etag": etag}), b"")
+        return self.postproc(_MediaResponse(200, {"etag": etag}), body), None
+
+    def execute(self, num_retries: int = 0):
+        response, error = self.respond()
+        if error is not None:
+            raise error
+        return response
+
+
+class _Batch:
+    """BatchHttpRequest stand-in: one round trip, then each call's callback."""
+    def __init__(self, api: "FakeAPI", callback):
+        self.api, self.callback = api, callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        self.api.call("batch")
+        for request_id, request, callback in self.requests:
+            callback(request_id, *request.respond(batched=True))
+
+
+class _MediaHttp:
+    def __init__(self, drive: "FakeDrive"):
+        self.drive = drive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        i = self.drive.corpus.files[uri.rsplit("/", 1)[-1]]
+        data, _ = self.drive.corpus.content(i)
+        start, end = 0, len(data) - 1
+        m = re.match(r"bytes=(\d+)-(\d+)", (headers or {}).get("range", ""))
+        if m:
+            start, end = int(m.group(1)), min(int(m.group(2)), len(data) - 1)
+        chunk = data[start:end + 1]
+        self.drive.api.call("download", len(chunk))
+        return _MediaResponse(206 if m else 200, {"content-range": f"bytes {start}-{end}/{len(data)}",
+                                                  "content-length": str(len(chunk))}), chunk
+
+
+class _MediaRequest:
+    """What files().get_media() / export_media() return; MediaIoBaseDownload reads uri, headers and http."""
+    def __init__(self, drive: "FakeDrive", file_id: str):
+        self.uri = f"https://fake.googleapis.com/drive/v3/files/{file_id}"
+        self.headers = {}
+        self.http = _MediaHttp(drive)
+
+
+class _Files:
+    def __init__(self, drive: "FakeDrive"):
+        self.drive = drive
+
+    def list(self, q: str = "", pageToken: Optional[str] = None, pageSize: int = PAGE_SIZE, **kwargs):
+        def run():
+            folder = re.match(r"'([^']+)' in parents", q).group(1)
+            entries = self.drive.corpus.folders.get(folder, [])
+            start = int(pageToken or 0)
+            page = {"files": entries[start:start + pageSize]}
+            if start + pageSize < len(entries):
+                page["nextPageToken"] = str(start + pageSize)
+            return page
+        return _Call(self.drive.api, "list", run)
+
+    def get(self, fileId: str, **kwargs):
+        def run():
+            i = self.drive.corpus.files[fileId]
+            meta = {**self.drive.corpus.meta(i), "trashed": False}
+            if not meta["mimeType"].startswith("application/vnd.google-apps"):
+                # Drive has no size or checksum for native Google files
+                data, _ = self.drive.corpus.content(i)
+                meta.update(size=str(len(data)), md5Checksum=hashlib.md5(data).hexdigest())
+            return meta
+        return _Call(self.drive.api, "get", run)
+
+    def get_media(self, fileId: str, **kwargs):
+        return _MediaRequest(self.drive, fileId)
+
+    def export_media(self, fileId: str, mimeType: str, **kwargs):
+        return _MediaRequest(self.drive, fileId)
+
+
+class FakeDrive:
+    """The subset of the Drive v3 service the connectors use, over a Corpus."""
+    def __init__(self, corpus: Corpus, api: FakeAPI):
+        self.corpus, self.api = corpus, api
+
+    def files(self):
+        return _Files(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self.api, callback)
+
+
+# ─── Notion ────────────────────────────────────────────────────────────────
+
+class FakeNotion:
+    """
+    Stands in for notion_client's requests.Session: a page tree
+    of `pages` text pages, `fanout` child pages each, rooted at "page-0".
+    """
+    def __init__(self, corpus: Corpus, api: FakeAPI, pages: int, fanout: int = 5):
+        self.corpus, self.api, self.pages, self.fanout = corpus, api, pages, fanout
+
+    def _blocks(self, k: int) -> list[dict]:
+        text = [{"id": f"b{k}-{n}", "type": "paragraph",
+                 "paragraph": {"rich_text": [{"plain_text": p}]}}
+                for n, p in enumerate(self.corpus.paragraphs(k % max(self.corpus.docs, 1)))]
+        children = [{"id": f"page-{c}", "type": "child_page", "child_page": {"title": f"Page {c}"}}
+                    for c in range(k * self.fanout + 1, min((k + 1) * self.fanout + 1, self.pages))]
+        return text + children
+
+    def request(self, method: str, url: str, params=None, json=None, **kwargs):
+        import requests
+
+        path = urlparse(url).path
+        if m := re.fullmatch(r"/v1/pages/page-(\d+)", path):
+            op, k = "page", int(m.group(1))
+            body = {"id": f"page-{k}", "url": f"https://www.notion.so/page-{k}",
+                    "last_edited_time": "2024-01-01T00:00:00.000Z",
+                    "properties": {"Name": {"title": [{"plain_text": f"Page {k}"}]}}}
+        elif m := re.fullmatch(r"/v1/blocks/page-(\d+)/children", path):
+            op, k = "children", int(m.group(1))
+            blocks = self._blocks(k)
+            start = int((params or {}).get("start_cursor") or 0)
+            more = start + PAGE_SIZE < len(blocks)
+            body = {"results": blocks[start:start + PAGE_SIZE], "has_more": more,
+                    "next_cursor": str(start + PAGE_SIZE) if more else None}
+        else:
+            op, body = "other", {"object": "error", "status": 404}
+        data = dumps(body).encode()
+        self.api.call(op, len(data))
+        resp = requests.models.Response()
+        resp.status_code = 404 if op == "other" else 200
+        resp._content = data
+        resp.url = url
+        resp.headers["Content-Type"] = "application/json"
+        return resp
+
+
+# ─── Gemini ────────────────────────────────────────────────────────────────
+
+class FakeAgent:
+    """
+    pydantic_ai Agent stand-in: run_sync() returns the first words of the
+    prompt's text as the "summary", with token usage. `error_rate` of the
+    calls fail with HTTP 503, which call_gemini retries.
+    """
+    def __init__(self, api: FakeAPI, error_rate: float = 0.0, seed: int = 0):
+        self.api, self.error_rate = api, error_rate
+        self._rng = random.Random(seed)
+
+    def run_sync(self, prompt: str, max_output_tokens: int = 512, **kwargs):
+        self.api.call("generate", len(prompt))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            from pydantic_ai.exceptions import ModelHTTPError
+            raise ModelHTTPError(503, "fake-gemini", "overloaded")
+        text = prompt.split("\n\n", 1)[-1].split()
+        output = " ".join(text[:int(max_output_tokens * 0.5)])
+        usage = SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(output) // 4)
+        return SimpleNamespace(output=output, usage=lambda: usage)
+
+
+# ─── Pinecone ──────────────────────────────────────────────────────────────
+
+class FakePineconeIndex:
+    """pinecone Index stand-in: upsert / query / delete per namespace, in memory."""
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self.vectors: dict[str, dict[str, np.ndarray]] = {}
+
+    def upsert(self, vectors, namespace: str = ""):
+        self.api.call("upsert", sum(len(v) * 4 for _, v, _ in vectors))
+        ns = self.vectors.setdefault(namespace, {})
+        for vec_id, values, _ in vectors:
+            ns[vec_id] = np.asarray(values, dtype=np.float32)
+
+    def query(self, vector, top_k: int = 5, include_metadata: bool = True, namespace: str = ""):
+        self.api.call("query")
+        ns = self.vectors.get(namespace, {})
+        if not ns:
+            return {"matches": []}
+        ids = list(ns)
+        scores = np.stack([ns[i] for i in ids]) @ np.asarray(vector, dtype=np.float32)
+        top = np.argsort(-scores)[:top_k]
+        return {"matches": [{"id": ids[t], "score": float(scores[t])} for t in top]}
+
+    def delete(self, ids, namespace: str = ""):
+        self.api.call("delete")
+        ns = self.vectors.get(namespace, {})
+        for i in ids:
+            ns.pop(i, None)
+
+
+class FakeEncoder:
+    """SentenceTransformer stand-in: hashed unit vectors at `seconds_per_text` each."""
+    def __init__(self, dim: int = 384, seconds_per_text: float = 0.0005):
+        self.dim, self.seconds_per_text = dim, seconds_per_text
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size: int = 64, show_progress_bar: bool = False, **kwargs):
+        if self.seconds_per_text:
+            time.sleep(self.seconds_per_text * len(texts))
+        out = np.stack([np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(self.dim) for t in texts])
+        return (out / np.linalg.norm(out, axis=1, keepdims=True)).astype(np.float32)
+
+
+# ─── Wiring ────────────────────────────────────────────────────────────────
+
+class Fakes:
+    """All four fake services over one corpus, with per-API latency / rate overrides."""
+    def __init__(self, corpus: Corpus, latency: Optional[dict] = None, rate: Optional[dict] = None,
+                 notion_pages: int = 0, gemini_error_rate: float = 0.0, seed: int = 0):
+        latency = {**DEFAULT_LATENCY, **(latency or {})}
+        rate = {**DEFAULT_RATE, **(rate or {})}
+        self.apis = {name: FakeAPI(name, latency[name], rate[name] or None, seed=seed) for name in DEFAULT_LATENCY}
+        self.drive = FakeDrive(corpus, self.apis["drive"])
+        self.notion = FakeNotion(corpus, self.apis["notion"], notion_pages)
+        self.gemini = FakeAgent(self.apis["gemini"], gemini_error_rate, seed)
+        self.pinecone = FakePineconeIndex(self.apis["pinecone"])
+        self.encoder = FakeEncoder()
+
+    def reset(self):
+        for api in self.apis.values():
+            api.reset()
+
+    def snapshot(self) -> dict:
+        return {name: api.snapshot() for name, api in self.apis.items()}
+
+    def install(self):
+        """Point the pipeline's client factories at the fakes (this process only)."""
+        import pr_agent.core.embedder as embedder
+        import pr_agent.core.summarizer as summarizer
+        import pr_agent.core.vector_backends as vector_backends
+        import pr_agent.drive_client as drive_client
+        import pr_agent.notion_client as notion_client
+        from pr_agent.core.chunker import CHUNK_NAMESPACE
+        from pr_agent.settings import settings
+
+        for name in ("GDRIVE_CRED_FILE", "NOTION_TOKEN", "GEMINI_API_KEY", "PINECONE_API_KEY"):
+            setattr(settings, name, "fake")
+        settings.GDRIVE_FOLDER_ID = "root"
+        settings.NOTION_ROOT_PAGE_ID = "page-0"
+        settings.VECTOR_BACKEND = "pinecone"
+        settings.DAEMON_ENABLED = False
+
+        drive_client.get_drive_service = lambda: self.drive
+        notion_client._session = lambda: self.notion
+        summarizer._agent = self.gemini
+        embedder._model = self.encoder
+        for namespace in ("", CHUNK_NAMESPACE):
+            backend = vector_backends.PineconeBackend.__new__(vector_backends.PineconeBackend)
+            backend._index = self.pinecone
+            backend._ns = {"namespace": namespace} if namespace else {}
+            vector_backends._backends[namespace] = backend
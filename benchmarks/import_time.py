@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# benchmarks/import_time.py
+"""
+Import-time budget for the CLI.
+
+    python benchmarks/import_time.py --budget-ms 300
+
+Runs `python -X importtime` on the modules behind metadata-only commands
+in a clean subprocess (no .env, no credentials in the environment) and
+fails if any of them exceeds the budget or pulls in a heavy dependency
+(torch, pandas, the Google client, Pinecone, pydantic_ai, ...). Also
+runs `internal list-docs` end to end against an empty metadata dir.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Modules a metadata-only command must never import.
+HEAVY = (
+    "torch", "sentence_transformers", "pandas", "googleapiclient", "google.oauth2",
+    "pinecone", "pydantic_ai", "tiktoken", "pypandoc", "fitz", "pytesseract",
+)
+
+# Entry points that must stay light.
+TARGETS = (
+    "pr_agent.cli",
+    "pr_agent.core.metadata_manager",
+    "pr_agent.core.pinecone_manager",
+    "pr_agent.core.summarizer",
+    "pr_agent.core.text_extractor",
+    "pr_agent.core.embedder",
+)
+
+CREDENTIALS = ("GDRIVE_CRED_FILE", "GDRIVE_FOLDER_ID", "NOTION_TOKEN",
+               "NOTION_ROOT_PAGE_ID", "PINECONE_API_KEY", "GEMINI_API_KEY")
+
+
+def clean_env(workdir: str) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in CREDENTIALS}
+    env["METADATA_DIR"] = os.path.join(workdir, "metadata")
+    return env
+
+
+def import_profile(module: str, workdir: str) -> dict:
+    """Cumulative import time of `module` and every module it loaded."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir, env=clean_env(workdir), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    loaded, total_us = set(), 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cumulative.isdigit():
+            continue  # header row
+        loaded.add(name.strip())
+        if name.strip() == module:
+            total_us = int(cumulative)
+    heavy = sorted(m for m in loaded if m.split(".")[0] in HEAVY or m in HEAVY)
+    return {"module": module, "import_ms": round(total_us / 1000, 1), "heavy": heavy}
+
+
+def command_time(args: list[str], workdir: str) -> float:
+    os.makedirs(os.path.join(workdir, "metadata"), exist_ok=True)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-m", "pr_agent.cli", *args],
+                          cwd=workdir, env=clean_env(workdir), capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"`{' '.join(args)}` failed:\n{proc.stderr[-2000:]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    failures = []
+    report = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in TARGETS:
+            prof = import_profile(module, workdir)
+            report.append(prof)
+            if prof["heavy"]:
+                failures.append(f"{module} imports {', '.join(prof['heavy'])}")
+            if module == "pr_agent.cli" and prof["import_ms"] > args.budget_ms:
+                failures.append(f"{module} took {prof['import_ms']} ms (budget {args.budget_ms} ms)")
+        list_docs = command_time(["list-docs"], workdir)
+        report.append({"command": "list-docs", "wall_ms": round(list_docs * 1000, 1)})
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        print("\nFAIL:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
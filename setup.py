@@ -41,12 +41,27 @@ setuptools.setup(
         "pinecone",
         "pydantic-ai",
         "typer",
-        "pypandoc"
+        "pypandoc",
+        "pymupdf",
+        "pytesseract",
+        "Pillow",
+        "zstandard"
     ],
+    extras_require={
+        # EMBEDDING_BACKEND=onnx: CPU inference without importing torch
+        "onnx": ["onnxruntime", "tokenizers", "onnx"],
+        # `internal export` / exporter.load_corpus()
+        "export": ["pyarrow"],
+    },
     entry_points={
         "console_scripts": [
             "internal-discover=pr_agent.scripts.discover_sources:main",
             "internal-process=pr_agent.scripts.process_pending:main",
+            "internal-ocr=pr_agent.scripts.ocr_pending:main",
+            "internal-migrate-raw=pr_agent.scripts.migrate_raw_store:main",
+            "internal-daemon=pr_agent.scripts.embed_daemon:main",
+            "internal-chunk=pr_agent.scripts.chunk_documents:main",
+            "internal-export-onnx=pr_agent.scripts.export_onnx:main",
             "pinecone-setup=pr_agent.scripts.create_pinecone_index:main",
             "internal=pr_agent.cli:app",
             "list-docs=pr_agent.cli:cli_list_docs",
@@ -1,18 +1,30 @@
 # src/pr_agent/cli.py
 
+import time
 import typer
-import requests
-from io import BytesIO
+from collections import Counter
 from pathlib import Path
 from pr_agent.core.metadata_manager import DirectoryMetadataStore
 from pr_agent.settings import settings
-from pr_agent.drive_client import download_file_bytes
 
-from pr_agent.drive_client import get_drive_service, fetch_file_bytes
-from googleapiclient.http import MediaIoBaseDownload
+# Command bodies import what they need (Drive client, requests, the search
+# stack) so `list-docs` / `show-url` start without loading any of it.
 
 app = typer.Typer(help="PR-Agent CLI: explore your discovered docs")
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Profile the command (stacks, time, memory) into PROFILE_DIR"),
+):
+    if profile:
+        from pr_agent.core.profiling import profiler
+
+        # closed in reverse: the command's stage ends, then the profile is written
+        profiler.start()
+        ctx.call_on_close(lambda: profiler.finish(ctx.invoked_subcommand))
+        ctx.with_resource(profiler.stage(ctx.invoked_subcommand))
+
 @app.command("list-docs")
 def list_docs():
     """
@@ -38,52 +50,350 @@ def show_url(doc_id: str):
 
 @app.command("download")
 def download(
-    doc_id: str,
-    output_dir: Path = settings.DOWNLOAD_DIR
+    doc_ids: list[str] = typer.Argument(None, help="Documents to download"),
+    status: str = typer.Option(None, "--status", help="Every document with this status, e.g. Processed"),
+    all_docs: bool = typer.Option(False, "--all", help="Every discovered document"),
+    output_dir: Path = typer.Option(settings.DOWNLOAD_DIR, "--output-dir", "-o", help="Where to save the files"),
+    workers: int = typer.Option(settings.DOWNLOAD_WORKERS, "--workers", "-w", help="Files to fetch at once"),
 ):
     """
-    Download the file for DOC_ID to DOWNLOAD_DIR.
+    Download the original files of DOC_IDs (or of every document with
+    --status, or --all) to DOWNLOAD_DIR, several at a time. Files already
+    there with the same size / checksum are skipped, and interrupted
+    downloads resume from their .part file.
     """
-    store   = DirectoryMetadataStore(settings.METADATA_DIR)
-    meta    = store.read(doc_id)
-    url     = meta.get("file_url")
-    name    = meta.get("original_filename") or f"{doc_id}"
-    source = meta.get("source_system")
-    file_id = meta.get("source_id")
-    mime_type = meta.get("mime_type")  
+    from pr_agent.scripts.download_docs import download_documents
 
-    if not url:
-        typer.secho(f"[!] No URL found for {doc_id}", fg=typer.colors.RED)
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    if all_docs or status:
+        doc_ids = sorted(store.get_all_ids())
+    # every record is read once, here
+    metas = {doc_id: store.read(doc_id) for doc_id in dict.fromkeys(doc_ids or [])}
+    for doc_id in [d for d, m in metas.items() if m is None]:
+        typer.secho(f"[!] No metadata for {doc_id}", fg=typer.colors.RED)
+        del metas[doc_id]
+    if status:
+        wanted = status.lower()
+        metas = {d: m for d, m in metas.items() if (m.get("status") or m.get("Status") or "").lower() == wanted}
+    if not metas:
+        typer.secho("[!] Nothing to download (give DOC_IDs, --status or --all)", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"Downloading {len(metas)} document(s) → {output_dir} ({workers} at a time)")
+    started = time.monotonic()
+    outcomes = download_documents(metas, output_dir, workers)
+    counts = Counter(o if o in ("downloaded", "skipped") else "failed" for o in outcomes.values())
+    for doc_id, outcome in sorted(outcomes.items()):
+        if outcome not in ("downloaded", "skipped"):
+            typer.secho(f"[!] {doc_id}: {outcome}", fg=typer.colors.RED)
+    typer.secho(f"Downloaded {counts['downloaded']}, skipped {counts['skipped']} already present, "
+                f"{counts['failed']} failed in {time.monotonic() - started:.1f}s",
+                fg=typer.colors.RED if counts["failed"] else typer.colors.GREEN)
+    if counts["failed"]:
+        raise typer.Exit(code=1)
+
+@app.command("search")
+def search_docs(
+    queries: list[str] = typer.Argument(..., help="One or more search queries"),
+    top_k: int = typer.Option(5, "--top-k", "-k", help="Results per query"),
+    timing: bool = typer.Option(False, "--timing", help="Print per-stage and p50/p95 latencies"),
+    chunks: bool = typer.Option(False, "--chunks", help="Search raw-text chunks instead of summaries"),
+    mode: str = typer.Option("semantic", "--mode", "-m",
+                             help="semantic (vectors), keyword (BM25 over raw text) or hybrid (both, rank-fused)"),
+):
+    """
+    Search processed documents. Several queries are embedded in one batch
+    and looked up concurrently. Keyword and hybrid modes match words in the
+    raw text; quote a phrase to require it verbatim.
+    """
+    from pr_agent.core.search import SEARCH_MODES, SearchTimings, search_many
+
+    if mode not in SEARCH_MODES:
+        typer.secho(f"[!] --mode must be one of: {', '.join(SEARCH_MODES)}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    timings = SearchTimings()
+    results = search_many(queries, top_k=top_k, timings=timings, chunks=chunks, mode=mode)
+    raw_store = None
+    if chunks:
+        from pr_agent.core.raw_store import get_raw_store
+        raw_store = get_raw_store()
+
+    for query, hits in zip(queries, results):
+        if len(queries) > 1:
+            typer.secho(f"\n{query}", bold=True)
+        if not hits:
+            typer.echo("  (no matches)")
+        for hit in hits:
+            typer.echo(f"  {hit.score:.3f}  {hit.doc_id}  →  {hit.filename}")
+            if raw_store is not None and hit.start is not None and hit.doc_id in raw_store:
+                passage = " ".join(raw_store.read_text(hit.doc_id)[hit.start:hit.end].split())
+                typer.echo(f"         chunk {hit.chunk} [{hit.start}:{hit.end}]  {passage[:160]}…")
+
+    if timing:
+        lat = sorted(t * 1000 for t in timings.per_query)
+        pct = lambda p: lat[min(len(lat) - 1, int(round(p / 100 * (len(lat) - 1))))]
+        stages = []
+        if mode != "keyword":
+            stages.append(f"embed {timings.embed * 1000:.1f} ms ({timings.cache_hits}/{len(queries)} cached)")
+            stages.append(f"vector {timings.vector * 1000:.1f} ms")
+        if mode != "semantic":
+            stages.append(f"keyword {timings.keyword * 1000:.1f} ms")
+        stages.append(f"metadata {timings.metadata * 1000:.1f} ms")
+        typer.echo("\n" + "  ".join(stages))
+        typer.echo(f"per-query latency  p50 {pct(50):.1f} ms  p95 {pct(95):.1f} ms")
+
+@app.command("export")
+def export(
+    fmt: str = typer.Option("parquet", "--format", "-f", help="parquet or arrow (Arrow IPC / Feather v2)"),
+    out_dir: Path = typer.Option(None, "--out", "-o", help="Output directory (default EXPORT_DIR)"),
+    full: bool = typer.Option(False, "--full", help="Re-export everything instead of only what changed"),
+    raw: bool = typer.Option(True, "--raw/--no-raw", help="Include the raw text column"),
+):
+    """
+    Export metadata, summaries, raw text and embeddings to columnar files
+    for analytics. Only documents changed since the last export are written.
+    Load the result with pr_agent.core.exporter.load_corpus().
+    """
+    from pr_agent.core.exporter import EXPORT_FORMATS, export_corpus
+
+    if fmt not in EXPORT_FORMATS:
+        typer.secho(f"[!] --format must be one of: {', '.join(EXPORT_FORMATS)}", fg=typer.colors.RED)
         raise typer.Exit(code=1)
+    stats = export_corpus(out_dir, fmt=fmt, full=full, include_raw=raw,
+                          progress=lambda done, total: typer.echo(f"[{done}/{total}] rows written"))
+    typer.echo(
+        f"{stats.docs} documents: {stats.written} exported, {stats.unchanged} unchanged, "
+        f"{stats.removed} removed; {stats.parts} part file(s)" + (" (compacted)" if stats.compacted else "")
+    )
+    typer.echo("  " + "  ".join(f"{stage} {secs:.2f}s" for stage, secs in stats.seconds.items()))
+
+@app.command("build-keyword-index")
+def build_keyword_index_cmd(
+    full: bool = typer.Option(False, "--full", help="Discard the index and rebuild it from scratch"),
+):
+    """
+    Bring the BM25 keyword index up to date with the raw-text store. Only
+    documents whose text changed are re-tokenized.
+    """
+    from pr_agent.core.keyword_index import build_keyword_index, get_keyword_index
+
+    def progress(done, total, stats):
+        typer.echo(f"[{done}/{total}] {stats.indexed} indexed, {stats.terms} posting lists rewritten")
 
-    output_dir.mkdir(parents=True, exist_ok=True)
-    outpath = output_dir / name
-
-    # typer.echo(f"Downloading {doc_id} → {url}")
-    # resp = requests.get(url)
-    # try:
-    #     resp.raise_for_status()
-    # except Exception as e:
-    #     typer.secho(f"[!] Download failed: {e}", fg=typer.colors.RED)
-    #     raise typer.Exit(code=1)
-
-    # with open(outpath, "wb") as f:
-    #     f.write(resp.content)
-
-    typer.echo(f"Downloading {doc_id} → {outpath}")
-
-    if source == "GoogleDrive":
-        buffer = download_file_bytes(file_id, mime_type)
-        with open(outpath, "wb") as f:
-            f.write(buffer.getvalue())
-    else:
-        # e.g. Notion attachments, public URLs
-        resp = requests.get(url)
-        resp.raise_for_status()
-        with open(outpath, "wb") as f:
-            f.write(resp.content)
-
-    typer.secho(f"Saved to {outpath}", fg=typer.colors.GREEN)
+    stats = build_keyword_index(full=full, progress=progress)
+    typer.echo(
+        f"{stats.docs} documents: {stats.indexed} indexed, {stats.unchanged} unchanged, "
+        f"{stats.removed} removed; {len(get_keyword_index())} in the index"
+    )
+    typer.echo("  " + "  ".join(f"{stage} {secs:.2f}s" for stage, secs in stats.seconds.items()))
+
+@app.command("build-dedup-index")
+def build_dedup_index_cmd(
+    full: bool = typer.Option(False, "--full", help="Drop all signatures and rebuild them"),
+):
+    """
+    Register MinHash signatures of already processed documents (and of
+    recorded duplicates), so new near-copies of them are detected.
+    Near-duplicates found among existing documents are listed; they stay
+    as they are.
+    """
+    from pr_agent.core.dedup import get_dedup_index, minhash_signature, reset_dedup_index
+    from pr_agent.core.raw_store import get_raw_store
+
+    if full:
+        reset_dedup_index()
+    index = get_dedup_index()
+    raw_store = get_raw_store()
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    known = index.doc_ids()
+    added = pairs = 0
+    for doc_id in sorted(store.get_all_ids()):
+        meta = store.read(doc_id) or {}
+        status = meta.get("status") or meta.get("Status") or ""
+        canonical = meta.get("duplicate_of") or meta.get("Duplicate Of")
+        if doc_id in known or doc_id not in raw_store or not (status == "Processed" or canonical):
+            continue
+        signature = minhash_signature(raw_store.read_text(doc_id))
+        if signature is None:
+            continue
+        if canonical:
+            index.add(doc_id, signature, duplicate_of=canonical)
+            added += 1
+            continue
+        match = index.find(signature, exclude=doc_id)
+        if match is not None:
+            pairs += 1
+            typer.echo(f"  {doc_id}  ≈  {match.canonical}  ({match.similarity:.2f})")
+        index.add(doc_id, signature)
+        added += 1
+    typer.echo(f"{added} signatures added ({len(known)} already known); {pairs} near-duplicate pair(s) found")
+
+@app.command("build-related")
+def build_related_cmd(
+    top_k: int = typer.Option(None, "--top-k", "-k", help="Neighbours per document (default RELATED_TOP_K)"),
+    full: bool = typer.Option(False, "--full", help="Recompute every list, not just what changed"),
+):
+    """
+    Precompute each document's related documents (top-k nearest summaries)
+    and store them in its metadata.
+    """
+    from pr_agent.core.related import build_related
+
+    stats = build_related(k=top_k, full=full)
+    typer.echo(
+        f"{stats.docs} documents: {stats.recomputed} lists recomputed, {stats.updated} updated, "
+        f"{stats.removed} removed, {stats.published} metadata files written"
+    )
+    typer.echo("  " + "  ".join(f"{stage} {secs:.2f}s" for stage, secs in stats.seconds.items()))
+
+@app.command("related")
+def related(doc_id: str):
+    """
+    Show the precomputed related documents for DOC_ID.
+    """
+    from pr_agent.core.related import related_documents
+
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    neighbours = related_documents(doc_id)
+    if not neighbours:
+        typer.secho(f"[!] No related documents for {doc_id} (run `internal build-related`)", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    metas = store.read_many(n["doc_id"] for n in neighbours)
+    for n in neighbours:
+        meta = metas.get(n["doc_id"], {})
+        name = meta.get("original_filename") or meta.get("Original Filename", "")
+        typer.echo(f"  {n['score']:.3f}  {n['doc_id']}  →  {name}")
+
+@app.command("run")
+def run(
+    watch: bool = typer.Option(False, "--watch", "-w", help="Keep running, one pass every --interval seconds"),
+    interval: float = typer.Option(None, "--interval", "-i", help="Seconds between passes (default WATCH_INTERVAL)"),
+    shard: str = typer.Option(None, "--shard", help="Only documents of shard I/N (0-based)"),
+):
+    """
+    Discover new documents and process the Pending queue in one process.
+    With --watch it keeps clients and the embedding model loaded and
+    repeats every --interval seconds; SIGTERM finishes the document in hand.
+    """
+    from pr_agent.core.leases import parse_shard
+    from pr_agent.scripts.run_pipeline import run as run_pipeline
+
+    try:
+        parsed = parse_shard(shard) if shard else None
+    except ValueError as e:
+        typer.secho(f"[!] {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    run_pipeline(watch=watch, interval=interval, shard=parsed)
+
+@app.command("requeue")
+def requeue(
+    doc_ids: list[str] = typer.Argument(None, help="Documents to retry"),
+    dead_letters: bool = typer.Option(False, "--dead-letters", help="Retry every Dead Letter document"),
+):
+    """
+    Put documents back in the processing queue with a fresh attempt
+    count. They resume from their last checkpointed stage.
+    """
+    from pr_agent.core.checkpoints import DEAD_LETTER, get_checkpoint_store
+
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    targets = list(doc_ids or [])
+    if dead_letters:
+        targets += [d for d in sorted(store.get_all_ids())
+                    if (store.read(d) or {}).get("Status") == DEAD_LETTER and d not in targets]
+    if not targets:
+        typer.secho("[!] Nothing to requeue (give DOC_IDs or --dead-letters)", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    # a document whose file was deleted would only fail again
+    metas = {doc_id: store.read(doc_id) for doc_id in targets}
+    drive_files = _lookup_drive_files(metas.values())
+
+    checkpoints = get_checkpoint_store()
+    for doc_id in targets:
+        meta = metas[doc_id]
+        if meta is None:
+            typer.secho(f"[!] No metadata for {doc_id}", fg=typer.colors.RED)
+            continue
+        if meta.get("status") == "Processed":
+            typer.echo(f"  {doc_id} is already processed; skipped")
+            continue
+        file_id = meta.get("source_id")
+        if file_id in drive_files and _gone(drive_files[file_id]):
+            typer.echo(f"  {doc_id} is no longer in Drive; skipped")
+            continue
+        status = meta.pop("Dead Letter From", None)
+        if status not in ("Pending", "Needs OCR"):
+            status = "Pending"      # also for the old "Error: …" statuses
+        meta.update({"Status": status, "Attempts": 0})
+        meta.pop("Last Error", None)
+        store.upsert(doc_id, meta)
+        checkpoints.reset_attempts(doc_id)
+        stage = checkpoints.load(doc_id).get("stage")
+        typer.echo(f"  {doc_id}  →  {status}" + (f" (resumes after “{stage}”)" if stage else ""))
+
+def _source(meta: dict) -> str:
+    # processed records use lower-case keys, pending ones the original titles
+    return meta.get("source_system") or meta.get("Source System") or ""
+
+
+def _gone(drive_file) -> bool:
+    return drive_file is None or bool(drive_file.get("trashed"))
+
+
+def _lookup_drive_files(metas) -> dict:
+    """
+    process_pending.lookup_drive_files for a command: lookups that failed
+    are reported and left out, and an unreachable Drive checks nothing.
+    """
+    from pr_agent.scripts.process_pending import lookup_drive_files
+
+    try:
+        found, errors = lookup_drive_files(metas)
+    except Exception as e:
+        typer.secho(f"[!] Cannot reach Drive ({type(e).__name__}: {e}); files not checked", fg=typer.colors.YELLOW)
+        return {}
+    for file_id, error in errors.items():
+        typer.secho(f"[!] Lookup of Drive file {file_id} failed: {error}", fg=typer.colors.YELLOW)
+    return found
+
+@app.command("verify")
+def verify(
+    doc_ids: list[str] = typer.Argument(None, help="Documents to check (default: every Drive document)"),
+):
+    """
+    Check that the Drive files behind documents still exist, looking them
+    up in batches of up to 100, and list those deleted, trashed or
+    modified since they were discovered. Exits 1 if any file is gone.
+    """
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    targets = list(doc_ids or sorted(store.get_all_ids()))
+    metas = {doc_id: store.read(doc_id) for doc_id in targets}
+    metas = {d: m for d, m in metas.items() if m and _source(m) == "GoogleDrive" and m.get("source_id")}
+    if not metas:
+        typer.echo("No Drive documents to verify.")
+        return
+
+    drive_files = _lookup_drive_files(metas.values())
+    missing = changed = 0
+    for doc_id, meta in metas.items():
+        file_id = meta["source_id"]
+        if file_id not in drive_files:
+            continue
+        drive_file = drive_files[file_id]
+        if drive_file is None:
+            missing += 1
+            typer.secho(f"  {doc_id}  deleted from Drive ({file_id})", fg=typer.colors.RED)
+        elif drive_file.get("trashed"):
+            missing += 1
+            typer.secho(f"  {doc_id}  in the Drive trash ({file_id})", fg=typer.colors.RED)
+        elif drive_file.get("modifiedTime", "") > (meta.get("last_modified") or meta.get("Last Modified") or ""):
+            changed += 1
+            typer.echo(f"  {doc_id}  modified in Drive at {drive_file['modifiedTime']}")
+    typer.echo(f"Checked {len(drive_files)} of {len(metas)} Drive documents: "
+               f"{missing} gone, {changed} modified since discovery.")
+    if missing:
+        raise typer.Exit(code=1)
 
 # def cli_list_docs():
 #     """Entry point for the standalone `list-docs` script."""
@@ -4,46 +4,54 @@ from typing import List, Set
 from pr_agent.drive_client import get_drive_service
 from pr_agent.drive_client import list_files_in_folder
 from pr_agent.connectors.base_connector import SourceItem
-from pr_agent.drive_client import get_drive_service, list_files_in_folder
+from pr_agent.drive_client import get_drive_service, list_files_in_folder, list_folders
 from pr_agent.drive_client import download_file_bytes
 
-def _gather_all_files_recursively(folder_id: str) -> List[dict]:
-    """
-    Returns a flat list of file‐metadata dicts for every non‐folder item under `folder_id`,
-    descending into subfolders recursively.
-    Each dict has keys: { 'id': fileId, 'name': fileName, 'modifiedTime': ... }.
-    """
-    all_files = []
-    # 1) List everything directly in this folder
-    results = list_files_in_folder(folder_id)
-    #print(f"\nContents of folder {folder_id}:") # <- debug
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
 
-    allowed_mime_types = [
+allowed_mime_types = [
     "application/vnd.google-apps.document",  # Google Docs
     "application/pdf",                       # PDFs
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document", # DOCX
-    "text/plain" # TXT
+    "text/plain", # TXT
     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", # XLSX
     "text/csv",
-    "text/markdown"
+    "text/markdown",
+    "application/msword",                       # DOC
+    "application/rtf",                          # RTF
+    "text/rtf",
+    "application/vnd.oasis.opendocument.text",  # ODT
+    "text/html",                                # HTML
     ]
 
-    for meta in results:
-        #print("  •", meta["name"], "→", meta["mimeType"])  # <— debug
-        file_id   = meta["id"]
-        name      = meta["name"]
-        mime_type = meta.get("mimeType", "")
-
-        if mime_type == "application/vnd.google-apps.folder":
-            # Found a subfolder: recurse into it
-            subfolder_id = file_id
-            nested = _gather_all_files_recursively(subfolder_id)
-            all_files.extend(nested)
-        else:
-            # It’s a normal file (PDF, DOCX, TXT, etc.)
-            if mime_type in allowed_mime_types:
-                all_files.append(meta)
-
+def _gather_all_files_recursively(folder_id: str) -> List[dict]:
+    """
+    Returns a flat list of file‐metadata dicts for every non‐folder item under `folder_id`,
+    descending into subfolders recursively.
+    Each dict has keys: { 'id': fileId, 'name': fileName, 'modifiedTime': ... }.
+    The tree is walked a level at a time, listing all folders of a level
+    in Google batch requests rather than one request per folder.
+    """
+    all_files = []
+    level = [folder_id]
+    while level:
+        listed, errors = list_folders(level)
+        if errors:
+            # a folder we cannot list would silently hide its documents
+            folder, error = next(iter(errors.items()))
+            raise RuntimeError(f"Cannot list Drive folder {folder}: {error}") from error
+
+        level = []
+        for folder in listed.values():
+            for meta in folder:
+                #print("  •", meta["name"], "→", meta["mimeType"])  # <— debug
+                mime_type = meta.get("mimeType", "")
+                if mime_type == FOLDER_MIME_TYPE:
+                    # Found a subfolder: list it with the next level
+                    level.append(meta["id"])
+                elif mime_type in allowed_mime_types:
+                    # It’s a normal file (PDF, DOCX, TXT, etc.)
+                    all_files.append(meta)
 
     return all_files
 
@@ -15,8 +15,6 @@ from pr_agent.connectors.base_connector import SourceItem
 #from pr_agent.settings import NOTION_ROOT_PAGE_ID
 from pr_agent.settings import settings
 
-notion_root = settings.NOTION_ROOT_PAGE_ID
-
 def process_leaf_page(page_id: str) -> List[SourceItem]:
     """
     Fetch all text blocks and attachments from a single Notion page (a “leaf”).
@@ -237,6 +235,7 @@ def list_new_items(existing_titles: set[str]) -> List[SourceItem]:
     NOTION_ROOT_PAGE_ID, collect all SourceItem (attachments/text). Then filter out
     any whose .name is already in existing_titles, returning only new items.
     """
-    all_items: List[SourceItem] = recursively_walk_block_tree(notion_root)
+    settings.require("NOTION_ROOT_PAGE_ID")
+    all_items: List[SourceItem] = recursively_walk_block_tree(settings.NOTION_ROOT_PAGE_ID)
     new_items = [item for item in all_items if item.name not in existing_titles]
     return new_items
@@ -0,0 +1,116 @@
+# pr_agent/core/checkpoints.py
+
+import json
+import os
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.settings import settings
+
+# Pipeline stages in order; a checkpoint records the last one completed.
+STAGES = ("fetched", "extracted", "summarized", "embedded", "indexed")
+DEAD_LETTER = "Dead Letter"
+
+
+def reached(state: dict, stage: str) -> bool:
+    """Has the document in `state` completed `stage`?"""
+    done = state.get("stage")
+    return done is not None and STAGES.index(done) >= STAGES.index(stage)
+
+
+class CheckpointStore:
+    """
+    Per-document progress through process_pending, and the artifacts
+    needed to resume after the last completed stage:
+        <doc_id>.json     stage, attempts, last_error, plus what the
+                          finished stages produced (summary, partial
+                          summaries, embedding reference, …)
+        <doc_id>.source   the fetched bytes, until text is extracted
+    Every write goes to a temporary file that replaces the old one, so a
+    crash leaves the previous checkpoint intact. A document's checkpoint
+    is removed once it is Processed.
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, doc_id: str, ext: str = ".json") -> Path:
+        return self.root / f"{doc_id}{ext}"
+
+    def _replace(self, path: Path, data: bytes):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        tmp.replace(path)
+
+    def load(self, doc_id: str) -> dict:
+        path = self._path(doc_id)
+        return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+    def _save(self, doc_id: str, state: dict) -> dict:
+        state["updated_at"] = datetime.utcnow().isoformat() + "Z"
+        self._replace(self._path(doc_id), json.dumps(state, ensure_ascii=False).encode("utf-8"))
+        return state
+
+    def update(self, doc_id: str, **artifacts) -> dict:
+        """Store artifacts without moving the stage (e.g. partial summaries)."""
+        return self._save(doc_id, {**self.load(doc_id), **artifacts})
+
+    def advance(self, doc_id: str, stage: str, **artifacts) -> dict:
+        """Record `stage` as completed, together with what it produced."""
+        state = {**self.load(doc_id), **artifacts, "stage": stage}
+        state = self._save(doc_id, state)
+        if stage != "fetched":
+            self._path(doc_id, ".source").unlink(missing_ok=True)
+        return state
+
+    def save_source(self, doc_id: str, item) -> dict:
+        """Keep a fetched SourceItem so extraction never has to re-fetch it."""
+        self._replace(self._path(doc_id, ".source"), item.raw_bytes.getvalue())
+        return self.advance(doc_id, "fetched", item={
+            "id": item.id, "name": item.name, "last_modified": item.last_modified,
+            "source_system": item.source_system, "url": item.url, "mime_type": item.mime_type,
+        })
+
+    def load_source(self, doc_id: str):
+        """The SourceItem saved by save_source(), or None if it is gone."""
+        from pr_agent.connectors.base_connector import SourceItem
+
+        fields = self.load(doc_id).get("item")
+        path = self._path(doc_id, ".source")
+        if fields is None or not path.exists():
+            return None
+        return SourceItem(raw_bytes=BytesIO(path.read_bytes()), **fields)
+
+    def record_failure(self, doc_id: str, error: str) -> int:
+        """Count a failed attempt; returns the attempts made so far."""
+        state = self.load(doc_id)
+        state["attempts"] = state.get("attempts", 0) + 1
+        state["last_error"] = error
+        return self._save(doc_id, state)["attempts"]
+
+    def reset_attempts(self, doc_id: str):
+        state = self.load(doc_id)
+        if state:
+            state.pop("last_error", None)
+            self._save(doc_id, {**state, "attempts": 0})
+
+    def clear(self, doc_id: str):
+        for ext in (".json", ".source"):
+            self._path(doc_id, ext).unlink(missing_ok=True)
+
+    def doc_ids(self) -> list[str]:
+        return sorted(p.stem for p in self.root.glob("*.json"))
+
+
+_store: Optional[CheckpointStore] = None
+
+def get_checkpoint_store() -> CheckpointStore:
+    global _store
+    if _store is None:
+        _store = CheckpointStore(settings.CHECKPOINT_DIR)
+    return _store
@@ -0,0 +1,278 @@
+# pr_agent/core/chunker.py
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.settings import settings
+
+CHUNK_NAMESPACE = "chunks"
+
+# A "token" for windowing is a whitespace-delimited word: cheap to find,
+# and its character span gives exact offsets back into the raw text.
+_WORD = re.compile(r"\S+")
+
+
+@dataclass
+class Chunk:
+    index: int
+    start: int          # character offsets into the raw text
+    end: int
+    text: str
+
+    @cached_property
+    def hash(self) -> str:
+        return hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc_id: str, index: int) -> str:
+    return f"{doc_id}#{index}"
+
+
+def parse_chunk_id(vector_id: str) -> tuple[str, Optional[int]]:
+    """'DIVAMI_001#3' → ('DIVAMI_001', 3); plain document ids → (id, None)."""
+    doc_id, sep, index = vector_id.rpartition("#")
+    if not sep or not index.isdigit():
+        return vector_id, None
+    return doc_id, int(index)
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None,
+               overlap: Optional[int] = None) -> list[Chunk]:
+    """
+    Split `text` into sliding windows of at most `max_tokens` words,
+    consecutive windows sharing `overlap` words. The last window always
+    reaches the end of the text.
+    """
+    max_tokens = max_tokens or settings.CHUNK_TOKENS
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+
+    spans = [m.span() for m in _WORD.finditer(text or "")]
+    chunks: list[Chunk] = []
+    step = max_tokens - overlap
+    for first in range(0, len(spans), step):
+        window = spans[first:first + max_tokens]
+        start, end = window[0][0], window[-1][1]
+        chunks.append(Chunk(len(chunks), start, end, text[start:end]))
+        if first + max_tokens >= len(spans):
+            break
+    return chunks
+
+
+class ChunkManifest:
+    """
+    Which chunks each document was last indexed with (offsets + content
+    hash), so re-indexing only re-encodes what changed. SQLite, next to
+    the chunk vectors.
+    """
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " doc_id TEXT, chunk INTEGER, start INTEGER, end INTEGER, hash TEXT,"
+            " PRIMARY KEY (doc_id, chunk))"
+        )
+        # raw-text sha256 (as in the raw store) + window settings per document
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS texts (doc_id TEXT PRIMARY KEY, text_hash TEXT, params TEXT)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, doc_ids: list[str]) -> dict[str, list[tuple[int, int, int, str]]]:
+        """Previously indexed (chunk, start, end, hash) rows per document."""
+        out: dict[str, list[tuple[int, int, int, str]]] = {d: [] for d in doc_ids}
+        with self._lock:
+            for start in range(0, len(doc_ids), 500):
+                part = doc_ids[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for doc_id, idx, s, e, h in self._db.execute(
+                        f"SELECT doc_id, chunk, start, end, hash FROM chunks "
+                        f"WHERE doc_id IN ({marks}) ORDER BY doc_id, chunk", part):
+                    out[doc_id].append((idx, s, e, h))
+        return out
+
+    def text_hashes(self, doc_ids: Optional[list[str]] = None) -> dict[str, tuple[str, str]]:
+        """doc_id → (text_hash, params) it was last chunked from, for all documents or only `doc_ids`."""
+        with self._lock:
+            if doc_ids is None:
+                return {d: (h, p) for d, h, p in self._db.execute("SELECT doc_id, text_hash, params FROM texts")}
+            out = {}
+            for start in range(0, len(doc_ids), 500):
+                part = doc_ids[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for d, h, p in self._db.execute(
+                        f"SELECT doc_id, text_hash, params FROM texts WHERE doc_id IN ({marks})", part):
+                    out[d] = (h, p)
+            return out
+
+    def replace(self, doc_chunks: dict[str, list[Chunk]], text_hashes: dict[str, str], params: str):
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE doc_id = ?", [(d,) for d in doc_chunks])
+            self._db.executemany(
+                "INSERT INTO chunks (doc_id, chunk, start, end, hash) VALUES (?, ?, ?, ?, ?)",
+                [(d, c.index, c.start, c.end, c.hash) for d, cs in doc_chunks.items() for c in cs],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO texts (doc_id, text_hash, params) VALUES (?, ?, ?)",
+                [(d, text_hashes[d], params) for d in doc_chunks],
+            )
+            self._db.commit()
+
+    def remove(self, doc_ids: list[str]):
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE doc_id = ?", [(d,) for d in doc_ids])
+            self._db.executemany("DELETE FROM texts WHERE doc_id = ?", [(d,) for d in doc_ids])
+            self._db.commit()
+
+
+@dataclass
+class ChunkStats:
+    docs: int = 0
+    chunks: int = 0
+    encoded: int = 0        # new or changed text → model call
+    reused: int = 0         # same text at a new position → vector copied
+    unchanged: int = 0
+    deleted: int = 0
+    seconds: dict = field(default_factory=lambda: {"chunk": 0.0, "encode": 0.0, "write": 0.0})
+
+    def add(self, other: "ChunkStats"):
+        for name in ("docs", "chunks", "encoded", "reused", "unchanged", "deleted"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for stage, secs in other.seconds.items():
+            self.seconds[stage] += secs
+
+
+_manifest: Optional[ChunkManifest] = None
+
+def get_chunk_manifest() -> ChunkManifest:
+    global _manifest
+    if _manifest is None:
+        root = settings.EMBEDDINGS_DIR / CHUNK_NAMESPACE
+        root.mkdir(parents=True, exist_ok=True)
+        _manifest = ChunkManifest(root / "manifest.sqlite")
+    return _manifest
+
+
+def _chunk_store(backend):
+    """The local EmbeddingStore holding chunk vectors (the backend's own when local)."""
+    from pr_agent.core.embedder import get_embedding_store
+    from pr_agent.core.vector_backends import LocalBackend
+
+    if isinstance(backend, LocalBackend):
+        return backend.store
+    return get_embedding_store(str(settings.EMBEDDINGS_DIR / CHUNK_NAMESPACE))
+
+
+def index_chunks(docs: dict[str, str], batch_size: Optional[int] = None) -> ChunkStats:
+    """
+    Chunk the raw text of many documents and bring their `{doc_id}#{n}`
+    vectors up to date in one pass:
+      • documents whose text (and window settings) did not change are skipped,
+      • chunks whose text and offsets are unchanged are left alone,
+      • chunks whose text moved to another position reuse the stored vector,
+      • only new/changed text is encoded, all documents in one batched call,
+      • trailing chunks a document no longer has are deleted.
+    Each vector carries {doc_id, chunk, start, end} as metadata.
+    """
+    from pr_agent.core.embedder import generate_embeddings
+    from pr_agent.core.vector_backends import get_vector_backend
+
+    stats = ChunkStats()
+    backend = get_vector_backend(CHUNK_NAMESPACE)
+    store = _chunk_store(backend)
+    manifest = get_chunk_manifest()
+    store.refresh()
+
+    # documents whose text and window settings are unchanged need nothing
+    t0 = time.perf_counter()
+    params = f"{settings.CHUNK_TOKENS}/{settings.CHUNK_OVERLAP}"
+    known = manifest.text_hashes(list(docs))
+    text_hashes = {doc_id: hashlib.sha256(text.encode("utf-8")).hexdigest() for doc_id, text in docs.items()}
+    docs = {doc_id: text for doc_id, text in docs.items() if known.get(doc_id) != (text_hashes[doc_id], params)}
+    stats.docs = len(docs)
+    if not docs:
+        return stats
+
+    new_chunks = {doc_id: chunk_text(text) for doc_id, text in docs.items()}
+    old_chunks = manifest.get_many(list(docs))
+    stats.seconds["chunk"] = time.perf_counter() - t0
+
+    upserts: list[tuple[str, object, dict]] = []   # str in place of a vector → still to encode
+    stale: list[str] = []
+    for doc_id, chunks in new_chunks.items():
+        old = old_chunks[doc_id]
+        old_at = {idx: (h, s, e) for idx, s, e, h in old}
+        old_by_hash = {h: idx for idx, _, _, h in old}
+        for c in chunks:
+            cid = chunk_id(doc_id, c.index)
+            meta = {"doc_id": doc_id, "chunk": c.index, "start": c.start, "end": c.end}
+            if old_at.get(c.index) == (c.hash, c.start, c.end) and cid in store:
+                stats.unchanged += 1
+                continue
+            vec = None
+            if c.hash in old_by_hash:
+                vec = store.get(chunk_id(doc_id, old_by_hash[c.hash]))
+            if vec is None:
+                upserts.append((cid, c.text, meta))
+            else:
+                upserts.append((cid, np.array(vec, dtype=np.float32), meta))
+                stats.reused += 1
+        stale.extend(chunk_id(doc_id, idx) for idx, _, _, _ in old if idx >= len(chunks))
+        stats.chunks += len(chunks)
+
+    t0 = time.perf_counter()
+    todo = [i for i, (_, v, _) in enumerate(upserts) if isinstance(v, str)]
+    if todo:
+        vecs = generate_embeddings([upserts[i][1] for i in todo],
+                                   batch_size=batch_size or settings.CHUNK_BATCH_SIZE)
+        for i, vec in zip(todo, vecs):
+            upserts[i] = (upserts[i][0], vec, upserts[i][2])
+    stats.encoded = len(todo)
+    stats.seconds["encode"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _write(backend, store, upserts, stale)
+    stats.deleted = len(stale)
+    manifest.replace(new_chunks, text_hashes, params)
+    stats.seconds["write"] = time.perf_counter() - t0
+    return stats
+
+
+def remove_chunks(doc_ids: list[str]) -> int:
+    """Delete every chunk vector of the given documents. Returns how many."""
+    from pr_agent.core.vector_backends import get_vector_backend
+
+    backend = get_vector_backend(CHUNK_NAMESPACE)
+    manifest = get_chunk_manifest()
+    stale = [chunk_id(doc_id, idx)
+             for doc_id, rows in manifest.get_many(list(doc_ids)).items() for idx, _, _, _ in rows]
+    _write(backend, _chunk_store(backend), [], stale)
+    manifest.remove(list(doc_ids))
+    return len(stale)
+
+
+def _write(backend, store, upserts: list, stale: list[str]):
+    from pr_agent.core.vector_backends import LocalBackend
+
+    local = isinstance(backend, LocalBackend)
+    if upserts:
+        if local:
+            backend.upsert(upserts)
+        else:
+            store.put_many((cid, vec) for cid, vec, _ in upserts)   # local copy
+            backend.upsert(upserts)
+    if stale:
+        if not local:
+            store.delete(stale)
+        backend.delete(stale)
+    store.compact(min_tombstone_ratio=settings.EMBEDDING_COMPACT_RATIO)
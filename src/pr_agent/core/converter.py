@@ -0,0 +1,262 @@
+# pr_agent/core/converter.py
+
+import atexit
+import base64
+import itertools
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+from pr_agent.settings import settings
+
+# Extension → pandoc reader. Binary readers need their input base64-encoded
+# when sent to `pandoc server`.
+PANDOC_FORMATS = {
+    ".doc":  None,      # sniffed from the bytes, see _sniff_doc_format()
+    ".rtf":  "rtf",
+    ".odt":  "odt",
+    ".html": "html",
+    ".htm":  "html",
+}
+BINARY_FORMATS = {"docx", "odt"}
+
+
+class ConversionError(Exception):
+    """Raised when a document cannot be converted to plain text."""
+
+
+@dataclass
+class ConversionResult:
+    text: str = ""
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _sniff_doc_format(raw: bytes) -> str:
+    """
+    A “.doc” in the wild is often not a Word 97-2003 binary at all.
+    Route RTF/DOCX/HTML payloads to the right reader; refuse real OLE2 files.
+    """
+    head = raw[:512].lstrip()
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    if head.startswith(b"PK\x03\x04"):
+        return "docx"
+    if head[:15].lower().startswith((b"<!doctype html", b"<html")):
+        return "html"
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        raise ConversionError("binary Word 97-2003 .doc is not readable by pandoc")
+    raise ConversionError("unrecognised .doc payload")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pandoc_path() -> str:
+    try:
+        import pypandoc
+        return pypandoc.get_pandoc_path()
+    except Exception:
+        return shutil.which("pandoc") or "pandoc"
+
+
+class _PandocWorker:
+    """
+    One long-lived `pandoc server` process listening on a local port.
+    Restarted transparently if it dies.
+    """
+    def __init__(self, pandoc: str, timeout: float):
+        self.pandoc = pandoc
+        self.timeout = timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.port: Optional[int] = None
+        self._lock = threading.RLock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def ensure_started(self) -> bool:
+        with self._lock:
+            if self.proc is not None and self.proc.poll() is None:
+                return True
+            self.port = _free_port()
+            self.proc = subprocess.Popen(
+                [self.pandoc, "server", "--port", str(self.port),
+                 "--timeout", str(int(self.timeout))],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                if self.proc.poll() is not None:
+                    return False   # this pandoc build has no server mode
+                try:
+                    with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                        pass
+                except OSError:
+                    time.sleep(0.05)
+                    continue
+                if self._healthy():
+                    return True
+                break
+            self.stop()
+            return False
+
+    def _healthy(self) -> bool:
+        """Some pandoc builds accept connections but crash on every request."""
+        try:
+            resp = requests.post(
+                self.url,
+                json={"text": "ok", "from": "markdown", "to": "plain"},
+                headers={"Accept": "application/json"},
+                timeout=5,
+            )
+            return resp.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def stop(self):
+        with self._lock:
+            if self.proc is not None and self.proc.poll() is None:
+                self.proc.terminate()
+                try:
+                    self.proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+            self.proc = None
+
+
+class ConversionService:
+    """
+    Converts legacy formats (.doc, .rtf, .odt, .html) to plain text through a
+    pool of resident `pandoc server` workers, so a backfill pays the pandoc
+    start-up cost once per worker instead of once per document.
+
+    Falls back to one `pandoc` subprocess per document (still with a timeout)
+    when the installed pandoc has no server mode.
+    """
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.timeout = timeout or settings.PANDOC_TIMEOUT
+        pandoc = _pandoc_path()
+        self._workers = [_PandocWorker(pandoc, self.timeout)
+                         for _ in range(workers or settings.PANDOC_WORKERS)]
+        self._next = itertools.cycle(range(len(self._workers)))
+        self._next_lock = threading.Lock()
+        self._session = requests.Session()
+        self._pandoc = pandoc
+        self._server_mode: Optional[bool] = None
+
+    # ─── public API ────────────────────────────────────────────────────────
+    def convert(self, raw: bytes, ext: str) -> str:
+        """
+        Convert a single document on the next worker. Raises
+        ConversionError with the reason on failure.
+        """
+        req = self._build_request(raw, ext)
+        worker = self._pick_worker()
+        result = self._run_subprocess(req) if worker is None else self._run_server(worker, req)
+        if not result.ok:
+            raise ConversionError(result.error)
+        return result.text
+
+    def close(self):
+        for w in self._workers:
+            w.stop()
+
+    # ─── internals ─────────────────────────────────────────────────────────
+    def _build_request(self, raw: bytes, ext: str) -> dict:
+        ext = ext.lower()
+        if ext not in PANDOC_FORMATS:
+            raise ConversionError(f"unsupported format {ext}")
+        fmt = PANDOC_FORMATS[ext] or _sniff_doc_format(raw)
+        if fmt in BINARY_FORMATS:
+            text = base64.b64encode(raw).decode("ascii")
+        else:
+            text = raw.decode("utf-8", errors="ignore")
+        return {"text": text, "from": fmt, "to": "plain", "wrap": "none"}
+
+    def _pick_worker(self) -> Optional[_PandocWorker]:
+        if self._server_mode is False:
+            return None
+        with self._next_lock:
+            worker = self._workers[next(self._next)]
+        started = worker.ensure_started()
+        if self._server_mode is None:
+            self._server_mode = started
+        return worker if started else None
+
+    def _run_server(self, worker: _PandocWorker, req: dict) -> ConversionResult:
+        try:
+            resp = self._session.post(
+                f"{worker.url}/",
+                json=req,
+                headers={"Accept": "application/json"},
+                timeout=self.timeout + 5,
+            )
+        except requests.RequestException:
+            # worker died or hung: it is restarted on next use, and this
+            # document is converted by a subprocess instead
+            worker.stop()
+            return self._run_subprocess(req)
+        if resp.status_code != 200:
+            return ConversionResult(error=f"pandoc server HTTP {resp.status_code}: {resp.text[:200]}")
+        return self._parse_result(resp.json())
+
+    @staticmethod
+    def _parse_result(item) -> ConversionResult:
+        if isinstance(item, str):
+            return ConversionResult(error=item)
+        if item.get("error"):
+            return ConversionResult(error=str(item["error"]))
+        output = item.get("output", "")
+        if item.get("base64"):
+            output = base64.b64decode(output).decode("utf-8", errors="ignore")
+        return ConversionResult(text=output)
+
+    def _run_subprocess(self, req: dict) -> ConversionResult:
+        raw = req["text"].encode("utf-8")
+        if req["from"] in BINARY_FORMATS:
+            raw = base64.b64decode(req["text"])
+        try:
+            proc = subprocess.run(
+                [self._pandoc, "-f", req["from"], "-t", "plain", "--wrap=none"],
+                input=raw,
+                capture_output=True,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return ConversionResult(error=f"pandoc timed out after {self.timeout}s")
+        except OSError as e:
+            return ConversionResult(error=f"pandoc not available: {e}")
+        if proc.returncode != 0:
+            return ConversionResult(error=proc.stderr.decode("utf-8", errors="ignore").strip()
+                                    or f"pandoc exited with {proc.returncode}")
+        return ConversionResult(text=proc.stdout.decode("utf-8", errors="ignore"))
+
+
+_service: Optional[ConversionService] = None
+_service_lock = threading.Lock()
+
+def get_conversion_service() -> ConversionService:
+    """Process-wide ConversionService, started on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConversionService()
+            atexit.register(_service.close)
+    return _service
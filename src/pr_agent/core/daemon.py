@@ -0,0 +1,141 @@
+# pr_agent/core/daemon.py
+
+import json
+import os
+import queue
+import signal
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.core.daemon_client import decode_matrix, encode_matrix
+from pr_agent.settings import settings
+
+
+class MicroBatcher:
+    """
+    Collects embed requests from many connections and encodes them in one
+    model call: a batch closes when it holds `max_batch` texts or the
+    oldest request has waited `max_wait` seconds.
+    """
+    def __init__(self, encode, max_batch: int, max_wait: float):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[tuple[list[str], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        fut: Future = Future()
+        self._queue.put((texts, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            try:
+                vecs = self.encode(texts) if texts else np.empty((0, 0), dtype=np.float32)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            start = 0
+            for item_texts, fut in batch:
+                fut.set_result(vecs[start:start + len(item_texts)])
+                start += len(item_texts)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.dispatch(json.loads(line))
+            except Exception as e:  # report, keep serving
+                reply = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class EmbeddingDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived process that keeps the SentenceTransformer (and, with
+    VECTOR_BACKEND=local, the local vector index) resident and serves
+    embed/search requests over a Unix socket.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, socket_path: str):
+        from pr_agent.core.embedder import _get_model
+
+        model = _get_model()
+        self.batcher = MicroBatcher(
+            lambda texts: np.asarray(model.encode(texts, batch_size=settings.DAEMON_MAX_BATCH,
+                                                  show_progress_bar=False), dtype=np.float32),
+            max_batch=settings.DAEMON_MAX_BATCH,
+            max_wait=settings.DAEMON_MAX_WAIT_MS / 1000,
+        )
+        self.backend = None
+        self._search_lock = threading.Lock()
+        if settings.VECTOR_BACKEND == "local":
+            from pr_agent.core.vector_backends import get_vector_backend
+            self.backend = get_vector_backend()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "index": self.backend is not None}
+        if op == "embed":
+            vecs = self.batcher.submit(request["texts"]).result()
+            return {"vectors": encode_matrix(vecs)}
+        if op == "search":
+            if self.backend is None:
+                return {"results": None}
+            with self._search_lock:
+                hits = self.backend.search(decode_matrix(request["vectors"]), request.get("top_k", 5))
+            return {"results": hits}
+        return {"error": f"unknown op {op!r}"}
+
+
+def serve(socket_path: Optional[str] = None):
+    """Run the daemon until SIGTERM/SIGINT."""
+    path = str(socket_path or settings.DAEMON_SOCKET)
+    server = EmbeddingDaemon(path)
+
+    def _stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(f"Embedding daemon listening on {path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        print("Embedding daemon stopped.")
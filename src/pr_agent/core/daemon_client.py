@@ -0,0 +1,85 @@
+# pr_agent/core/daemon_client.py
+
+import base64
+import json
+import socket
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.settings import settings
+
+# Wire format: one JSON object per line in each direction. Vectors travel
+# as base64 float32 so a batch of 384-d embeddings is not a wall of digits.
+
+
+def encode_matrix(vectors) -> dict:
+    mat = np.ascontiguousarray(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+    return {"shape": list(mat.shape), "data": base64.b64encode(mat.tobytes()).decode("ascii")}
+
+
+def decode_matrix(payload: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32).reshape(payload["shape"])
+
+
+class DaemonUnavailable(Exception):
+    """No daemon is listening (or it did not answer in time)."""
+
+
+def _request(message: dict, timeout: Optional[float] = None) -> dict:
+    path = str(settings.DAEMON_SOCKET)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(settings.DAEMON_CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(timeout or settings.DAEMON_REQUEST_TIMEOUT)
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except (FileNotFoundError, ConnectionRefusedError, socket.timeout, OSError) as e:
+        raise DaemonUnavailable(str(e)) from e
+    if not line:
+        raise DaemonUnavailable("daemon closed the connection")
+    reply = json.loads(line)
+    if "error" in reply:
+        raise RuntimeError(f"daemon error: {reply['error']}")
+    return reply
+
+
+def daemon_available() -> bool:
+    if not settings.DAEMON_ENABLED or not settings.DAEMON_SOCKET.exists():
+        return False
+    try:
+        return _request({"op": "ping"}).get("ok", False)
+    except (DaemonUnavailable, RuntimeError):
+        return False
+
+
+def daemon_embed(texts: list[str]) -> Optional[np.ndarray]:
+    """
+    Embed `texts` in the resident daemon. Returns None when no daemon is
+    running, so callers can fall back to loading the model in-process.
+    """
+    if not settings.DAEMON_ENABLED or not settings.DAEMON_SOCKET.exists():
+        return None
+    try:
+        reply = _request({"op": "embed", "texts": texts})
+    except DaemonUnavailable:
+        return None
+    return decode_matrix(reply["vectors"])
+
+
+def daemon_search(vectors, top_k: int) -> Optional[list[list[tuple[str, float]]]]:
+    """
+    Search the daemon's resident local index. Returns None when no daemon
+    is running or it holds no index.
+    """
+    if not settings.DAEMON_ENABLED or not settings.DAEMON_SOCKET.exists():
+        return None
+    try:
+        reply = _request({"op": "search", "vectors": encode_matrix(vectors), "top_k": top_k})
+    except DaemonUnavailable:
+        return None
+    if reply.get("results") is None:
+        return None
+    return [[(doc_id, score) for doc_id, score in hits] for hits in reply["results"]]
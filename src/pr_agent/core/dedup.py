@@ -0,0 +1,172 @@
+# pr_agent/core/dedup.py
+
+import hashlib
+import re
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.settings import settings
+
+# Signature layout. Changing any of these invalidates stored signatures:
+# rebuild with `internal build-dedup-index --full`.
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16                  # 16 bands × 8 rows: P(candidate) ≈ 0.5 at J≈0.71, ≈ 0.98 at J=0.85
+ROWS = NUM_PERM // BANDS
+
+# one random 64-bit seed per "permutation": h_i(x) = fmix64(x ^ seed_i)
+_SEEDS = np.random.default_rng(0x5EED).integers(0, np.iinfo(np.uint64).max, NUM_PERM,
+                                                dtype=np.uint64, endpoint=True)
+_WORD = re.compile(r"\w+")
+_BLOCK = 8192               # shingles per (block × NUM_PERM) hashing step
+
+
+def _fmix64(h: np.ndarray) -> np.ndarray:
+    """murmur3's 64-bit finalizer, in place: every input bit affects every output bit."""
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB9FE1A85EC53)
+    h ^= h >> np.uint64(33)
+    return h
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """
+    Distinct 64-bit hashes of the text's SHINGLE_WORDS-word shingles
+    (lower-cased words, punctuation and layout ignored). Word hashes are
+    crc32; a shingle's hash is a polynomial over its words' hashes,
+    computed for all shingles at once.
+    """
+    words = _WORD.findall((text or "").lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    vocab = {}
+    ids = np.fromiter((vocab.setdefault(w, len(vocab)) for w in words), dtype=np.int64, count=len(words))
+    word_hash = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in vocab), dtype=np.uint64,
+                            count=len(vocab))[ids]
+    k = min(SHINGLE_WORDS, len(words))
+    n = len(words) - k + 1
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        h = h * np.uint64(1_000_003) + word_hash[j:j + n]   # wraps mod 2**64
+    return np.unique(h)
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-value MinHash of the text's shingle set; None for empty text."""
+    shingles = shingle_hashes(text)
+    if not len(shingles):
+        return None
+    sig = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), _BLOCK):
+        hashed = _fmix64(shingles[start:start + _BLOCK, None] ^ _SEEDS)
+        sig = np.minimum(sig, hashed.min(axis=0))
+    # the low 32 bits of each minimum are as good a fingerprint and halve storage
+    return (sig & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures' shingle sets."""
+    return float(np.mean(a == b))
+
+
+def _band_keys(sig: np.ndarray) -> list[tuple[int, int]]:
+    rows = sig.reshape(BANDS, ROWS)
+    return [(band, int.from_bytes(hashlib.blake2b(rows[band].tobytes(), digest_size=8).digest(),
+                                  "little", signed=True))
+            for band in range(BANDS)]
+
+
+@dataclass
+class DuplicateMatch:
+    canonical: str
+    similarity: float
+
+
+class DedupIndex:
+    """
+    MinHash signatures of processed documents plus an LSH band index over
+    the canonical ones (documents that are not themselves duplicates), in
+    SQLite next to the metadata. A lookup is BANDS indexed bucket probes,
+    then an exact signature comparison with the few candidates found.
+    """
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS signatures (doc_id TEXT PRIMARY KEY, sig BLOB, duplicate_of TEXT);"
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket INTEGER, doc_id TEXT,"
+            " PRIMARY KEY (band, bucket, doc_id));"
+            "CREATE INDEX IF NOT EXISTS bands_by_doc ON bands (doc_id);"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def find(self, sig: np.ndarray, threshold: Optional[float] = None,
+             exclude: Optional[str] = None) -> Optional[DuplicateMatch]:
+        """Most similar canonical document at or above `threshold`, if any."""
+        threshold = settings.DEDUP_THRESHOLD if threshold is None else threshold
+        keys = _band_keys(sig)
+        clause = " OR ".join("(band = ? AND bucket = ?)" for _ in keys)
+        with self._lock:
+            candidates = [row[0] for row in self._db.execute(
+                f"SELECT DISTINCT doc_id FROM bands WHERE {clause}", [v for key in keys for v in key])]
+            candidates = [c for c in candidates if c != exclude]
+            if not candidates:
+                return None
+            marks = ",".join("?" * len(candidates))
+            sigs = self._db.execute(
+                f"SELECT doc_id, sig FROM signatures WHERE doc_id IN ({marks})", candidates).fetchall()
+        best = max(((doc_id, similarity(sig, np.frombuffer(blob, dtype=np.uint32))) for doc_id, blob in sigs),
+                   key=lambda x: x[1])
+        return DuplicateMatch(*best) if best[1] >= threshold else None
+
+    def add(self, doc_id: str, sig: np.ndarray, duplicate_of: Optional[str] = None):
+        """Record doc_id's signature; canonical documents become LSH candidates."""
+        with self._lock:
+            self._db.execute("DELETE FROM bands WHERE doc_id = ?", (doc_id,))
+            self._db.execute("INSERT OR REPLACE INTO signatures (doc_id, sig, duplicate_of) VALUES (?, ?, ?)",
+                             (doc_id, sig.astype(np.uint32).tobytes(), duplicate_of))
+            if duplicate_of is None:
+                self._db.executemany("INSERT OR IGNORE INTO bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                     [(band, bucket, doc_id) for band, bucket in _band_keys(sig)])
+            self._db.commit()
+
+    def remove(self, doc_ids: list[str]):
+        with self._lock:
+            self._db.executemany("DELETE FROM bands WHERE doc_id = ?", [(d,) for d in doc_ids])
+            self._db.executemany("DELETE FROM signatures WHERE doc_id = ?", [(d,) for d in doc_ids])
+            self._db.commit()
+
+    def doc_ids(self) -> set[str]:
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT doc_id FROM signatures")}
+
+    def duplicates(self) -> list[tuple[str, str]]:
+        """(duplicate, canonical) pairs, grouped by canonical."""
+        with self._lock:
+            return list(self._db.execute(
+                "SELECT doc_id, duplicate_of FROM signatures WHERE duplicate_of IS NOT NULL "
+                "ORDER BY duplicate_of, doc_id"))
+
+
+_index: Optional[DedupIndex] = None
+
+def get_dedup_index() -> DedupIndex:
+    global _index
+    if _index is None:
+        settings.DEDUP_DIR.mkdir(parents=True, exist_ok=True)
+        _index = DedupIndex(settings.DEDUP_DIR / "lsh.sqlite")
+    return _index
+
+
+def reset_dedup_index():
+    """Drop every stored signature (the next build starts from scratch)."""
+    global _index
+    _index = None
+    (settings.DEDUP_DIR / "lsh.sqlite").unlink(missing_ok=True)
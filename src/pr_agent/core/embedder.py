@@ -1,11 +1,10 @@
 # pr_agent/core/embedder.py
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-
-#from pr_agent.settings import EMBEDDING_MODEL
-from pr_agent.core.summarizer import extract_summary
 
+from pr_agent.core.daemon_client import daemon_embed
+from pr_agent.core.embedding_store import EmbeddingStore
+from pr_agent.core.metrics import SIZE_BUCKETS, metrics
 from pr_agent.settings import settings
 
 embed_model = settings.EMBEDDING_MODEL
@@ -13,33 +12,79 @@ embed_model = settings.EMBEDDING_MODEL
 _model = None
 
 def _get_model():
+    """
+    The embedding model for settings.EMBEDDING_BACKEND. Both backends
+    expose SentenceTransformer's encode() / get_sentence_embedding_dimension().
+    """
     global _model
     if _model is None:
-        _model = SentenceTransformer(embed_model)
+        if settings.EMBEDDING_BACKEND == "onnx":
+            from pr_agent.core.onnx_embedder import OnnxEncoder
+            _model = OnnxEncoder(settings.ONNX_MODEL_DIR, quantized=settings.ONNX_QUANTIZED,
+                                 threads=settings.ONNX_THREADS)
+        elif settings.EMBEDDING_BACKEND == "torch":
+            # sentence_transformers pulls in torch: only pay for it when encoding
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(embed_model)
+        else:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND: {settings.EMBEDDING_BACKEND}")
     return _model
 
-def generate_embedding(text: str) -> list[float]:
+def generate_embedding(text: str) -> np.ndarray:
     """
-    Generate a vector embedding for the summarized version of `text`.
-    If `text` is empty or None, return an empty list. Otherwise:
-      1. Run extract_summary(...) to get a shorter, context‐preserving summary.
-      2. Pass that summary into the SentenceTransformer to obtain the embedding.
+    Generate a float32 vector embedding for `text` (callers pass the
+    summary). If `text` is empty or None, return an empty vector.
     """
     if not text:
-        return []
+        return np.empty(0, dtype=np.float32)
 
+    return generate_embeddings([text])[0]
 
-    model = _get_model()
-    vec = model.encode([text], show_progress_bar=False)[0]
-    return vec.tolist()
+def generate_embeddings(texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """
+    Embed many texts in batched model calls. Returns a float32
+    (len(texts), dim) matrix; empty texts get all-zero rows.
+    Uses the resident embedding daemon when one is running, otherwise
+    loads the model in-process.
+    """
+    todo = [i for i, t in enumerate(texts) if t]
+    if not todo:
+        return np.zeros((len(texts), 0), dtype=np.float32)
+    # a running `internal-daemon` already has the model loaded
+    with metrics.timer("embedding_batch_seconds"):
+        vecs = daemon_embed([texts[i] for i in todo])
+        via = "daemon"
+        if vecs is None:
+            model = _get_model()
+            vecs = model.encode([texts[i] for i in todo], batch_size=batch_size, show_progress_bar=False)
+            via = "in-process"
+    metrics.inc("embedding_batches_total", via=via)
+    metrics.observe("embedding_batch_size", len(todo), buckets=SIZE_BUCKETS)
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if len(todo) == len(texts):
+        return vecs
+    out = np.zeros((len(texts), vecs.shape[1]), dtype=np.float32)
+    out[todo] = vecs
+    return out
 
-def save_embedding(vector: list[float], doc_id: str, output_dir: str) -> str:
+def save_embedding(vector: np.ndarray, doc_id: str, output_dir: str) -> str:
     """
-    Save a numeric vector to disk as a .npy file. Create output_dir if needed.
-    Returns the file path of the saved vector.
+    Append a numeric vector to the EmbeddingStore in output_dir (one
+    memory-mapped matrix for the whole corpus), compacting it when too
+    many rows are tombstones. Returns a reference to the stored vector.
     """
-    import os
-    os.makedirs(output_dir, exist_ok=True)
-    path = os.path.join(output_dir, f"{doc_id}_emb.npy")
-    np.save(path, np.array(vector))
-    return path
+    store = get_embedding_store(output_dir)
+    store.put(doc_id, vector)
+    store.compact(min_tombstone_ratio=settings.EMBEDDING_COMPACT_RATIO)
+    return f"EmbeddingStore<{output_dir}>/{doc_id}"
+
+
+_stores: dict[str, EmbeddingStore] = {}
+
+def get_embedding_store(output_dir: str = None) -> EmbeddingStore:
+    """One EmbeddingStore per directory per process (defaults to EMBEDDINGS_DIR)."""
+    key = str(output_dir or settings.EMBEDDINGS_DIR)
+    if key not in _stores:
+        _stores[key] = EmbeddingStore(key, dtype=settings.EMBEDDING_DTYPE,
+                                      keep_full=settings.EMBEDDING_KEEP_FULL)
+    return _stores[key]
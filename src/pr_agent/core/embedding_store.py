@@ -0,0 +1,375 @@
+# pr_agent/core/embedding_store.py
+
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize_int8(vecs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector scalar quantization: row ≈ q * scale with q in
+    [-127, 127]. Returns (q as int8, scale as float32 per row). Cosine
+    similarity is scale-invariant, so search can score `q` directly.
+    """
+    vecs = np.asarray(vecs, dtype=np.float32)
+    scales = np.abs(vecs).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk embedding matrix.
+
+    Layout under root_dir:
+        meta.json              {"dim", "dtype", "generation", "full"}
+        vectors.<gen>.bin      row-major matrix, one row per appended vector
+        scales.<gen>.bin       int8 stores: float32 scale per row
+        full.<gen>.bin         quantized stores with keep_full: float32 copy
+                               of each row, read only to rescore candidates
+        ids.<gen>.log          journal: "<row>\\t<id>" per add, "-\\t<id>" per delete
+
+    Re-adding an id appends a new row; the old row becomes a tombstone, as
+    does a deleted id. compact() rewrites only the live rows into a new
+    generation and atomically switches meta.json over to it.
+
+    matrix() is a read-only np.memmap over the whole file, so loading every
+    corpus vector is one mmap instead of one file open per document.
+    Writers serialise on an flock, so several processes can share a store.
+    """
+    def __init__(self, root_dir: str, dim: Optional[int] = None, dtype: str = "float32",
+                 keep_full: bool = False):
+        self.root = Path(root_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.root / ".lock"
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        # overridden by meta.json if the store already exists
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.keep_full = keep_full and self.quantized
+        self.generation = 0
+        self._index: dict[str, int] = {}
+        self._row_ids: list[Optional[str]] = []
+        self._log_offset = 0
+        self._log_generation = None
+        self.refresh()
+
+    # ─── files ─────────────────────────────────────────────────────────────
+    @property
+    def vectors_path(self) -> Path:
+        return self.root / f"vectors.{self.generation}.bin"
+
+    @property
+    def scales_path(self) -> Path:
+        return self.root / f"scales.{self.generation}.bin"
+
+    @property
+    def full_path(self) -> Path:
+        return self.root / f"full.{self.generation}.bin"
+
+    @property
+    def log_path(self) -> Path:
+        return self.root / f"ids.{self.generation}.log"
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != np.float32
+
+    def _write_meta(self):
+        path = self.root / "meta.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "generation": self.generation,
+            "full": self.keep_full,
+        }), encoding="utf-8")
+        tmp.replace(path)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    # ─── index ─────────────────────────────────────────────────────────────
+    def refresh(self):
+        """Replay journal entries written since we last looked (by us or another process)."""
+        meta_path = self.root / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            self.dim, self.dtype = meta["dim"], np.dtype(meta["dtype"])
+            self.keep_full = meta.get("full", False)
+            gen = meta["generation"]
+            if gen != self._log_generation:
+                # someone compacted: start over on the new generation
+                self.generation = gen
+                self._index, self._row_ids, self._log_offset = {}, [], 0
+                self._log_generation = gen
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1   # ignore a torn trailing line
+        for line in data[:end].decode("utf-8").splitlines():
+            row, doc_id = line.split("\t", 1)
+            old = self._index.pop(doc_id, None)
+            if old is not None:
+                self._row_ids[old] = None
+            if row != "-":
+                row = int(row)
+                self._row_ids.extend([None] * (row + 1 - len(self._row_ids)))
+                self._row_ids[row] = doc_id
+                self._index[doc_id] = row
+        self._log_offset += end
+
+    @property
+    def row_ids(self) -> list[Optional[str]]:
+        """id stored at each row, None for tombstones."""
+        return self._row_ids
+
+    @property
+    def rows(self) -> int:
+        return len(self._row_ids)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._index
+
+    def ids(self) -> list[str]:
+        return list(self._index)
+
+    def tombstones(self) -> int:
+        return self.rows - len(self._index)
+
+    # ─── reading ───────────────────────────────────────────────────────────
+    def matrix(self) -> np.ndarray:
+        """Zero-copy read-only view of every row (live and tombstoned)."""
+        if self.rows == 0:
+            return np.empty((0, self.dim or 0), dtype=self.dtype)
+        return np.memmap(self.vectors_path, dtype=self.dtype, mode="r",
+                         shape=(self.rows, self.dim))
+
+    def scales(self) -> Optional[np.ndarray]:
+        """Per-row dequantization scales (int8 stores only)."""
+        if self.dtype != np.int8:
+            return None
+        if self.rows == 0:
+            return np.empty(0, dtype=np.float32)
+        return np.memmap(self.scales_path, dtype=np.float32, mode="r", shape=(self.rows,))
+
+    def full_matrix(self) -> Optional[np.ndarray]:
+        """
+        float32 view of every row: the matrix itself for float32 stores,
+        the full-precision copy for quantized stores that keep one, else None.
+        """
+        if not self.quantized:
+            return self.matrix()
+        if not self.keep_full:
+            return None
+        if self.rows == 0:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.full_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+    def live(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """
+        Returns (ids, rows, matrix): live ids, their row numbers and the
+        memmap. `matrix[rows]` gives the live vectors in `ids` order.
+        """
+        ids = list(self._index)
+        rows = np.fromiter((self._index[i] for i in ids), dtype=np.int64, count=len(ids))
+        return ids, rows, self.matrix()
+
+    def get(self, doc_id: str) -> Optional[np.ndarray]:
+        """The stored vector as float32 (dequantized if no full copy is kept)."""
+        row = self._index.get(doc_id)
+        if row is None:
+            return None
+        full = self.full_matrix()
+        if full is not None:
+            return np.array(full[row], dtype=np.float32)
+        vec = np.array(self.matrix()[row], dtype=np.float32)
+        if self.dtype == np.int8:
+            vec *= self.scales()[row]
+        return vec
+
+    def get_many(self, doc_ids: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        float32 vectors of many ids at once: (matrix, found). matrix[i] is
+        doc_ids[i]'s vector, zeros where found[i] is False. Rows are read
+        in file order, a block at a time.
+        """
+        found = np.fromiter((d in self._index for d in doc_ids), dtype=bool, count=len(doc_ids))
+        out = np.zeros((len(doc_ids), self.dim or 0), dtype=np.float32)
+        pos = np.flatnonzero(found)
+        if not len(pos):
+            return out, found
+        rows = np.fromiter((self._index[doc_ids[i]] for i in pos), dtype=np.int64, count=len(pos))
+        order = np.argsort(rows)
+        pos, rows = pos[order], rows[order]
+        full = self.full_matrix()
+        src = full if full is not None else self.matrix()
+        for start in range(0, len(rows), 65536):
+            block = np.asarray(src[rows[start:start + 65536]], dtype=np.float32)
+            if full is None and self.dtype == np.int8:
+                block *= self.scales()[rows[start:start + 65536]][:, None]
+            out[pos[start:start + 65536]] = block
+        return out, found
+
+    def fingerprints(self, doc_ids: list[str]) -> list[Optional[str]]:
+        """sha1 of each id's stored row (None if absent), for change detection."""
+        out: list[Optional[str]] = [None] * len(doc_ids)
+        pos = [i for i, d in enumerate(doc_ids) if d in self._index]
+        rows = np.fromiter((self._index[doc_ids[i]] for i in pos), dtype=np.int64, count=len(pos))
+        mat = self.matrix()
+        for start in range(0, len(pos), 65536):
+            block = np.ascontiguousarray(mat[rows[start:start + 65536]])
+            for i, row in zip(pos[start:start + 65536], block):
+                out[i] = hashlib.sha1(row.tobytes()).hexdigest()
+        return out
+
+    # ─── encoding ──────────────────────────────────────────────────────────
+    def _encode(self, vecs: np.ndarray) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """float32 rows → (stored rows, scales or None) in this store's dtype."""
+        if self.dtype == np.int8:
+            return quantize_int8(vecs)
+        return vecs.astype(self.dtype), None
+
+    def _append(self, path: Path, data: np.ndarray, row_bytes: int):
+        mode = "r+b" if path.exists() else "wb"
+        with open(path, mode) as f:
+            # overwrite anything a crashed writer left past the last journaled row
+            f.seek(self.rows * row_bytes)
+            f.write(np.ascontiguousarray(data).tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ─── writing ───────────────────────────────────────────────────────────
+    def put(self, doc_id: str, vector) -> int:
+        """Append (or replace) one vector. Returns its row number."""
+        return self.put_many([(doc_id, vector)])[0]
+
+    def put_many(self, items: Iterable[tuple[str, object]]) -> list[int]:
+        """
+        Append many vectors in one locked write. Vectors identical to the
+        stored one for the same id are skipped, so re-saving is free.
+        """
+        items = list(items)
+        if not items:
+            return []
+        vecs = np.stack([np.asarray(v, dtype=np.float32) for _, v in items])
+        if vecs.ndim != 2:
+            raise ValueError("put_many expects vectors of equal length")
+        if vecs.shape[1] == 0:
+            # generate_embedding("") is empty; taking dim 0 from it would
+            # make every later vector a dimension mismatch
+            raise ValueError("Cannot store zero-length vectors (embedding of empty text?)")
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vecs.shape[1])
+                self._write_meta()
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"Expected dim {self.dim}, got {vecs.shape[1]}")
+            stored, scales = self._encode(vecs)
+
+            rows, new, lines = [], [], []
+            current, current_scales = self.matrix(), self.scales()
+            next_row = self.rows
+            for i, (doc_id, _) in enumerate(items):
+                row = self._index.get(doc_id)
+                if (row is not None and np.array_equal(current[row], stored[i])
+                        and (scales is None or current_scales[row] == scales[i])):
+                    rows.append(row)
+                    continue
+                new.append(i)
+                lines.append(f"{next_row}\t{doc_id}\n")
+                rows.append(next_row)
+                next_row += 1
+
+            del current, current_scales
+            if new:
+                self._append(self.vectors_path, stored[new], self.dim * self.dtype.itemsize)
+                if scales is not None:
+                    self._append(self.scales_path, scales[new], 4)
+                if self.keep_full:
+                    self._append(self.full_path, vecs[new], self.dim * 4)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                self.refresh()
+        return rows
+
+    def delete(self, doc_ids: Iterable[str]):
+        with self._locked():
+            lines = [f"-\t{d}\n" for d in doc_ids if d in self._index]
+            if lines:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                self.refresh()
+
+    def compact(self, min_tombstone_ratio: float = 0.0) -> bool:
+        """
+        Rewrite live rows into a new generation, dropping tombstones.
+        Skipped (returns False) unless tombstones exceed `min_tombstone_ratio`
+        of all rows.
+        """
+        with self._locked():
+            if self.rows == 0 or self.tombstones() <= min_tombstone_ratio * self.rows:
+                return False
+            ids, rows, mat = self.live()
+            order = np.argsort(rows)
+            columns = [(mat, "vectors_path")]
+            if self.dtype == np.int8:
+                columns.append((self.scales(), "scales_path"))
+            if self.keep_full:
+                columns.append((self.full_matrix(), "full_path"))
+            old_files = [getattr(self, attr) for _, attr in columns] + [self.log_path]
+
+            self.generation += 1
+            for src, attr in columns:
+                with open(getattr(self, attr), "wb") as f:
+                    for start in range(0, len(order), 65536):
+                        f.write(np.ascontiguousarray(src[rows[order[start:start + 65536]]]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            with open(self.log_path, "w", encoding="utf-8") as f:
+                f.write("".join(f"{new_row}\t{ids[i]}\n" for new_row, i in enumerate(order)))
+            self._write_meta()
+
+            del mat, columns, src
+            for path in old_files:
+                path.unlink(missing_ok=True)
+            self._index, self._row_ids, self._log_offset = {}, [], 0
+            self._log_generation = self.generation
+            self.refresh()
+            return True
+
+    def import_npy_dir(self, npy_dir: str, delete: bool = False) -> int:
+        """
+        Pull legacy per-document `{doc_id}_emb.npy` files into the store.
+        Returns how many were imported.
+        """
+        paths = sorted(Path(npy_dir).glob("*_emb.npy"))
+        items = [(p.name[: -len("_emb.npy")], np.load(p)) for p in paths]
+        self.put_many(items)
+        if delete:
+            for p in paths:
+                p.unlink()
+        return len(items)
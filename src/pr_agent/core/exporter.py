@@ -0,0 +1,297 @@
+# pr_agent/core/exporter.py
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.core.metadata_manager import DirectoryMetadataStore
+from pr_agent.settings import settings
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+STATE_NAME = "_export_state.json"
+
+# column → (processed key, pending key). Processed documents carry the
+# lowercase json_writer payload, pending ones the Title Case discovery row.
+METADATA_COLUMNS = {
+    "source_system":     ("source_system", "Source System"),
+    "source_id":         ("source_id", "source_id"),
+    "original_filename": ("original_filename", "Original Filename"),
+    "format":            ("format", "Format"),
+    "mime_type":         ("mime_type", "MIME Type"),
+    "file_url":          ("file_url", "File URL"),
+    "status":            ("status", "Status"),
+    "date_created":      ("date_created", "Date Created"),
+    "last_modified":     ("last_modified", "Last Modified"),
+    "ingested_at":       ("ingested_at", "Ingested At"),
+    "summary":           ("summary", "Summary"),
+    "duplicate_of":      ("duplicate_of", "Duplicate Of"),
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Exporting needs pyarrow: pip install 'internal-tool[export]'") from None
+    return pa
+
+
+def corpus_schema(dim: int, include_raw: bool):
+    pa = _pyarrow()
+    fields = [pa.field("doc_id", pa.string(), nullable=False)]
+    fields += [pa.field(name, pa.string()) for name in METADATA_COLUMNS]
+    if include_raw:
+        fields.append(pa.field("raw_text", pa.large_string()))
+    fields += [
+        pa.field("raw_sha256", pa.string()),
+        pa.field("embedding", pa.list_(pa.float32(), dim)),
+        pa.field("metadata_json", pa.string()),    # the full record, for keys not promoted to columns
+    ]
+    return pa.schema(fields)
+
+
+@dataclass
+class ExportStats:
+    docs: int = 0
+    written: int = 0        # new or changed since the last export
+    unchanged: int = 0
+    removed: int = 0
+    parts: int = 0
+    compacted: bool = False
+    seconds: dict = field(default_factory=lambda: {"scan": 0.0, "write": 0.0, "compact": 0.0})
+
+
+class _PartWriter:
+    """Streams record batches into one Parquet (row group each) or Arrow IPC file."""
+    def __init__(self, path: Path, fmt: str, schema):
+        pa = _pyarrow()
+        self.path = path
+        self._tmp = path.with_name(path.name + ".tmp")
+        if fmt == "parquet":
+            self._writer = pa.parquet.ParquetWriter(str(self._tmp), schema, compression="zstd")
+            self._write = self._writer.write_batch
+        else:
+            self._sink = pa.OSFile(str(self._tmp), "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+            self._write = self._writer.write_batch
+        self.rows = 0
+
+    def write(self, batch):
+        self._write(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+        self._tmp.replace(self.path)
+
+
+def _read_part(path: Path, columns: Optional[list[str]] = None):
+    pa = _pyarrow()
+    if path.suffix == ".parquet":
+        return pa.parquet.read_table(str(path), columns=columns, memory_map=True)
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def _load_state(out: Path) -> dict:
+    path = out / STATE_NAME
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def _save_state(out: Path, state: dict):
+    path = out / STATE_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    tmp.replace(path)
+
+
+def export_corpus(out_dir: Optional[str] = None, fmt: str = "parquet", full: bool = False,
+                  include_raw: bool = True, batch_rows: Optional[int] = None,
+                  progress=None) -> ExportStats:
+    """
+    Export metadata, summaries, raw text and embeddings as Arrow columns.
+
+    Each run writes one part file with the documents that are new or
+    changed since the last export (metadata file, raw-text hash or stored
+    vector differ), streamed BATCH_ROWS at a time — one Parquet row group
+    or Arrow record batch each. _export_state.json maps every live
+    document to the part holding its current row; parts left with no live
+    rows are deleted, and once more than EXPORT_COMPACT_RATIO of all rows
+    are stale the live rows are rewritten into a single part.
+    `full=True` (or a change of format, columns or embedding dim) starts over.
+    """
+    from pr_agent.core.embedder import get_embedding_store
+    from pr_agent.core.raw_store import get_raw_store
+
+    _pyarrow()      # fail before scanning anything
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+    out = Path(out_dir or settings.EXPORT_DIR)
+    out.mkdir(parents=True, exist_ok=True)
+    batch_rows = batch_rows or settings.EXPORT_BATCH_ROWS
+    stats = ExportStats()
+
+    t0 = time.perf_counter()
+    meta_store = DirectoryMetadataStore(settings.METADATA_DIR)
+    raw_store = get_raw_store()
+    emb_store = get_embedding_store()
+    emb_store.refresh()
+    dim = emb_store.dim or 0
+
+    layout = {"format": fmt, "dim": dim, "raw": include_raw}
+    state = _load_state(out)
+    if full or state.get("layout") != layout:
+        for part in state.get("parts", {}):
+            (out / part).unlink(missing_ok=True)
+        state = {}
+    state.setdefault("layout", layout)
+    state.setdefault("parts", {})      # part file → rows written to it
+    state.setdefault("docs", {})       # doc_id → [fingerprint, part file]
+    state.setdefault("next_part", 1)
+
+    ids = sorted(meta_store.get_all_ids())
+    vector_fps = emb_store.fingerprints(ids)
+    fingerprints = {}
+    for doc_id, vec_fp in zip(ids, vector_fps):
+        st = (meta_store.dir / f"{doc_id}.json").stat()
+        fingerprints[doc_id] = f"{st.st_mtime_ns}:{st.st_size}:{raw_store.get_hash(doc_id)}:{vec_fp}"
+    docs = state["docs"]
+    changed = [d for d in ids if d not in docs or docs[d][0] != fingerprints[d]]
+    removed = set(docs) - set(ids)
+    stats.docs, stats.written = len(ids), len(changed)
+    stats.unchanged, stats.removed = len(ids) - len(changed), len(removed)
+    stats.seconds["scan"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    schema = corpus_schema(dim, include_raw)
+    if changed:
+        part = f"part-{state['next_part']:05d}{EXPORT_FORMATS[fmt]}"
+        state["next_part"] += 1
+        writer = _PartWriter(out / part, fmt, schema)
+        for start in range(0, len(changed), batch_rows):
+            batch_ids = changed[start:start + batch_rows]
+            writer.write(_record_batch(schema, batch_ids, meta_store, raw_store, emb_store, include_raw))
+            if progress:
+                progress(min(start + batch_rows, len(changed)), len(changed))
+        writer.close()
+        state["parts"][part] = writer.rows
+        for doc_id in changed:
+            docs[doc_id] = [fingerprints[doc_id], part]
+    for doc_id in removed:
+        del docs[doc_id]
+    live_parts = {part for _, part in docs.values()}
+    for part in [p for p in state["parts"] if p not in live_parts]:
+        (out / part).unlink(missing_ok=True)
+        del state["parts"][part]
+    _save_state(out, state)
+    stats.seconds["write"] = time.perf_counter() - t0
+
+    total_rows = sum(state["parts"].values())
+    if len(state["parts"]) > 1 and total_rows and 1 - len(docs) / total_rows > settings.EXPORT_COMPACT_RATIO:
+        t0 = time.perf_counter()
+        _compact(out, state, schema)
+        stats.compacted = True
+        stats.seconds["compact"] = time.perf_counter() - t0
+    stats.parts = len(state["parts"])
+    return stats
+
+
+def _record_batch(schema, doc_ids: list[str], meta_store, raw_store, emb_store, include_raw: bool):
+    pa = _pyarrow()
+    metas = meta_store.read_many(doc_ids)
+    columns = {"doc_id": doc_ids}
+    for name, (key, pending_key) in METADATA_COLUMNS.items():
+        values = []
+        for doc_id in doc_ids:
+            meta = metas.get(doc_id, {})
+            value = meta.get(key, meta.get(pending_key))
+            values.append(None if value in (None, "") else str(value))
+        columns[name] = values
+    if include_raw:
+        columns["raw_text"] = [raw_store.read_text(d) if d in raw_store else None for d in doc_ids]
+    columns["raw_sha256"] = [raw_store.get_hash(d) for d in doc_ids]
+    columns["metadata_json"] = [json.dumps(metas.get(d, {}), ensure_ascii=False) for d in doc_ids]
+
+    vecs, found = emb_store.get_many(doc_ids)
+    dim = schema.field("embedding").type.list_size
+    if vecs.shape[1] != dim:
+        vecs = np.zeros((len(doc_ids), dim), dtype=np.float32)
+        found[:] = False
+    embedding = pa.FixedSizeListArray.from_arrays(pa.array(vecs.reshape(-1), type=pa.float32()), dim,
+                                                  mask=pa.array(~found))
+    arrays = [embedding if f.name == "embedding" else pa.array(columns[f.name], type=f.type) for f in schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _compact(out: Path, state: dict, schema):
+    """Rewrite every live row into one new part, then drop the old parts."""
+    table = load_corpus(out)
+    fmt = state["layout"]["format"]
+    part = f"part-{state['next_part']:05d}{EXPORT_FORMATS[fmt]}"
+    state["next_part"] += 1
+    writer = _PartWriter(out / part, fmt, schema)
+    for batch in table.cast(schema).to_batches(max_chunksize=settings.EXPORT_BATCH_ROWS):
+        writer.write(batch)
+    writer.close()
+    old = list(state["parts"])
+    state["parts"] = {part: writer.rows}
+    for doc_id in state["docs"]:
+        state["docs"][doc_id][1] = part
+    _save_state(out, state)
+    for p in old:
+        (out / p).unlink(missing_ok=True)
+
+
+def load_corpus(out_dir: Optional[str] = None, columns: Optional[list[str]] = None):
+    """
+    The exported corpus as one pyarrow Table, current rows only. Parts
+    are memory-mapped; after a full export or a compaction this is a
+    single columnar read. `columns` limits what is read (doc_id is always
+    included).
+    """
+    pa = _pyarrow()
+    import pyarrow.compute as pc
+
+    out = Path(out_dir or settings.EXPORT_DIR)
+    state = _load_state(out)
+    if not state.get("parts"):
+        raise FileNotFoundError(f"No export in {out}; run `internal export` first")
+    if columns is not None and "doc_id" not in columns:
+        columns = ["doc_id", *columns]
+
+    by_part: dict[str, list[str]] = {}
+    for doc_id, (_, part) in state["docs"].items():
+        by_part.setdefault(part, []).append(doc_id)
+    tables = []
+    for part, rows in state["parts"].items():
+        live = by_part.get(part, [])
+        table = _read_part(out / part, columns)
+        if len(live) < rows:        # some rows were superseded by a later part
+            table = table.filter(pc.is_in(table["doc_id"], value_set=pa.array(live)))
+        tables.append(table)
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+
+def embedding_matrix(table) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (matrix, has_vector) from a loaded table's embedding column: an
+    (n, dim) float32 view of the Arrow buffer where possible, no copying
+    per row. Rows without a vector are zeros.
+    """
+    column = table.column("embedding").combine_chunks()
+    dim = column.type.list_size
+    values = column.values.slice(column.offset * dim, len(column) * dim)
+    matrix = values.to_numpy(zero_copy_only=False).reshape(-1, dim)
+    has_vector = ~column.is_null().to_numpy(zero_copy_only=False)
+    if not has_vector.all():
+        matrix = np.where(has_vector[:, None], matrix, 0.0).astype(np.float32)
+    return matrix, has_vector
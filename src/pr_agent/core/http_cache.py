@@ -0,0 +1,138 @@
+# pr_agent/core/http_cache.py
+
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.settings import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       TEXT PRIMARY KEY,
+    body      BLOB NOT NULL,     -- zlib-compressed response body
+    etag      TEXT,              -- HTTP ETag, sent back as If-None-Match
+    validator TEXT,              -- e.g. a Notion page's last_edited_time
+    size      INTEGER NOT NULL,  -- compressed bytes, what the size bound counts
+    used_at   REAL NOT NULL,
+    fetched_at REAL              -- when the request that produced the body went out
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses(used_at);
+"""
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: Optional[str] = None
+    validator: Optional[str] = None
+    fetched_at: Optional[float] = None
+
+
+class HttpCache:
+    """
+    API response bodies on disk (one SQLite file in HTTP_CACHE_DIR), each
+    with what is needed to tell whether it is still current: the ETag for
+    a conditional request, or a validator the caller compares itself
+    (Notion sends no ETags, so a page's children are kept against the
+    page's last_edited_time). Least recently used entries are evicted once
+    the cache grows past HTTP_CACHE_MAX_MB; a single body larger than an
+    eighth of that is not cached at all.
+    """
+    def __init__(self, path: Path, max_bytes: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        if "fetched_at" not in columns:     # caches written before the column existed
+            self._db.execute("ALTER TABLE responses ADD COLUMN fetched_at REAL")
+        self._lock = threading.Lock()
+        self._size = self._total()
+
+    def _total(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, validator, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        return CachedResponse(zlib.decompress(row[0]), row[1], row[2], row[3])
+
+    def put(self, key: str, body: bytes, etag: Optional[str] = None, validator: Optional[str] = None,
+            fetched_at: Optional[float] = None):
+        if not etag and not validator:
+            return      # nothing to revalidate against later
+        packed = zlib.compress(body, 1)
+        if len(packed) > self.max_bytes // 8:
+            self.delete(key)
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, body, etag, validator, size, used_at, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, packed, etag, validator, len(packed), time.time(), fetched_at or time.time()),
+            )
+            self._size += len(packed) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= row[0]
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of the bound (caller holds the lock)."""
+        # other processes share the file: start from the real total
+        self._size = self._total()
+        excess = self._size - int(self.max_bytes * 0.9)
+        if excess <= 0:
+            return
+        freed = 0
+        keys = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY used_at"):
+            keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in keys])
+        self._size -= freed
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"entries": entries, "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+_cache: Optional[HttpCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """The process-wide cache, or None when HTTP_CACHE_ENABLED is off."""
+    global _cache
+    if not settings.HTTP_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(Path(settings.HTTP_CACHE_DIR) / "responses.sqlite",
+                               int(settings.HTTP_CACHE_MAX_MB * 2**20))
+        return _cache
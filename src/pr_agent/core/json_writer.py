@@ -19,6 +19,7 @@ def build_json_payload(metadata_row: dict,
       - status
       - summary
       - embedding_file_path
+      - duplicate_of (canonical document of a near-duplicate, else "")
     """
     return {
         "source_id":          metadata_row.get("source_id",""),
@@ -35,6 +36,8 @@ def build_json_payload(metadata_row: dict,
         "embedding_file_path": embedding_path,
         "file_url":            metadata_row.get("File URL", ""),
         "mime_type":            metadata_row.get("MIME Type", ""),
+        "duplicate_of":         metadata_row.get("Duplicate Of", ""),
+        "duplicate_similarity": metadata_row.get("Duplicate Similarity"),
     }
 
 def write_json_file(payload: dict, doc_id: str, output_dir: str) -> str:
@@ -44,6 +47,10 @@ def write_json_file(payload: dict, doc_id: str, output_dir: str) -> str:
     """
     os.makedirs(output_dir, exist_ok=True)
     filepath = os.path.join(output_dir, f"{doc_id}.json")
-    with open(filepath, "w", encoding="utf-8") as f:
+    # write-then-rename, like DirectoryMetadataStore.upsert: other workers
+    # may be reading the file
+    tmp = filepath + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, filepath)
     return filepath
@@ -0,0 +1,483 @@
+# pr_agent/core/keyword_index.py
+
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+
+from pr_agent.settings import settings
+
+# Terms are runs of letters/digits, lower-cased: "PROJ-1234" → proj, 1234.
+# Anything longer is binary noise (base64, hashes) and is not indexed.
+_TERM = re.compile(r"[^\W_]+")
+MAX_TERM_LEN = 64
+
+_WIDTHS = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TERM.findall((text or "").lower()) if len(t) <= MAX_TERM_LEN]
+
+
+def term_counts(text: str) -> Counter:
+    """tokenize() as a Counter; long terms are dropped per distinct term."""
+    counts = Counter(_TERM.findall((text or "").lower()))
+    for term in [t for t in counts if len(t) > MAX_TERM_LEN]:
+        del counts[term]
+    return counts
+
+
+def _width(max_value: int) -> int:
+    return 1 if max_value < 1 << 8 else 2 if max_value < 1 << 16 else 4
+
+
+def unpack_postings(blob: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """One posting list → (doc numbers, term frequencies as float32)."""
+    gw, tw = blob[0] & 0xF, blob[0] >> 4
+    n = (len(blob) - 1) // (gw + tw)
+    gaps = np.frombuffer(blob, dtype=_WIDTHS[gw], count=n, offset=1)
+    tfs = np.frombuffer(blob, dtype=_WIDTHS[tw], count=n, offset=1 + n * gw)
+    return np.cumsum(gaps, dtype=np.int64), tfs.astype(np.float32)
+
+
+def _pack_ids(ids: np.ndarray) -> bytes:
+    """Sorted term ids → width byte + gaps (a document's term list)."""
+    gaps = np.diff(ids, prepend=0)
+    width = 1 if not len(gaps) or gaps.max() < 1 << 8 else 2 if gaps.max() < 1 << 16 else 4
+    return bytes([width]) + gaps.astype(_WIDTHS[width]).tobytes()
+
+
+def _unpack_ids(blob: bytes) -> np.ndarray:
+    return np.cumsum(np.frombuffer(blob, dtype=_WIDTHS[blob[0]], offset=1), dtype=np.int64)
+
+
+def _decode_many(blobs: list[Optional[bytes]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Many posting lists → flat (list index, doc number, tf) arrays. Lists
+    are grouped by width class so each group is decoded with one
+    frombuffer/cumsum instead of a numpy round-trip per list.
+    """
+    groups: dict[int, tuple[list, list, list, list]] = {}
+    for i, blob in enumerate(blobs):
+        if not blob:
+            continue
+        gw, tw = blob[0] & 0xF, blob[0] >> 4
+        n = (len(blob) - 1) // (gw + tw)
+        g = groups.setdefault(blob[0], ([], [], [], []))
+        g[0].append(i)
+        g[1].append(n)
+        g[2].append(blob[1:1 + n * gw])
+        g[3].append(blob[1 + n * gw:])
+    segs, nums, tfs = [], [], []
+    for header, (idx, ns, gaps, freqs) in groups.items():
+        ns = np.array(ns, dtype=np.int64)
+        csum = np.cumsum(np.frombuffer(b"".join(gaps), dtype=_WIDTHS[header & 0xF]), dtype=np.int64)
+        base = np.concatenate([[0], csum])[np.cumsum(ns) - ns]     # running total before each list
+        nums.append(csum - np.repeat(base, ns))
+        tfs.append(np.frombuffer(b"".join(freqs), dtype=_WIDTHS[header >> 4]).astype(np.int64))
+        segs.append(np.repeat(np.array(idx, dtype=np.int64), ns))
+    if not segs:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(segs), np.concatenate(nums), np.concatenate(tfs)
+
+
+def _encode_many(tids: np.ndarray, nums: np.ndarray, tfs: np.ndarray) -> dict[int, tuple[int, bytes]]:
+    """
+    Flat (term id, doc number, tf) rows sorted by term then doc → term id →
+    (df, posting list). A list is one header byte (gap width | tf width << 4)
+    then its doc-number gaps and its tfs, each at the narrowest of 1/2/4
+    bytes that fits that list: a common term costs ~2 bytes per document.
+    """
+    if not len(tids):
+        return {}
+    starts = np.r_[0, np.flatnonzero(np.diff(tids)) + 1]
+    lens = np.diff(np.r_[starts, len(tids)])
+    gaps = np.diff(nums, prepend=0)
+    gaps[starts] = nums[starts]
+    tfs = np.minimum(tfs, (1 << 16) - 1)
+    widths = lambda m: np.where(m < 1 << 8, 1, np.where(m < 1 << 16, 2, 4))
+    headers = widths(np.maximum.reduceat(gaps, starts)) | widths(np.maximum.reduceat(tfs, starts)) << 4
+    seg_tids = tids[starts].tolist()
+
+    out = {}
+    for header in np.unique(headers).tolist():
+        gw, tw = header & 0xF, header >> 4
+        in_class = headers == header
+        rows = np.repeat(in_class, lens)
+        gap_bytes = gaps[rows].astype(_WIDTHS[gw]).tobytes()
+        tf_bytes = tfs[rows].astype(_WIDTHS[tw]).tobytes()
+        segs = np.flatnonzero(in_class)
+        ends = np.cumsum(lens[segs]).tolist()
+        head = bytes([header])
+        begin = 0
+        for seg, end in zip(segs.tolist(), ends):
+            out[seg_tids[seg]] = (end - begin, head + gap_bytes[begin * gw:end * gw]
+                                  + tf_bytes[begin * tw:end * tw])
+            begin = end
+    return out
+
+
+def parse_query(query: str) -> tuple[list[str], list[list[str]]]:
+    """
+    Query → (terms to score, phrases that must appear verbatim). Quoted
+    text is a phrase, and so is a single word that splits into several
+    terms — a ticket id like PROJ-1234 or an e-mail address.
+    """
+    phrases = []
+    for quoted in re.findall(r'"([^"]+)"', query):
+        terms = tokenize(quoted)
+        if terms:
+            phrases.append(terms)
+    for word in re.sub(r'"[^"]*"', " ", query).split():
+        terms = tokenize(word)
+        if len(terms) > 1:
+            phrases.append(terms)
+    return tokenize(query), phrases
+
+
+def _phrase_pattern(terms: list[str]) -> re.Pattern:
+    return re.compile(r"(?<![^\W_])" + r"[\W_]+".join(map(re.escape, terms)) + r"(?![^\W_])",
+                      re.IGNORECASE)
+
+
+@dataclass
+class KeywordStats:
+    docs: int = 0           # documents looked at
+    indexed: int = 0        # new or changed text → postings rewritten
+    unchanged: int = 0
+    removed: int = 0
+    terms: int = 0          # posting lists rewritten
+    seconds: dict = field(default_factory=lambda: {"read": 0.0, "tokenize": 0.0, "write": 0.0})
+
+    def add(self, other: "KeywordStats"):
+        for name in ("docs", "indexed", "unchanged", "removed", "terms"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for stage, secs in other.seconds.items():
+            self.seconds[stage] += secs
+
+
+class KeywordIndex:
+    """
+    On-disk BM25 inverted index over raw text, in one SQLite file:
+
+        terms(term_id, term, df, postings)   compressed posting list per term
+        docs(num, doc_id, length, text_hash, terms)
+                                             per document: length in terms,
+                                             the raw-text sha256 it was built
+                                             from and its term ids (so an
+                                             update knows which lists to edit)
+
+    Updates rewrite only the posting lists of terms the changed documents
+    had or now have. Searching decodes the query terms' lists and scores
+    them into a dense array indexed by document number, so a query costs
+    a handful of row lookups plus vectorised arithmetic.
+    """
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS terms ("
+            " term_id INTEGER PRIMARY KEY, term TEXT UNIQUE, df INTEGER, postings BLOB);"
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " num INTEGER PRIMARY KEY, doc_id TEXT UNIQUE, length INTEGER, text_hash TEXT, terms BLOB);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._doc_ids: list[Optional[str]] = []
+        self._lengths = np.empty(0, dtype=np.float32)
+        self._avgdl = 0.0
+        self._n_docs = 0
+
+    # ─── maintenance ───────────────────────────────────────────────────────
+    def text_hashes(self, doc_ids: Optional[Iterable[str]] = None) -> dict[str, str]:
+        """doc_id → text hash of every indexed document, or only of `doc_ids`."""
+        with self._lock:
+            if doc_ids is None:
+                return dict(self._db.execute("SELECT doc_id, text_hash FROM docs"))
+            doc_ids = list(doc_ids)
+            out = {}
+            for start in range(0, len(doc_ids), 500):
+                part = doc_ids[start:start + 500]
+                marks = ",".join("?" * len(part))
+                out.update(self._db.execute(
+                    f"SELECT doc_id, text_hash FROM docs WHERE doc_id IN ({marks})", part))
+            return out
+
+    def update(self, docs: dict[str, str], text_hashes: Optional[dict[str, str]] = None) -> KeywordStats:
+        """
+        Index (or re-index) the raw text of many documents in one
+        transaction. Documents whose text hash is unchanged are skipped.
+        """
+        stats = KeywordStats(docs=len(docs))
+        t0 = time.perf_counter()
+        text_hashes = text_hashes or {
+            doc_id: hashlib.sha256(text.encode("utf-8")).hexdigest() for doc_id, text in docs.items()
+        }
+        known = self.text_hashes(docs)
+        docs = {d: t for d, t in docs.items() if known.get(d) != text_hashes[d]}
+        stats.unchanged = stats.docs - len(docs)
+        counts = {doc_id: term_counts(text) for doc_id, text in docs.items()}
+        stats.indexed = len(counts)
+        stats.seconds["tokenize"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if counts:
+            stats.terms = self._apply(counts, text_hashes, [])
+        stats.seconds["write"] = time.perf_counter() - t0
+        return stats
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        doc_ids = list(doc_ids)
+        if doc_ids:
+            self._apply({}, {}, doc_ids)
+        return len(doc_ids)
+
+    def _apply(self, counts: dict[str, Counter], text_hashes: dict[str, str], removed: list[str]) -> int:
+        with self._lock:
+            db = self._db
+            # take the write lock before reading: several worker processes may
+            # update the index, and ids / posting lists are read-modify-write
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {}
+                names = list(counts) + removed
+                for start in range(0, len(names), 500):
+                    part = names[start:start + 500]
+                    marks = ",".join("?" * len(part))
+                    for num, doc_id, blob in db.execute(
+                            f"SELECT num, doc_id, terms FROM docs WHERE doc_id IN ({marks})", part):
+                        existing[doc_id] = (num, blob)
+
+                # postings of every old version go; doc numbers are kept across updates
+                dropped = np.array(sorted(num for num, _ in existing.values()), dtype=np.int64)
+                affected = set()
+                for _, blob in existing.values():
+                    affected.update(_unpack_ids(blob).tolist())
+
+                next_num = (db.execute("SELECT MAX(num) FROM docs").fetchone()[0] or 0) + 1
+                nums = {}
+                for doc_id in counts:
+                    if doc_id in existing:
+                        nums[doc_id] = existing[doc_id][0]
+                    else:
+                        nums[doc_id], next_num = next_num, next_num + 1
+
+                # term ids, creating the ones never seen before
+                vocab = sorted({t for c in counts.values() for t in c})
+                term_ids = {}
+                for start in range(0, len(vocab), 500):
+                    part = vocab[start:start + 500]
+                    marks = ",".join("?" * len(part))
+                    term_ids.update(db.execute(f"SELECT term, term_id FROM terms WHERE term IN ({marks})", part))
+                fresh = [t for t in vocab if t not in term_ids]
+                if fresh:
+                    first = (db.execute("SELECT MAX(term_id) FROM terms").fetchone()[0] or 0) + 1
+                    term_ids.update((t, first + i) for i, t in enumerate(fresh))
+                    db.executemany("INSERT INTO terms (term_id, term, df, postings) VALUES (?, ?, 0, NULL)",
+                                   [(term_ids[t], t) for t in fresh])
+
+                # new postings as flat (term, doc, tf) rows
+                add_t, add_n, add_f, doc_rows = [], [], [], []
+                for doc_id, c in counts.items():
+                    ids = np.fromiter((term_ids[t] for t in c), dtype=np.int64, count=len(c))
+                    add_t.append(ids)
+                    add_n.append(np.full(len(c), nums[doc_id], dtype=np.int64))
+                    add_f.append(np.fromiter(c.values(), dtype=np.int64, count=len(c)))
+                    doc_rows.append((nums[doc_id], doc_id, sum(c.values()), text_hashes[doc_id],
+                                     _pack_ids(np.sort(ids))))
+                empty = np.empty(0, dtype=np.int64)
+                add_t, add_n, add_f = (np.concatenate(a) if a else empty for a in (add_t, add_n, add_f))
+                affected.update(np.unique(add_t).tolist())
+
+                # rewrite every affected posting list once: decode, drop the old
+                # versions, add the new rows, re-encode — all as flat arrays
+                affected = sorted(affected)
+                current = {}
+                for start in range(0, len(affected), 500):
+                    part = affected[start:start + 500]
+                    marks = ",".join("?" * len(part))
+                    current.update(db.execute(
+                        f"SELECT term_id, postings FROM terms WHERE term_id IN ({marks})", part))
+                seg, old_n, old_f = _decode_many([current.get(tid) for tid in affected])
+                old_t = np.asarray(affected, dtype=np.int64)[seg]
+                if len(dropped):
+                    keep = ~np.isin(old_n, dropped)
+                    old_t, old_n, old_f = old_t[keep], old_n[keep], old_f[keep]
+                all_t, all_n, all_f = (np.concatenate(pair) for pair in
+                                       ((old_t, add_t), (old_n, add_n), (old_f, add_f)))
+                order = np.lexsort((all_n, all_t))
+                encoded = _encode_many(all_t[order], all_n[order], all_f[order])
+                updates = [(df, blob, tid) for tid, (df, blob) in encoded.items()]
+                empty = [(tid,) for tid in affected if tid not in encoded]
+                db.executemany("UPDATE terms SET df = ?, postings = ? WHERE term_id = ?", updates)
+                db.executemany("DELETE FROM terms WHERE term_id = ?", empty)
+
+                db.executemany("DELETE FROM docs WHERE doc_id = ?", [(d,) for d in removed])
+                db.executemany(
+                    "INSERT OR REPLACE INTO docs (num, doc_id, length, text_hash, terms) VALUES (?, ?, ?, ?, ?)",
+                    doc_rows,
+                )
+                db.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                           "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+            except BaseException:
+                db.rollback()
+                raise
+            db.commit()
+            return len(affected)
+
+    # ─── search ────────────────────────────────────────────────────────────
+    def _refresh(self):
+        """Reload the per-document table when the index changed on disk."""
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        generation = row[0] if row else 0
+        if generation == self._generation:
+            return
+        rows = self._db.execute("SELECT num, doc_id, length FROM docs").fetchall()
+        size = max((r[0] for r in rows), default=0) + 1
+        self._doc_ids = [None] * size
+        self._lengths = np.zeros(size, dtype=np.float32)
+        for num, doc_id, length in rows:
+            self._doc_ids[num] = doc_id
+            self._lengths[num] = length
+        self._n_docs = len(rows)
+        self._avgdl = float(self._lengths.sum()) / max(len(rows), 1)
+        self._generation = generation
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._n_docs
+
+    def search(self, query: str, top_k: int = 10) -> list[tuple[str, float]]:
+        """
+        BM25 (k1=BM25_K1, b=BM25_B) top-k for `query`, best first. Every
+        phrase in the query (see parse_query) must occur in the document:
+        postings narrow the candidates, the raw text confirms the phrase.
+        """
+        terms, phrases = parse_query(query)
+        if not terms:
+            return []
+        k1, b = settings.BM25_K1, settings.BM25_B
+        with self._lock:
+            self._refresh()
+            unique = sorted(set(terms))
+            marks = ",".join("?" * len(unique))
+            lists = {t: (df, blob) for t, df, blob in self._db.execute(
+                f"SELECT term, df, postings FROM terms WHERE term IN ({marks})", unique)}
+            n_docs, avgdl, lengths, doc_ids = self._n_docs, self._avgdl, self._lengths, self._doc_ids
+
+        required = {t for p in phrases for t in p}
+        if required - set(lists):
+            return []               # a phrase word occurs nowhere
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        mask = np.ones(len(lengths), dtype=bool) if required else None
+        for term in unique:
+            if term not in lists:
+                continue
+            df, blob = lists[term]
+            nums, tfs = unpack_postings(blob)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[nums] / avgdl)
+            scores[nums] += idf * tfs * (k1 + 1.0) / (tfs + norm)
+            if term in required:
+                present = np.zeros(len(lengths), dtype=bool)
+                present[nums] = True
+                mask &= present
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        hits = np.flatnonzero(scores)
+        if not phrases:
+            if len(hits) > top_k:
+                hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+            hits = hits[np.argsort(-scores[hits], kind="stable")]
+            return [(doc_ids[i], float(scores[i])) for i in hits]
+
+        # candidates contain every phrase word; check word order in the text
+        from pr_agent.core.raw_store import get_raw_store
+
+        raw_store = get_raw_store()
+        patterns = [_phrase_pattern(p) for p in phrases]
+        out = []
+        hits = hits[np.argsort(-scores[hits], kind="stable")][:settings.KEYWORD_PHRASE_CHECK]
+        for i in hits:
+            try:
+                text = raw_store.read_text(doc_ids[i])
+            except KeyError:
+                continue
+            if all(p.search(text) for p in patterns):
+                out.append((doc_ids[i], float(scores[i])))
+                if len(out) == top_k:
+                    break
+        return out
+
+
+_index: Optional[KeywordIndex] = None
+
+def get_keyword_index() -> KeywordIndex:
+    global _index
+    if _index is None:
+        root = settings.KEYWORD_INDEX_DIR
+        root.mkdir(parents=True, exist_ok=True)
+        _index = KeywordIndex(root / "bm25.sqlite")
+    return _index
+
+
+def build_keyword_index(doc_ids: Optional[list[str]] = None, full: bool = False,
+                        batch_docs: Optional[int] = None, progress=None) -> KeywordStats:
+    """
+    Bring the keyword index up to date with the raw-text store (or just
+    `doc_ids`). A document is only read and tokenized when its raw-text
+    hash differs from the one it was indexed with, so a no-op run costs one
+    ref read per document. Documents no longer in the store, or marked as
+    near-duplicates, are dropped.
+    `full=True` discards the index and rebuilds it.
+    """
+    from pr_agent.core.raw_store import get_raw_store
+
+    global _index
+    if full:
+        _index = None
+        (settings.KEYWORD_INDEX_DIR / "bm25.sqlite").unlink(missing_ok=True)
+    index = get_keyword_index()
+    raw_store = get_raw_store()
+    batch_docs = batch_docs or settings.KEYWORD_DOC_BATCH
+    total = KeywordStats()
+
+    known = index.text_hashes()
+    if doc_ids is None:
+        # near-duplicates are searchable through their canonical document
+        from pr_agent.core.dedup import get_dedup_index
+
+        duplicates = {d for d, _ in get_dedup_index().duplicates()}
+        doc_ids = sorted(raw_store.get_all_ids() - duplicates)
+        total.removed = index.remove(sorted(set(known) - set(doc_ids)))
+    hashes = {d: raw_store.get_hash(d) for d in doc_ids}
+    todo = [d for d in doc_ids if hashes[d] is None or known.get(d) != hashes[d]]
+    total.docs = len(doc_ids)
+    total.unchanged = len(doc_ids) - len(todo)
+
+    for start in range(0, len(todo), batch_docs):
+        batch = todo[start:start + batch_docs]
+        t0 = time.perf_counter()
+        texts = {d: raw_store.read_text(d) for d in batch}
+        read_secs = time.perf_counter() - t0
+        # legacy _raw.json documents have no ref hash: hash the text instead
+        stats = index.update(texts, {
+            d: hashes[d] or hashlib.sha256(texts[d].encode("utf-8")).hexdigest() for d in batch
+        })
+        stats.docs = 0
+        stats.seconds["read"] = read_secs
+        total.add(stats)
+        if progress:
+            progress(min(start + batch_docs, len(todo)), len(todo), stats)
+    return total
@@ -0,0 +1,252 @@
+# pr_agent/core/leases.py
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.settings import settings
+
+LEASE_BACKENDS = ("directory", "sqlite")
+
+
+def worker_id() -> str:
+    """host:pid:nonce, unique per worker and readable in a lease."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """'i/n' → (i, n), with 0 <= i < n."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/n, e.g. 0/4 (got {spec!r})") from None
+    if n < 1:
+        raise ValueError(f"Shard count must be at least 1 (got {spec!r})")
+    if not 0 <= i < n:
+        raise ValueError(f"Shard index must be in 0..{n - 1} (got {spec!r})")
+    return i, n
+
+
+def in_shard(doc_id: str, shard: Optional[tuple[int, int]]) -> bool:
+    """Stable assignment of documents to shards (crc32 of the id, mod n)."""
+    if shard is None:
+        return True
+    i, n = shard
+    return zlib.crc32(doc_id.encode("utf-8")) % n == i
+
+
+class LeaseManager:
+    """
+    Claims documents for one worker, so several workers (processes or
+    machines) can share a metadata store without working on the same
+    document. A lease is (owner, expires_at): it is granted when no
+    unexpired lease exists, renewed by the heartbeat while the worker
+    holds it, and taken over by another worker once it has expired, i.e.
+    its holder crashed or stalled for LEASE_TTL seconds. Subclasses
+    provide the atomic acquire / renew / release primitives.
+    """
+    def __init__(self, owner: Optional[str] = None, ttl: Optional[float] = None):
+        self.owner = owner or worker_id()
+        self.ttl = ttl or settings.LEASE_TTL
+        self.held: set[str] = set()
+        self.lost: set[str] = set()     # leases that expired and were taken over while held
+        self._lock = threading.Lock()
+
+    def _acquire(self, doc_id: str, now: float) -> bool:
+        raise NotImplementedError
+
+    def _renew(self, doc_id: str, now: float) -> bool:
+        raise NotImplementedError
+
+    def _release(self, doc_id: str):
+        raise NotImplementedError
+
+    def acquire(self, doc_id: str) -> bool:
+        if not self._acquire(doc_id, time.time()):
+            return False
+        with self._lock:
+            self.held.add(doc_id)
+            self.lost.discard(doc_id)
+        return True
+
+    def release(self, doc_id: str):
+        with self._lock:
+            self.held.discard(doc_id)
+        self._release(doc_id)
+
+    def renew_all(self):
+        """Extend every held lease by LEASE_TTL; note the ones already lost."""
+        with self._lock:
+            doc_ids = list(self.held)
+        for doc_id in doc_ids:
+            if not self._renew(doc_id, time.time()):
+                with self._lock:
+                    self.held.discard(doc_id)
+                    self.lost.add(doc_id)
+                print(f"⚠ Lease on {doc_id} expired and was taken over by another worker.")
+
+    @contextmanager
+    def claim(self, doc_id: str):
+        """`with leases.claim(doc_id) as claimed:` — released on exit if claimed."""
+        claimed = self.acquire(doc_id)
+        try:
+            yield claimed
+        finally:
+            if claimed:
+                self.release(doc_id)
+
+    @contextmanager
+    def heartbeat(self, interval: Optional[float] = None):
+        """
+        Renew held leases every `interval` seconds (default a third of the
+        TTL) from a background thread; release whatever is still held on exit.
+        """
+        interval = interval or self.ttl / 3
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                self.renew_all()
+
+        thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+            for doc_id in list(self.held):
+                self.release(doc_id)
+
+
+class DirectoryLeaseManager(LeaseManager):
+    """
+    One <doc_id>.lease JSON file per claimed document, for metadata
+    directories shared between workers (also across machines, on a
+    shared filesystem). Acquiring hard-links a fully written temporary
+    file into place, which fails if the lease exists. An expired lease is
+    first renamed aside, which only one worker can do; if what it moved
+    turns out to be live (renewed in between), it is linked back.
+    """
+    def __init__(self, root: Path, owner: Optional[str] = None, ttl: Optional[float] = None):
+        super().__init__(owner, ttl)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, doc_id: str) -> Path:
+        return self.root / f"{doc_id}.lease"
+
+    def _write_tmp(self, doc_id: str, now: float) -> Path:
+        tmp = self.root / f".{doc_id}.{uuid.uuid4().hex}.tmp"
+        tmp.write_text(json.dumps({"owner": self.owner, "expires_at": now + self.ttl}), encoding="utf-8")
+        return tmp
+
+    @staticmethod
+    def _read(path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _acquire(self, doc_id: str, now: float) -> bool:
+        path = self._path(doc_id)
+        tmp = self._write_tmp(doc_id, now)
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, path)      # atomic create-if-absent
+                    return True
+                except FileExistsError:
+                    pass
+                current = self._read(path)
+                if current is not None and current["expires_at"] > now:
+                    return False
+                if not self._steal(path, now):
+                    return False
+            return False
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _steal(self, path: Path, now: float) -> bool:
+        aside = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.stale")
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            return True         # released or stolen meanwhile: try to link again
+        moved = self._read(aside)
+        if moved is not None and moved["expires_at"] > now:
+            try:
+                os.link(aside, path)
+            except FileExistsError:
+                pass
+            aside.unlink(missing_ok=True)
+            return False
+        aside.unlink(missing_ok=True)
+        return True
+
+    def _renew(self, doc_id: str, now: float) -> bool:
+        path = self._path(doc_id)
+        current = self._read(path)
+        if current is None or current["owner"] != self.owner:
+            return False
+        self._write_tmp(doc_id, now).replace(path)
+        return True
+
+    def _release(self, doc_id: str):
+        path = self._path(doc_id)
+        current = self._read(path)
+        if current is not None and current["owner"] == self.owner:
+            path.unlink(missing_ok=True)
+
+
+class SqliteLeaseManager(LeaseManager):
+    """
+    Leases as rows of a SQLite table, for workers on one host (or a
+    database file they all reach). Acquire is a single conditional
+    upsert, atomic under SQLite's write lock: it inserts the lease, or
+    takes over a row whose lease has expired, or changes nothing.
+    """
+    def __init__(self, path, owner: Optional[str] = None, ttl: Optional[float] = None):
+        super().__init__(owner, ttl)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS leases "
+                         "(doc_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._db_lock = threading.Lock()
+
+    def _acquire(self, doc_id: str, now: float) -> bool:
+        with self._db_lock:
+            cur = self._db.execute(
+                "INSERT INTO leases (doc_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (doc_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ?",
+                (doc_id, self.owner, now + self.ttl, now))
+            return cur.rowcount == 1
+
+    def _renew(self, doc_id: str, now: float) -> bool:
+        with self._db_lock:
+            cur = self._db.execute("UPDATE leases SET expires_at = ? WHERE doc_id = ? AND owner = ?",
+                                   (now + self.ttl, doc_id, self.owner))
+            return cur.rowcount == 1
+
+    def _release(self, doc_id: str):
+        with self._db_lock:
+            self._db.execute("DELETE FROM leases WHERE doc_id = ? AND owner = ?", (doc_id, self.owner))
+
+
+def get_lease_manager() -> LeaseManager:
+    """A lease manager for this worker, on LEASE_BACKEND."""
+    if settings.LEASE_BACKEND not in LEASE_BACKENDS:
+        raise ValueError(f"Unknown LEASE_BACKEND: {settings.LEASE_BACKEND!r} "
+                         f"(expected one of {', '.join(LEASE_BACKENDS)})")
+    if settings.LEASE_BACKEND == "sqlite":
+        settings.LEASE_DIR.mkdir(parents=True, exist_ok=True)
+        return SqliteLeaseManager(settings.LEASE_DIR / "leases.sqlite")
+    return DirectoryLeaseManager(settings.LEASE_DIR)
@@ -1,17 +1,111 @@
 # pr_agent/core/metadata_manager.py
 
+import fcntl
 import json
+import os
+import sqlite3
+from contextlib import contextmanager
 from pathlib import Path
 
-def next_document_id(existing_ids: set[str]) -> str:
-    """DIVAMI_001, DIVAMI_002… based on numeric suffixes in existing_ids."""
+ID_PREFIX = "DIVAMI_"
+ID_ALLOCATORS = ("file", "sqlite")
+
+
+def format_document_id(n: int) -> str:
+    return f"{ID_PREFIX}{n:03d}"
+
+
+def max_document_number(existing_ids) -> int:
+    """Highest numeric suffix among existing_ids (0 if there is none)."""
     suffixes = [
         int(d.split("_")[-1])
         for d in existing_ids
-        if d.startswith("DIVAMI_") and d.split("_")[-1].isdigit()
+        if d.startswith(ID_PREFIX) and d.split("_")[-1].isdigit()
     ]
-    n = max(suffixes) + 1 if suffixes else 1
-    return f"DIVAMI_{n:03d}"
+    return max(suffixes, default=0)
+
+
+def next_document_id(existing_ids: set[str]) -> str:
+    """DIVAMI_001, DIVAMI_002… based on numeric suffixes in existing_ids."""
+    return format_document_id(max_document_number(existing_ids) + 1)
+
+
+class FileIdAllocator:
+    """
+    Hands out document ids from a counter file (.next_id in the metadata
+    directory): each reservation is one read-increment-write under an
+    exclusive fcntl lock, so concurrent discoveries never mint the same
+    id, and it costs the same however many documents exist. The counter
+    is seeded from the existing ids the first time it is used.
+    """
+    def __init__(self, metadata_dir):
+        self.dir = Path(metadata_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.dir / ".next_id"
+        self._lock_path = self.dir / ".next_id.lock"
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def reserve(self, count: int = 1) -> list[str]:
+        """`count` consecutive, never-before-issued ids."""
+        with self._locked():
+            if self.path.exists():
+                first = int(self.path.read_text(encoding="utf-8"))
+            else:
+                first = max_document_number(p.stem for p in self.dir.glob("*.json")) + 1
+            tmp = self.path.with_name(".next_id.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(str(first + count))
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(self.path)
+        return [format_document_id(n) for n in range(first, first + count)]
+
+
+class SqliteIdAllocator:
+    """
+    The same as a sequence row in SQLite (ids.sqlite in the metadata
+    directory): a reservation is one IMMEDIATE transaction.
+    """
+    def __init__(self, metadata_dir):
+        self.dir = Path(metadata_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.dir / "ids.sqlite", timeout=30, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+
+    def reserve(self, count: int = 1) -> list[str]:
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT next FROM sequences WHERE name = 'document_id'").fetchone()
+            first = row[0] if row else max_document_number(p.stem for p in self.dir.glob("*.json")) + 1
+            db.execute("INSERT INTO sequences (name, next) VALUES ('document_id', ?) "
+                       "ON CONFLICT (name) DO UPDATE SET next = excluded.next", (first + count,))
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return [format_document_id(n) for n in range(first, first + count)]
+
+
+def get_id_allocator(metadata_dir):
+    """The ID_ALLOCATOR allocator for a metadata directory."""
+    from pr_agent.settings import settings
+
+    if settings.ID_ALLOCATOR not in ID_ALLOCATORS:
+        raise ValueError(f"Unknown ID_ALLOCATOR: {settings.ID_ALLOCATOR!r} "
+                         f"(expected one of {', '.join(ID_ALLOCATORS)})")
+    if settings.ID_ALLOCATOR == "sqlite":
+        return SqliteIdAllocator(metadata_dir)
+    return FileIdAllocator(metadata_dir)
+
 
 class DirectoryMetadataStore:
     """
@@ -29,6 +123,15 @@ class DirectoryMetadataStore:
         path = self.dir / f"{doc_id}.json"
         return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
 
+    def read_many(self, doc_ids) -> dict[str, dict]:
+        """Read several documents at once; missing ids are left out."""
+        out = {}
+        for doc_id in doc_ids:
+            meta = self.read(doc_id)
+            if meta is not None:
+                out[doc_id] = meta
+        return out
+
     def upsert(self, doc_id: str, metadata: dict):
         path = self.dir / f"{doc_id}.json"
         tmp  = path.with_suffix(".json.tmp")
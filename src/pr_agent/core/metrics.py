@@ -0,0 +1,204 @@
+# pr_agent/core/metrics.py
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.settings import settings
+
+# Histogram bucket upper bounds, Prometheus style (+Inf is implicit)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+PREFIX = "internal_"
+
+
+class Histogram:
+    __slots__ = ("bounds", "buckets", "count", "sum", "max")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside one."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lo + (hi - lo) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6), "mean": round(self.sum / max(self.count, 1), 6),
+                "p50": round(self.quantile(0.5), 6), "p95": round(self.quantile(0.95), 6),
+                "max": round(self.max, 6)}
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: dict):
+        self.metrics, self.name, self.labels = metrics, name, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+class Metrics:
+    """
+    Counters and histograms for one run, keyed by name and labels:
+    API requests and bytes, Gemini calls / retries / tokens, embedding
+    batches, vector upserts and per-stage latencies. Everything is kept
+    in memory and written out once, at the end of the run, as a JSON
+    report (and optionally a Prometheus textfile). With METRICS_ENABLED
+    off every call returns after one attribute check.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def timer(self, name: str, **labels):
+        """`with metrics.timer("stage_seconds", stage="summarize"):` observes the elapsed seconds."""
+        return _Timer(self, name, labels) if self.enabled else _NO_TIMER
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        self.started = time.time()
+
+    # ─── output ────────────────────────────────────────────────────────────
+    def report(self, command: str) -> dict:
+        def label(labels):
+            return ",".join(f"{k}={v}" for k, v in labels)
+
+        with self._lock:
+            counters, histograms = dict(self._counters), dict(self._histograms)
+        out = {
+            "command": command,
+            "started_at": datetime.utcfromtimestamp(self.started).isoformat() + "Z",
+            "seconds": round(time.time() - self.started, 3),
+            "counters": {},
+            "histograms": {},
+        }
+        for (name, labels), value in sorted(counters.items()):
+            out["counters"].setdefault(name, {})[label(labels)] = value
+        for (name, labels), hist in sorted(histograms.items()):
+            out["histograms"].setdefault(name, {})[label(labels)] = hist.summary()
+        return out
+
+    def prometheus(self, command: str) -> str:
+        def fmt(labels, extra=()):
+            pairs = [("command", command), *labels, *extra]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        with self._lock:
+            counters, histograms = dict(self._counters), dict(self._histograms)
+        lines = []
+        for name in sorted({n for n, _ in counters}):
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            lines += [f"{PREFIX}{name}{fmt(labels)} {value}"
+                      for (n, labels), value in sorted(counters.items()) if n == name]
+        for name in sorted({n for n, _ in histograms}):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for (n, labels), hist in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*hist.bounds, "+Inf"), hist.buckets):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{fmt(labels)} {hist.sum}")
+                lines.append(f"{PREFIX}{name}_count{fmt(labels)} {hist.count}")
+        lines.append(f"# TYPE {PREFIX}run_duration_seconds gauge")
+        lines.append(f"{PREFIX}run_duration_seconds{fmt(())} {time.time() - self.started:.3f}")
+        lines.append(f"# TYPE {PREFIX}run_finished_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}run_finished_timestamp_seconds{fmt(())} {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, command: str) -> Optional[Path]:
+        """Write <command>.json to METRICS_DIR (and the Prometheus textfile if configured)."""
+        if not self.enabled:
+            return None
+        settings.METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        path = settings.METRICS_DIR / f"{command}.json"
+        _replace(path, json.dumps(self.report(command), indent=2))
+        if settings.METRICS_TEXTFILE_DIR:
+            Path(settings.METRICS_TEXTFILE_DIR).mkdir(parents=True, exist_ok=True)
+            # node_exporter reads *.prom; write-then-rename so it never sees half a file
+            _replace(Path(settings.METRICS_TEXTFILE_DIR) / f"internal_{command}.prom", self.prometheus(command))
+        return path
+
+    @contextmanager
+    def run(self, command: str):
+        """Wrap an entry point: metrics start from zero and are written when it ends."""
+        self.reset()
+        try:
+            yield self
+        finally:
+            path = self.write(command)
+            if path is not None:
+                print(f"Run report: {path}")
+
+
+def _replace(path: Path, text: str):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+metrics = Metrics(settings.METRICS_ENABLED)
@@ -0,0 +1,164 @@
+# pr_agent/core/ocr.py
+
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.settings import settings
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif", ".webp"}
+
+
+def render_pages(raw: bytes, filename: str, dpi: Optional[int] = None) -> list[bytes]:
+    """
+    Turn a document into one PNG per page, ready for OCR.
+      • PDFs are rasterised with PyMuPDF at `dpi`.
+      • Images (e.g. Notion image attachments) are a single page as-is.
+    Returns an empty list for anything else.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return [raw]
+    if ext != ".pdf":
+        return []
+
+    import fitz  # PyMuPDF
+
+    dpi = dpi or settings.OCR_DPI
+    pages = []
+    with fitz.open(stream=raw, filetype="pdf") as pdf:
+        for page in pdf:
+            pix = page.get_pixmap(dpi=dpi)
+            pages.append(pix.tobytes("png"))
+    return pages
+
+
+def _init_worker():
+    # Tesseract is itself OpenMP-parallel; with one page per process that
+    # only oversubscribes the cores, so pin each worker to one thread.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_page(image: bytes, lang: str) -> str:
+    """Run Tesseract over one rendered page (executed in a worker process)."""
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image)) as img:
+        return pytesseract.image_to_string(img, lang=lang)
+
+
+class OcrPageCache:
+    """
+    OCR text cached per page, keyed by sha256(page image + language), so
+    re-runs and identical pages across documents are never re-OCR'd.
+    """
+    def __init__(self, cache_dir: str):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(image: bytes, lang: str) -> str:
+        return hashlib.sha256(lang.encode("utf-8") + b"\0" + image).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        tmp.replace(path)
+
+
+def _run_pages(todo: dict[str, bytes], lang: str, workers: int) -> tuple[dict, dict]:
+    """OCR `todo` (page key → image) on one pool: ({key: text}, {key: error})."""
+    texts, errors = {}, {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {key: pool.submit(_ocr_page, image, lang) for key, image in todo.items()}
+        for key, fut in futures.items():
+            try:
+                texts[key] = fut.result()
+            except Exception as e:
+                errors[key] = e
+    return texts, errors
+
+
+def ocr_documents(docs: list[tuple[str, bytes, str]],
+                  workers: Optional[int] = None,
+                  lang: Optional[str] = None) -> tuple[dict[str, str], dict[str, Exception]]:
+    """
+    OCR many documents at once with page-level parallelism.
+
+    `docs` is a list of (doc_id, raw_bytes, filename). Every page of every
+    document is a separate task on one process pool, so a single long scan
+    still spreads over all cores. Returns ({doc_id: text}, {doc_id: error}):
+    pages joined in order with a blank line, or why the document could
+    not be OCR'd (unreadable file, a page Tesseract failed on). One bad
+    document never fails the others: if a Tesseract crash takes the pool
+    down, the pages it left undone are redone one document at a time.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    lang = lang or settings.OCR_LANG
+    workers = workers or settings.OCR_WORKERS or os.cpu_count() or 1
+    cache = OcrPageCache(settings.OCR_CACHE_DIR)
+
+    page_keys: dict[str, list[str]] = {}
+    todo: dict[str, bytes] = {}
+    texts: dict[str, str] = {}
+    doc_errors: dict[str, Exception] = {}
+    for doc_id, raw, filename in docs:
+        try:
+            images = render_pages(raw, filename)
+        except Exception as e:
+            doc_errors[doc_id] = e
+            continue
+        keys = []
+        for image in images:
+            key = cache.key(image, lang)
+            keys.append(key)
+            if key in texts or key in todo:
+                continue
+            cached = cache.get(key)
+            if cached is not None:
+                texts[key] = cached
+            else:
+                todo[key] = image
+        page_keys[doc_id] = keys
+
+    page_errors: dict[str, Exception] = {}
+    if todo:
+        done, page_errors = _run_pages(todo, lang, workers)
+        broken = {k for k, e in page_errors.items() if isinstance(e, BrokenProcessPool)}
+        if broken:
+            # a crash fails every page still queued: redo those per document,
+            # so only the document whose page crashes Tesseract fails
+            for keys in page_keys.values():
+                retry = {k: todo[k] for k in dict.fromkeys(keys) if k in broken and k not in done}
+                if retry:
+                    redone, failed = _run_pages(retry, lang, workers)
+                    done.update(redone)
+                    for k in retry:
+                        page_errors.pop(k, None)
+                    page_errors.update(failed)
+        for key, text in done.items():
+            cache.put(key, text)
+            texts[key] = text
+
+    out = {}
+    for doc_id, keys in page_keys.items():
+        failed = next((page_errors[k] for k in keys if k in page_errors), None)
+        if failed is not None:
+            doc_errors[doc_id] = failed
+        else:
+            out[doc_id] = "\n\n".join(texts[k].strip() for k in keys if texts[k].strip())
+    return out, doc_errors
@@ -0,0 +1,137 @@
+# pr_agent/core/onnx_embedder.py
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Written next to the exported model; everything OnnxEncoder needs to
+# reproduce the SentenceTransformer pipeline (truncation, pooling, norm).
+CONFIG_NAME = "pr_agent_onnx.json"
+FP32_NAME = "model.onnx"
+INT8_NAME = "model.int8.onnx"
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = True, opset: int = 14) -> Path:
+    """
+    Export a SentenceTransformer's transformer to ONNX (plus its fast
+    tokenizer and pooling config) and, optionally, a dynamically
+    int8-quantized copy. Needs torch + sentence_transformers, but only
+    here: OnnxEncoder itself runs on onnxruntime + tokenizers alone.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+    tokenizer.save_pretrained(str(out))          # tokenizer.json for `tokenizers`
+
+    pooling = next((m for m in st if isinstance(m, Pooling)), None)
+    config = {
+        "model_name": model_name,
+        "max_seq_length": st.max_seq_length,
+        "pooling": pooling.get_pooling_mode_str() if pooling else "mean",
+        "normalize": any(isinstance(m, Normalize) for m in st),
+        "dim": st.get_sentence_embedding_dimension(),
+    }
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer, tuple(sample[n] for n in names), str(out / FP32_NAME),
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=axes, opset_version=opset,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(out / FP32_NAME), str(out / INT8_NAME), weight_type=QuantType.QInt8)
+
+    (out / CONFIG_NAME).write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return out
+
+
+class OnnxEncoder:
+    """
+    Drop-in for SentenceTransformer.encode() on CPU: fast tokenizer +
+    ONNX Runtime session + the same pooling/normalisation, no torch.
+    """
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+        config_path = self.model_dir / CONFIG_NAME
+        model_path = self.model_dir / (INT8_NAME if quantized else FP32_NAME)
+        if not config_path.exists() or not model_path.exists():
+            raise FileNotFoundError(
+                f"No exported ONNX model at {model_path}; run `internal-export-onnx` first"
+            )
+        self.config = json.loads(config_path.read_text(encoding="utf-8"))
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.no_padding()   # we pad per length-sorted batch ourselves
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self.config.get("dim")
+
+    def encode(self, texts: list[str], batch_size: int = 32, show_progress_bar: bool = False,
+               **_) -> np.ndarray:
+        """float32 (len(texts), dim) embeddings, in input order."""
+        texts = list(texts)
+        encodings = self.tokenizer.encode_batch(texts)
+        # like SentenceTransformer: batch texts of similar length to keep padding small
+        order = np.argsort([-len(e.ids) for e in encodings], kind="stable")
+        out = None
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            width = max(len(encodings[i].ids) for i in idx)
+            feeds = {name: np.zeros((len(idx), width), dtype=np.int64)
+                     for name in ("input_ids", "attention_mask", "token_type_ids")}
+            for r, i in enumerate(idx):
+                e = encodings[i]
+                n = len(e.ids)
+                feeds["input_ids"][r, :n] = e.ids
+                feeds["attention_mask"][r, :n] = e.attention_mask
+                feeds["token_type_ids"][r, :n] = e.type_ids
+            mask = feeds["attention_mask"]
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            pooled = self._pool(hidden, mask)
+            if out is None:
+                out = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            out[idx] = pooled
+        if out is None:
+            return np.empty((0, self.config.get("dim") or 0), dtype=np.float32)
+        return out
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        mode = self.config.get("pooling", "mean")
+        m = mask[..., None].astype(np.float32)
+        if mode == "cls":
+            pooled = hidden[:, 0]
+        elif mode == "max":
+            pooled = np.where(m > 0, hidden, -1e9).max(axis=1)
+        else:
+            pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        pooled = pooled.astype(np.float32)
+        if self.config.get("normalize"):
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled /= np.clip(norms, 1e-12, None)
+        return pooled
@@ -1,35 +1,27 @@
-from pinecone import Pinecone
-from pr_agent.settings import settings
+# pr_agent/core/pinecone_manager.py
 
-# ─── Initialize Pinecone client and index ─────────────────────────────────
-_pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-_index = _pc.Index(settings.PINECONE_INDEX)
+from pr_agent.core.vector_backends import get_vector_backend
 
-# def upsert_embedding(doc_id: str, vector: list[float], metadata: dict = None):
-#     """
-#     Upsert a single vector into Pinecone under the given doc_id.
-#     Metadata can include fields like source_system, timestamp, etc.
-#     """
-#     # Pinecone expects a list of tuples: (id, vector, metadata)
-#     _index.upsert([(doc_id, vector, metadata or {})])
+# Both helpers route to the backend chosen by settings.VECTOR_BACKEND:
+# "pinecone" (the remote index) or "local" (offline, see LocalBackend).
 
 def upsert_embedding(doc_id: str,
-                     vector: list[float],
+                     vector,
                      metadata: dict | None = None):
     """
-    Upsert a single vector into Pinecone under the given doc_id.
+    Upsert a single vector into the vector backend under the given doc_id.
     """
-    _index.upsert([(doc_id, vector, metadata or {})])
+    get_vector_backend().upsert([(doc_id, vector, metadata or {})])
 
 
-def query_embedding(vector: list[float],
+def query_embedding(vector,
                     top_k: int = 5,
                     include_metadata: bool = True):
     """
-    Query Pinecone for the top_k most similar vectors.
+    Query the vector backend for the top_k most similar vectors.
     """
-    return _index.query(
-        vector=vector,
+    return get_vector_backend().query(
+        vector,
         top_k=top_k,
         include_metadata=include_metadata
-    )
\ No newline at end of file
+    )
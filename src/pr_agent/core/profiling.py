@@ -0,0 +1,204 @@
+# pr_agent/core/profiling.py
+
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.core.metrics import metrics
+from pr_agent.settings import settings
+
+NO_STAGE = "other"
+_NULL = nullcontext()
+
+
+def _collapse(frame) -> str:
+    """root;…;leaf with 'function (file.py:line)' frames, as flamegraph.pl / speedscope read them."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """
+    The --profile mode of the pipeline entry points. While started it
+      • samples the stack of every thread working in a stage (and of the
+        main thread) every PROFILE_INTERVAL seconds, keyed by that stage;
+        samples are wall-clock, so time spent waiting on Drive, Gemini or
+        Pinecone shows up under the call that waited. Line numbers are
+        kept, so the summarizer branch that made a call is visible;
+      • times each document and the stages inside it, and records its
+        tracemalloc peak (bytes allocated above what was live when the
+        document started; PROFILE_MEMORY=false skips tracemalloc, which
+        slows allocation-heavy code noticeably).
+    finish() writes <stage>.collapsed / all.collapsed and documents.json
+    to PROFILE_DIR/<command>-<timestamp>/ and prints the slowest documents.
+    Disabled, stage() and document() return a shared no-op context.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.samples: Counter = Counter()       # (stage, collapsed stack) → samples
+        self.documents: list[dict] = []
+        self._stages: dict[int, list[str]] = {}  # thread → open stages, innermost last
+        self._current: dict[int, dict] = {}      # thread → document being profiled
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._traced = False
+
+    # ─── lifecycle ─────────────────────────────────────────────────────────
+    def start(self, interval: Optional[float] = None, memory: Optional[bool] = None):
+        self.samples.clear()
+        self.documents.clear()
+        self.interval = interval or settings.PROFILE_INTERVAL
+        memory = settings.PROFILE_MEMORY if memory is None else memory
+        self._traced = memory and not tracemalloc.is_tracing()
+        if self._traced:
+            tracemalloc.start()
+        self.started = time.time()
+        self.enabled = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stop.set()
+        self._thread.join()
+        if self._traced:
+            tracemalloc.stop()
+            self._traced = False
+
+    def finish(self, command: str) -> Optional[Path]:
+        """Stop, write the profile of `command` and print where it went."""
+        if not self.enabled:
+            return None
+        self.stop()
+        out = self.write(command)
+        self.print_slowest()
+        print(f"Profile: {out}")
+        return out
+
+    @contextmanager
+    def run(self, command: str, enabled: bool = True):
+        """`with profiler.run("process", enabled=args.profile):` around an entry point."""
+        if not enabled:
+            yield self
+            return
+        self.start()
+        try:
+            yield self
+        finally:
+            self.finish(command)
+
+    def _sample(self):
+        me, main = threading.get_ident(), threading.main_thread().ident
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                stages = {t: "/".join(s) for t, s in self._stages.items() if s}
+            for ident, frame in sys._current_frames().items():
+                # idle helpers (lease heartbeat, thread pools between tasks) are not sampled
+                if ident == me or (ident not in stages and ident != main):
+                    continue
+                self.samples[(stages.get(ident, NO_STAGE), _collapse(frame))] += 1
+
+    # ─── instrumentation ───────────────────────────────────────────────────
+    def stage(self, name: str):
+        return self._stage(name) if self.enabled else _NULL
+
+    @contextmanager
+    def _stage(self, name: str):
+        ident = threading.get_ident()
+        with self._lock:
+            stack = self._stages.setdefault(ident, [])
+            stack.append(name)
+            path = "/".join(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stack.pop()
+                doc = self._current.get(ident)
+            if doc is not None:
+                doc["stages"][path] = round(doc["stages"].get(path, 0.0) + elapsed, 6)
+
+    def document(self, doc_id: str, **info):
+        """Time one document; `info` (file name, source, …) goes into documents.json."""
+        return self._document(doc_id, info) if self.enabled else _NULL
+
+    @contextmanager
+    def _document(self, doc_id: str, info: dict):
+        ident = threading.get_ident()
+        doc = {"doc_id": doc_id, **info, "seconds": 0.0, "stages": {}}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            self._current[ident] = doc
+        start = time.perf_counter()
+        try:
+            yield doc
+        finally:
+            doc["seconds"] = round(time.perf_counter() - start, 6)
+            if tracing and tracemalloc.is_tracing():
+                doc["peak_bytes"] = max(tracemalloc.get_traced_memory()[1] - base, 0)
+            with self._lock:
+                self._current.pop(ident, None)
+                self.documents.append(doc)
+
+    # ─── output ────────────────────────────────────────────────────────────
+    def write(self, command: str) -> Path:
+        out = Path(settings.PROFILE_DIR) / f"{command}-{datetime.now():%Y%m%d-%H%M%S}"
+        out.mkdir(parents=True, exist_ok=True)
+        by_stage: dict[str, list[str]] = {}
+        combined = []
+        for (stage, stack), count in sorted(self.samples.items()):
+            by_stage.setdefault(stage, []).append(f"{stack} {count}")
+            combined.append(f"stage:{stage};{stack} {count}")
+        for stage, lines in by_stage.items():
+            (out / f"{stage.replace('/', '.')}.collapsed").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        (out / "all.collapsed").write_text("\n".join(combined) + "\n" if combined else "", encoding="utf-8")
+        report = {
+            "command": command,
+            "seconds": round(time.time() - self.started, 3),
+            "interval": self.interval,
+            "samples": {stage: sum(c for (s, _), c in self.samples.items() if s == stage) for stage in by_stage},
+            "documents": sorted(self.documents, key=lambda d: d["seconds"], reverse=True),
+        }
+        (out / "documents.json").write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        return out
+
+    def print_slowest(self, n: Optional[int] = None):
+        n = n or settings.PROFILE_TOP
+        docs = sorted(self.documents, key=lambda d: d["seconds"], reverse=True)[:n]
+        if not docs:
+            return
+        print(f"Slowest {len(docs)} of {len(self.documents)} document(s):")
+        for d in docs:
+            stages = "  ".join(f"{s} {t:.2f}s" for s, t in sorted(d["stages"].items(), key=lambda kv: -kv[1]))
+            peak = f"  peak {d['peak_bytes'] / 2**20:.1f} MiB" if "peak_bytes" in d else ""
+            print(f"  {d['doc_id']}  {d['seconds']:.2f}s{peak}  [{stages}]")
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """A pipeline stage: timed in the run metrics, and attributed in --profile output."""
+    with metrics.timer("stage_seconds", stage=name, **labels), profiler.stage(name):
+        yield
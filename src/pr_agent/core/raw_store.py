@@ -0,0 +1,187 @@
+# pr_agent/core/raw_store.py
+
+import gzip
+import hashlib
+import io
+import json
+import uuid
+from pathlib import Path
+from typing import IO, Optional
+
+from pr_agent.settings import settings
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: fall back to gzip
+    zstandard = None
+
+CODEC_EXT = {"zstd": ".zst", "gzip": ".gz"}
+
+
+class RawTextWriter:
+    """
+    Streaming writer returned by RawTextStore.open_writer().
+    Text is UTF-8 encoded, hashed and compressed chunk by chunk, so the
+    full string never has to be held (or JSON-encoded) in memory.
+    """
+    def __init__(self, store: "RawTextStore", doc_id: str):
+        self.store = store
+        self.doc_id = doc_id
+        self.size = 0
+        self.digest: Optional[str] = None
+        self._hasher = hashlib.sha256()
+        self._tmp = store.tmp_dir / f"{uuid.uuid4().hex}{CODEC_EXT[store.codec]}"
+        self._fh = open(self._tmp, "wb")
+        if store.codec == "zstd":
+            cctx = zstandard.ZstdCompressor(level=store.level)
+            self._stream = cctx.stream_writer(self._fh, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._fh, mode="wb",
+                                         compresslevel=store.level, mtime=0)
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self._hasher.update(data)
+        self._stream.write(data)
+        self.size += len(data)
+
+    def close(self) -> str:
+        """Finish the object, store it under its hash and point doc_id at it."""
+        self._stream.close()
+        self._fh.close()
+        self.digest = self._hasher.hexdigest()
+        if self.store.object_path(self.digest) is None:
+            dest = self.store.objects_dir / self.digest[:2] / f"{self.digest}{CODEC_EXT[self.store.codec]}"
+            dest.parent.mkdir(exist_ok=True)
+            self._tmp.replace(dest)
+        else:
+            # identical text already stored: keep the existing object
+            self._tmp.unlink()
+        self.store._write_ref(self.doc_id, self.digest)
+        return self.digest
+
+    def abort(self):
+        self._stream.close()
+        self._fh.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class RawTextStore:
+    """
+    Content-addressed, compressed store for extracted raw text.
+
+    Layout under root_dir:
+        objects/ab/<sha256>.zst|.gz   one object per distinct text
+        refs/<doc_id>                 the sha256 a document points at
+
+    Documents with identical text share one object. Codec is zstd when
+    the `zstandard` package is available, gzip otherwise; objects carry
+    their codec in the extension so both can be read back.
+    """
+    def __init__(self, root_dir: str, codec: str = "zstd", level: Optional[int] = None):
+        self.root = Path(root_dir)
+        if codec == "zstd" and zstandard is None:
+            codec = "gzip"
+        if codec not in CODEC_EXT:
+            raise ValueError(f"Unknown raw-text codec: {codec}")
+        self.codec = codec
+        self.level = level if level is not None else (10 if codec == "zstd" else 6)
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.tmp_dir = self.root / "tmp"
+        for d in (self.objects_dir, self.refs_dir, self.tmp_dir):
+            d.mkdir(parents=True, exist_ok=True)
+
+    # ─── refs ──────────────────────────────────────────────────────────────
+    def _write_ref(self, doc_id: str, digest: str):
+        path = self.refs_dir / doc_id
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(digest, encoding="ascii")
+        tmp.replace(path)
+
+    def get_hash(self, doc_id: str) -> Optional[str]:
+        path = self.refs_dir / doc_id
+        return path.read_text(encoding="ascii").strip() if path.exists() else None
+
+    def get_all_ids(self) -> set[str]:
+        return {p.name for p in self.refs_dir.iterdir() if not p.name.endswith(".tmp")}
+
+    def object_path(self, digest: str) -> Optional[Path]:
+        for ext in CODEC_EXT.values():
+            path = self.objects_dir / digest[:2] / f"{digest}{ext}"
+            if path.exists():
+                return path
+        return None
+
+    # ─── writing ───────────────────────────────────────────────────────────
+    def open_writer(self, doc_id: str) -> RawTextWriter:
+        return RawTextWriter(self, doc_id)
+
+    def write_text(self, doc_id: str, text: str) -> str:
+        """Store `text` for doc_id; returns its content hash."""
+        with self.open_writer(doc_id) as w:
+            w.write(text)
+        return w.digest
+
+    # ─── reading ───────────────────────────────────────────────────────────
+    def open_reader(self, doc_id: str) -> IO[str]:
+        """
+        Return a text stream over doc_id's raw text. Falls back to a legacy
+        `{doc_id}_raw.json` in root_dir if the document was never migrated.
+        Raises KeyError if neither exists.
+        """
+        digest = self.get_hash(doc_id)
+        if digest is None:
+            legacy = self.root / f"{doc_id}_raw.json"
+            if legacy.exists():
+                data = json.loads(legacy.read_text(encoding="utf-8"))
+                return io.StringIO(data.get("raw_text", ""))
+            raise KeyError(doc_id)
+        path = self.object_path(digest)
+        if path is None:
+            raise KeyError(f"{doc_id}: missing object {digest}")
+        if path.suffix == ".zst":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read .zst raw-text objects")
+            return zstandard.open(path, "rt", encoding="utf-8")
+        return gzip.open(path, "rt", encoding="utf-8")
+
+    def read_text(self, doc_id: str) -> str:
+        with self.open_reader(doc_id) as r:
+            return r.read()
+
+    def __contains__(self, doc_id: str) -> bool:
+        return (self.refs_dir / doc_id).exists() or (self.root / f"{doc_id}_raw.json").exists()
+
+    # ─── maintenance ───────────────────────────────────────────────────────
+    def delete(self, doc_id: str):
+        """Drop doc_id's ref. Its object is reclaimed by gc() once unreferenced."""
+        (self.refs_dir / doc_id).unlink(missing_ok=True)
+
+    def gc(self) -> int:
+        """Remove objects no ref points at. Returns the number removed."""
+        live = {self.get_hash(d) for d in self.get_all_ids()}
+        removed = 0
+        for path in self.objects_dir.glob("*/*"):
+            if path.name.split(".")[0] not in live:
+                path.unlink()
+                removed += 1
+        return removed
+
+    def disk_usage(self) -> int:
+        """Total bytes of stored objects."""
+        return sum(p.stat().st_size for p in self.objects_dir.glob("*/*"))
+
+
+def get_raw_store() -> RawTextStore:
+    """RawTextStore rooted at settings.RAW_DIR with the configured codec."""
+    return RawTextStore(settings.RAW_DIR, codec=settings.RAW_COMPRESSION)
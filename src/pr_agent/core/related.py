@@ -0,0 +1,227 @@
+# pr_agent/core/related.py
+
+import fcntl
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from pr_agent.core.metadata_manager import DirectoryMetadataStore
+from pr_agent.core.vector_index import BLOCK_ROWS, exact_search, normalize
+from pr_agent.settings import settings
+
+# Metadata key holding [{"doc_id", "score"}, ...], best first. Lowercase
+# like the rest of a processed document's payload.
+RELATED_KEY = "related_documents"
+
+
+class RelatedGraph:
+    """
+    Working state of the related-documents graph: which vector each
+    document's list was computed from, and the lists themselves (with a
+    reverse index, so "whose list mentions X" is one query). The metadata
+    store only receives the published copy.
+    """
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, vec_hash TEXT);"
+            "CREATE TABLE IF NOT EXISTS neighbours ("
+            " doc_id TEXT, rank INTEGER, neighbour TEXT, score REAL, PRIMARY KEY (doc_id, rank));"
+            "CREATE INDEX IF NOT EXISTS neighbours_by_neighbour ON neighbours (neighbour);"
+        )
+        self._db.commit()
+
+    def hashes(self) -> dict[str, str]:
+        return dict(self._db.execute("SELECT doc_id, vec_hash FROM docs"))
+
+    def lists(self, doc_ids: Iterable[str]) -> dict[str, list[tuple[str, float]]]:
+        doc_ids = list(doc_ids)
+        out: dict[str, list[tuple[str, float]]] = {d: [] for d in doc_ids}
+        for start in range(0, len(doc_ids), 500):
+            part = doc_ids[start:start + 500]
+            marks = ",".join("?" * len(part))
+            for doc_id, neighbour, score in self._db.execute(
+                    f"SELECT doc_id, neighbour, score FROM neighbours WHERE doc_id IN ({marks}) "
+                    f"ORDER BY doc_id, rank", part):
+                out[doc_id].append((neighbour, score))
+        return out
+
+    def listing(self, doc_ids: set[str]) -> set[str]:
+        """Documents whose list contains any of `doc_ids`."""
+        ids = list(doc_ids)
+        out = set()
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            marks = ",".join("?" * len(part))
+            out.update(row[0] for row in self._db.execute(
+                f"SELECT DISTINCT doc_id FROM neighbours WHERE neighbour IN ({marks})", part))
+        return out
+
+    def kth_scores(self, k: int) -> dict[str, float]:
+        """Score a newcomer must beat to enter each full list."""
+        return {d: score for d, n, score in self._db.execute(
+            "SELECT doc_id, COUNT(*), MIN(score) FROM neighbours GROUP BY doc_id") if n >= k}
+
+    def save(self, lists: dict[str, list[tuple[str, float]]], hashes: dict[str, str]):
+        self._db.executemany("DELETE FROM neighbours WHERE doc_id = ?", [(d,) for d in lists])
+        self._db.executemany(
+            "INSERT INTO neighbours (doc_id, rank, neighbour, score) VALUES (?, ?, ?, ?)",
+            [(d, rank, n, s) for d, lst in lists.items() for rank, (n, s) in enumerate(lst)],
+        )
+        self._db.executemany("INSERT OR REPLACE INTO docs (doc_id, vec_hash) VALUES (?, ?)",
+                             list(hashes.items()))
+        self._db.commit()
+
+    def remove(self, doc_ids: Iterable[str]):
+        rows = [(d,) for d in doc_ids]
+        self._db.executemany("DELETE FROM neighbours WHERE doc_id = ?", rows)
+        self._db.executemany("DELETE FROM docs WHERE doc_id = ?", rows)
+        self._db.commit()
+
+
+@dataclass
+class RelatedStats:
+    docs: int = 0
+    recomputed: int = 0     # lists rebuilt from scratch
+    updated: int = 0        # lists a new/changed document was merged into
+    removed: int = 0
+    published: int = 0      # metadata files written
+    seconds: dict = field(default_factory=lambda: {"load": 0.0, "knn": 0.0, "merge": 0.0, "write": 0.0})
+
+
+def _row_norms(mat: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.linalg.norm(np.asarray(mat[rows[start:start + BLOCK_ROWS]], dtype=np.float32), axis=1)
+        for start in range(0, len(rows), BLOCK_ROWS)
+    ]) if len(rows) else np.empty(0, dtype=np.float32)
+
+
+def build_related(k: Optional[int] = None, full: bool = False,
+                  doc_ids: Optional[Iterable[str]] = None) -> RelatedStats:
+    """
+    Bring every document's top-k related list up to date.
+
+    All live document vectors are read from the embedding store's memmap
+    and compared with blocked matrix multiplies: RELATED_QUERY_BLOCK query
+    rows against BLOCK_ROWS corpus rows at a time, so memory stays bounded
+    regardless of corpus size.
+
+    Incrementally (the default) only this much work is done:
+      • new or changed vectors (and `doc_ids`, forced) get their list
+        computed against the whole corpus,
+      • lists that mention a changed or removed document are recomputed,
+      • every other list gets the changed documents merged in if they beat
+        its current k-th score — one scan of the changed rows, not N queries.
+    `full=True` recomputes every list.
+    Runs under an exclusive lock on the graph, so workers processing
+    documents in parallel don't overwrite each other's merges.
+    """
+    root = settings.EMBEDDINGS_DIR / "related"
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "a") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        return _build_related(root, k, full, doc_ids)
+
+
+def _build_related(root: Path, k: Optional[int], full: bool,
+                   doc_ids: Optional[Iterable[str]]) -> RelatedStats:
+    from pr_agent.core.embedder import get_embedding_store
+
+    k = k or settings.RELATED_TOP_K
+    qblock = settings.RELATED_QUERY_BLOCK
+    stats = RelatedStats()
+
+    t0 = time.perf_counter()
+    store = get_embedding_store()
+    store.refresh()
+    ids, rows, mat = store.live()
+    order = np.argsort(rows)                    # scan the memmap sequentially
+    ids = [ids[i] for i in order]
+    rows = rows[order]
+    pos_of = {d: i for i, d in enumerate(ids)}
+    stats.docs = len(ids)
+
+    graph = RelatedGraph(root / "graph.sqlite")
+    old_hashes = graph.hashes()
+    hashes = dict(zip(ids, store.fingerprints(ids)))
+    norms = _row_norms(mat, rows)
+
+    removed = set(old_hashes) - set(hashes)
+    changed = {d for d, h in hashes.items() if old_hashes.get(d) != h}
+    changed |= {d for d in (doc_ids or ()) if d in hashes}
+    if full:
+        recompute = set(ids)
+    else:
+        recompute = changed | (graph.listing(changed | removed) - removed)
+    stats.seconds["load"] = time.perf_counter() - t0
+
+    # 1) full top-k for every list being recomputed
+    t0 = time.perf_counter()
+    lists: dict[str, list[tuple[str, float]]] = {}
+    todo = np.array(sorted(pos_of[d] for d in recompute), dtype=np.int64)
+    for start in range(0, len(todo), qblock):
+        qpos = todo[start:start + qblock]
+        queries = normalize(np.asarray(mat[rows[qpos]], dtype=np.float32))
+        pos, scores = exact_search(mat, rows, queries, k + 1, norms=norms)
+        for p, found, found_scores in zip(qpos, pos, scores):
+            lists[ids[p]] = [(ids[j], round(float(s), 4))
+                             for j, s in zip(found, found_scores) if j != p][:k]
+    stats.recomputed = len(lists)
+    stats.seconds["knn"] = time.perf_counter() - t0
+
+    # 2) merge changed documents into the lists that were not recomputed
+    t0 = time.perf_counter()
+    candidates: dict[int, list[tuple[str, float]]] = {}
+    if changed and len(recompute) < len(ids):
+        known_kth = graph.kth_scores(k)
+        kth = np.array([known_kth.get(d, -np.inf) for d in ids], dtype=np.float32)
+        skip = np.zeros(len(ids), dtype=bool)
+        skip[[pos_of[d] for d in recompute]] = True
+        cpos = np.array(sorted(pos_of[d] for d in changed), dtype=np.int64)
+        for cstart in range(0, len(cpos), qblock):
+            qpos = cpos[cstart:cstart + qblock]
+            queries = normalize(np.asarray(mat[rows[qpos]], dtype=np.float32))
+            for start in range(0, len(ids), BLOCK_ROWS):
+                block = np.asarray(mat[rows[start:start + BLOCK_ROWS]], dtype=np.float32)
+                block_norms = norms[start:start + len(block)]
+                scores = (block @ queries.T) / np.where(block_norms == 0, 1.0, block_norms)[:, None]
+                hit = (scores > kth[start:start + len(block), None]) & ~skip[start:start + len(block), None]
+                for r, q in zip(*np.nonzero(hit)):
+                    candidates.setdefault(start + r, []).append((ids[qpos[q]], round(float(scores[r, q]), 4)))
+        current = graph.lists(ids[p] for p in candidates)
+        for p, extra in candidates.items():
+            merged = sorted(current[ids[p]] + extra, key=lambda x: -x[1])[:k]
+            lists[ids[p]] = merged
+    stats.updated = len(candidates)
+    stats.seconds["merge"] = time.perf_counter() - t0
+
+    # 3) persist the graph, publish lists into the metadata store
+    t0 = time.perf_counter()
+    graph.remove(removed)
+    graph.save(lists, {d: hashes[d] for d in lists})   # every changed doc was recomputed
+    stats.removed = len(removed)
+
+    meta_store = DirectoryMetadataStore(settings.METADATA_DIR)
+    for doc_id, lst in lists.items():
+        meta = meta_store.read(doc_id)
+        # Only finished documents: a Pending record is still being written by
+        # its worker (holding the lease, not this lock), and a stale copy
+        # written back here would undo its progress. It gets its list when
+        # it finishes, since process_pending forces its doc_id.
+        if meta is None or meta.get("status") != "Processed":
+            continue
+        meta[RELATED_KEY] = [{"doc_id": n, "score": s} for n, s in lst]
+        meta_store.upsert(doc_id, meta)
+        stats.published += 1
+    stats.seconds["write"] = time.perf_counter() - t0
+    return stats
+
+
+def related_documents(doc_id: str) -> list[dict]:
+    """A document's precomputed related list: one metadata read."""
+    meta = DirectoryMetadataStore(settings.METADATA_DIR).read(doc_id) or {}
+    return meta.get(RELATED_KEY, [])
@@ -0,0 +1,259 @@
+# pr_agent/core/search.py
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.core.chunker import CHUNK_NAMESPACE, get_chunk_manifest, parse_chunk_id
+from pr_agent.core.daemon_client import daemon_search
+from pr_agent.core.metadata_manager import DirectoryMetadataStore
+from pr_agent.core.vector_backends import get_vector_backend
+from pr_agent.settings import settings
+
+
+@dataclass
+class SearchHit:
+    doc_id: str
+    score: float
+    filename: str = ""
+    url: str = ""
+    summary: str = ""
+    chunk: Optional[int] = None     # chunk searches: best-matching passage
+    start: Optional[int] = None     # its character offsets in the raw text
+    end: Optional[int] = None
+
+
+@dataclass
+class SearchTimings:
+    """Wall-clock seconds per stage of one search_many() call."""
+    embed: float = 0.0
+    vector: float = 0.0
+    metadata: float = 0.0
+    keyword: float = 0.0
+    per_query: list[float] = field(default_factory=list)
+    cache_hits: int = 0
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: lower-cased, whitespace-collapsed (MiniLM is uncased)."""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query text → float32 embedding."""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+            return vec
+
+    def put(self, key: str, vec: np.ndarray):
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_cache = QueryEmbeddingCache(settings.SEARCH_CACHE_SIZE)
+
+
+def embed_queries(queries: list[str]) -> tuple[list[np.ndarray], int]:
+    """
+    Embed queries, reusing cached vectors and encoding all misses in one
+    batch. Returns (vectors, cache_hits).
+    """
+    from pr_agent.core.embedder import generate_embeddings
+
+    keys = [normalize_query(q) for q in queries]
+    vectors: list[Optional[np.ndarray]] = [_cache.get(k) for k in keys]
+    misses = sorted({k for k, v in zip(keys, vectors) if v is None})
+    if misses:
+        fresh = {k: np.array(v) for k, v in zip(misses, generate_embeddings(misses))}
+        for k, vec in fresh.items():
+            _cache.put(k, vec)
+        vectors = [v if v is not None else fresh[k] for k, v in zip(keys, vectors)]
+    return vectors, len(keys) - sum(1 for k in keys if k in misses)
+
+
+SEARCH_MODES = ("semantic", "keyword", "hybrid")
+
+
+def search_many(queries: list[str], top_k: int = 5,
+                timings: Optional[SearchTimings] = None,
+                chunks: bool = False, mode: str = "semantic") -> list[list[SearchHit]]:
+    """
+    Search for many queries at once. `mode` picks the retriever:
+      • "semantic": embed all queries in one batch (LRU-cached by
+        normalised text) and query the vector backend for every query
+        concurrently (SEARCH_CONCURRENCY threads),
+      • "keyword": BM25 over the raw text (see keyword_index),
+      • "hybrid": both, HYBRID_CANDIDATES each, fused by reciprocal rank.
+    All hits are then joined with the metadata store in a single lookup.
+    With `chunks=True` the raw-text chunk vectors are searched instead of
+    the summaries, and each document is ranked by its best chunk.
+    Returns one ranked hit list per query.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode!r} (expected one of {', '.join(SEARCH_MODES)})")
+    timings = timings if timings is not None else SearchTimings()
+    fetch_k = max(top_k, settings.HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+
+    semantic = keyword = None
+    if mode != "keyword":
+        semantic = _semantic_ranked(queries, fetch_k, chunks, timings)
+    if mode != "semantic":
+        keyword = _keyword_ranked(queries, fetch_k, timings)
+
+    if mode == "semantic":
+        ranked = semantic
+    elif mode == "keyword":
+        ranked = keyword
+    else:
+        ranked = []
+        for vec_hits, kw_hits in zip(semantic, keyword):
+            chunk_of = {doc_id: chunk for doc_id, _, chunk in vec_hits}
+            fused = reciprocal_rank_fusion([[h[0] for h in vec_hits], [h[0] for h in kw_hits]])
+            ranked.append([(doc_id, score, chunk_of.get(doc_id)) for doc_id, score in fused[:top_k]])
+    return _join_metadata(ranked, timings)
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: Optional[int] = None) -> list[tuple[str, float]]:
+    """
+    Merge ranked id lists: each id scores Σ 1 / (k + rank) over the lists
+    it appears in (rank from 1). Only ranks matter, so BM25 and cosine
+    scores need no calibration against each other.
+    """
+    k = settings.RRF_K if k is None else k
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: -x[1])
+
+
+def _semantic_ranked(queries: list[str], top_k: int, chunks: bool,
+                     timings: SearchTimings) -> list[list[tuple[str, float, Optional[int]]]]:
+    """Vector search → per query [(doc_id, score, chunk)], best first."""
+    t0 = time.perf_counter()
+    vectors, timings.cache_hits = embed_queries(queries)
+    timings.embed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if settings.VECTOR_BACKEND == "local" and not chunks:
+        # a running daemon already holds the local index in memory
+        todo = [i for i, v in enumerate(vectors) if v.any()]
+        hits = daemon_search([vectors[i] for i in todo], top_k) if todo else None
+        if hits is not None:
+            ranked = [[] for _ in vectors]
+            for i, h in zip(todo, hits):
+                ranked[i] = [(d, float(sc), None) for d, sc in h]
+            timings.vector = time.perf_counter() - t0
+            share = timings.embed / max(len(queries), 1) + timings.vector / max(len(todo), 1)
+            timings.per_query = [share] * len(queries)
+            return ranked
+
+    backend = get_vector_backend(CHUNK_NAMESPACE if chunks else "")
+    # several chunks of one document can match: over-fetch, then collapse
+    fetch_k = top_k * 4 if chunks else top_k
+
+    def _query(vec):
+        if not vec.any():   # empty query
+            return None, 0.0
+        start = time.perf_counter()
+        resp = backend.query(vec, top_k=fetch_k, include_metadata=False)
+        return resp, time.perf_counter() - start
+
+    workers = max(1, min(len(vectors), settings.SEARCH_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        answered = list(pool.map(_query, vectors))
+    timings.vector = time.perf_counter() - t0
+    # each query's latency: its share of the batched embed + its own vector lookup
+    embed_share = timings.embed / max(len(queries), 1)
+    timings.per_query = [embed_share + secs for _, secs in answered]
+
+    ranked = []
+    for resp, _ in answered:
+        hits = [(m["id"], float(m["score"])) for m in (resp["matches"] if resp else [])]
+        if not chunks:
+            ranked.append([(doc_id, score, None) for doc_id, score in hits])
+            continue
+        # chunk ids → documents, best chunk first (matches arrive best first)
+        seen = {}
+        for vector_id, score in hits:
+            doc_id, chunk = parse_chunk_id(vector_id)
+            if doc_id not in seen and len(seen) < top_k:
+                seen[doc_id] = (doc_id, score, chunk)
+        ranked.append(list(seen.values()))
+    return ranked
+
+
+def _keyword_ranked(queries: list[str], top_k: int,
+                    timings: SearchTimings) -> list[list[tuple[str, float, Optional[int]]]]:
+    """BM25 search → per query [(doc_id, score, None)], best first."""
+    from pr_agent.core.keyword_index import get_keyword_index
+
+    index = get_keyword_index()
+    ranked, per_query = [], []
+    t0 = time.perf_counter()
+    for query in queries:
+        start = time.perf_counter()
+        ranked.append([(doc_id, score, None) for doc_id, score in index.search(query, top_k)])
+        per_query.append(time.perf_counter() - start)
+    timings.keyword = time.perf_counter() - t0
+    if timings.per_query:
+        timings.per_query = [a + b for a, b in zip(timings.per_query, per_query)]
+    else:
+        timings.per_query = per_query
+    return ranked
+
+
+def _join_metadata(ranked: list[list[tuple[str, float, Optional[int]]]],
+                   timings: SearchTimings) -> list[list[SearchHit]]:
+    t0 = time.perf_counter()
+    offsets = {}
+    chunk_docs = {doc_id for hits in ranked for doc_id, _, chunk in hits if chunk is not None}
+    if chunk_docs:
+        rows = get_chunk_manifest().get_many(list(chunk_docs))
+        offsets = {(doc_id, idx): (s, e) for doc_id, rs in rows.items() for idx, s, e, _ in rs}
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    metas = store.read_many({doc_id for hits in ranked for doc_id, _, _ in hits})
+    timings.metadata = time.perf_counter() - t0
+
+    results = []
+    for hits in ranked:
+        out = []
+        for doc_id, score, chunk in hits:
+            meta = metas.get(doc_id, {})
+            start, end = offsets.get((doc_id, chunk), (None, None))
+            out.append(SearchHit(
+                doc_id=doc_id,
+                score=score,
+                filename=meta.get("Original Filename") or meta.get("original_filename", ""),
+                url=meta.get("File URL") or meta.get("file_url", ""),
+                summary=meta.get("Summary") or meta.get("summary", ""),
+                chunk=chunk,
+                start=start,
+                end=end,
+            ))
+        results.append(out)
+    return results
+
+
+def search(query: str, top_k: int = 5, chunks: bool = False, mode: str = "semantic") -> list[SearchHit]:
+    """Single-query convenience wrapper around search_many()."""
+    return search_many([query], top_k, chunks=chunks, mode=mode)[0]
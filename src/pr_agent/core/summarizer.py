@@ -4,27 +4,46 @@ from dotenv import load_dotenv
 load_dotenv()   
 
 import time
-from tiktoken import encoding_for_model
-from pydantic_ai import Agent
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
-from pydantic_ai.exceptions import ModelHTTPError
+from typing import Optional
+from pr_agent.core.metrics import metrics
 from pr_agent.settings import settings
 
 #gemini_key = os.environ["GEMINI_API_KEY"]
-# ─── Instantiate a single Gemini‐Flash agent ───────────────────────────────
-# (it will read your API key and model name from settings)
-
-agent = Agent(
-    settings.GEMINI_MODEL,            # e.g. "gemini-1.5-flash-latest"
-    provider=GoogleGLAProvider(api_key=settings.GEMINI_API_KEY),
-    system_prompt=(
-        "You are a summarization assistant. "
-        "Given a block of text, extract its most important sentences "
-        "and return a clear, concise summary."
-        "Remove any formatting characters like the newline character \n or ** and others."
-    ),
-    output_type=str,
-)
+# ─── Single Gemini‐Flash agent, built on first use ─────────────────────────
+# (it will read your API key and model name from settings). pydantic_ai and
+# its Gemini provider are only imported once a summary is actually needed.
+
+_agent = None
+
+def _get_agent():
+    global _agent
+    if _agent is None:
+        from pydantic_ai import Agent
+        from pydantic_ai.providers.google_gla import GoogleGLAProvider
+
+        settings.require("GEMINI_API_KEY")
+        _agent = Agent(
+            settings.GEMINI_MODEL,            # e.g. "gemini-1.5-flash-latest"
+            provider=GoogleGLAProvider(api_key=settings.GEMINI_API_KEY),
+            system_prompt=(
+                "You are a summarization assistant. "
+                "Given a block of text, extract its most important sentences "
+                "and return a clear, concise summary."
+                "Remove any formatting characters like the newline character \n or ** and others."
+            ),
+            output_type=str,
+        )
+    return _agent
+
+def _count_tokens(resp):
+    """Tokens in / out as reported by the model (pydantic_ai names vary by version)."""
+    if not metrics.enabled:
+        return
+    usage = resp.usage()
+    tokens_in = getattr(usage, "input_tokens", None) or getattr(usage, "request_tokens", None) or 0
+    tokens_out = getattr(usage, "output_tokens", None) or getattr(usage, "response_tokens", None) or 0
+    metrics.inc("gemini_tokens_total", tokens_in, direction="in")
+    metrics.inc("gemini_tokens_total", tokens_out, direction="out")
 
 # def call_gemini(prompt: str, max_tokens: int) -> str:
 #     """
@@ -38,22 +57,30 @@ def call_gemini(prompt: str, max_tokens: int) -> str:
     Send `prompt` to Gemini-Flash and return the generated text,
     retrying up to 3 times on HTTP 503 errors.
     """
+    from pydantic_ai.exceptions import ModelHTTPError
+
+    agent = _get_agent()
     max_retries = 3
     delay = 1
     for attempt in range(max_retries):
         try:
-            resp = agent.run_sync(prompt, max_output_tokens=max_tokens)
+            with metrics.timer("gemini_call_seconds"):
+                resp = agent.run_sync(prompt, max_output_tokens=max_tokens)
+            metrics.inc("gemini_calls_total")
+            _count_tokens(resp)
             return resp.output.strip()
         except ModelHTTPError as e:
+            metrics.inc("gemini_errors_total", status=getattr(e, "status_code", None))
             # retry on transient “503 Service Unavailable”
             if getattr(e, "status_code", None) == 503 and attempt < max_retries - 1:
+                metrics.inc("gemini_retries_total")
                 time.sleep(delay)
                 delay *= 2
                 continue
             raise
 
 
-def extract_summary(text: str) -> str:
+def extract_summary(text: str, extracted: Optional[list[str]] = None, on_extract=None) -> str:
     """
     Summarize `text` using a 3-branch strategy:
       • < 800 words:    extract 5 sentences (then truncate if >300 words)
@@ -61,6 +88,11 @@ def extract_summary(text: str) -> str:
       • > 2000 words:   chunk into ~500-word pieces, extract 2 sentences each,
                         concat and truncate if >300 words
     Finally enforce an absolute token limit via one more Gemini call.
+
+    Long documents take one call per chunk: `extracted` holds the chunk
+    extracts of an interrupted earlier attempt (they are not requested
+    again) and `on_extract(extracted)` is called after every new one, so
+    the caller can checkpoint them.
     """
     words = text.split()
     n = len(words)
@@ -111,13 +143,15 @@ def extract_summary(text: str) -> str:
         # increase chunk size to reduce calls
         chunks = [" ".join(words[i : i + 1000]) for i in range(0, n, 1000)]
 
-        extracted = []
-        for chunk in chunks:
+        extracted = list(extracted or [])[:len(chunks)]
+        for chunk in chunks[len(extracted):]:
             response = call_gemini(
                 f"Extract the 3 most important sentences from the following text:\n\n{chunk}",
                 max_tokens=150
             )
             extracted.append(response)
+            if on_extract:
+                on_extract(extracted)
             time.sleep(4.5)
         
         summary = " ".join(extracted)
@@ -132,6 +166,8 @@ def extract_summary(text: str) -> str:
 
 
     # ─── Final token-limit enforcement ──────────────────────────────────────
+    from tiktoken import encoding_for_model
+
     enc    = encoding_for_model(settings.EMBED_TOKEN_MODEL)
     tokens = len(enc.encode(summary))
     if tokens > settings.TOKEN_LIMIT:
@@ -1,14 +1,14 @@
 # pr_agent/core/text_extractor.py
 
 import os
-import pandas as pd
-import pypandoc
-from pr_agent.drive_client import fetch_file_bytes  # used only if you want to re-fetch, but optional
+from pr_agent.core.converter import PANDOC_FORMATS, get_conversion_service
 
 def extract_text(source_item) -> str:
     """
     Given a SourceItem (with raw_bytes and name), 
-    return a plain-text string for PDF, DOCX, TXT, XLSX.
+    return a plain-text string for PDF, DOCX, TXT, XLSX and the
+    pandoc-converted legacy formats (DOC, RTF, ODT, HTML).
+    Raises ConversionError if a legacy-format conversion fails.
     """
     from io import BytesIO
     buffer = source_item.raw_bytes
@@ -18,13 +18,10 @@ def extract_text(source_item) -> str:
     if ext in [".txt", ".md"]:
         return buffer.read().decode("utf-8", errors="ignore")
     
-    elif ext == ".doc":
-        import pypandoc
-        try:
-            raw = buffer.read()
-            return pypandoc.convert_text(raw, to="plain", format="doc")
-        except Exception:
-            return ""
+    elif ext in PANDOC_FORMATS:
+        # .doc/.rtf/.odt/.html go through the resident pandoc worker pool;
+        # ConversionError carries the reason up to process_pending
+        return get_conversion_service().convert(buffer.read(), ext)
 
 
     elif ext == ".docx":
@@ -45,6 +42,7 @@ def extract_text(source_item) -> str:
             return ""
 
     elif ext in [".xlsx", ".xls"]:
+        import pandas as pd
         try:
             df = pd.read_excel(buffer, engine="openpyxl")
             text_rows = df.astype(str).apply(lambda row: " ".join(row), axis=1)
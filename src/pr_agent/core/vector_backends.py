@@ -0,0 +1,244 @@
+# pr_agent/core/vector_backends.py
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from pr_agent.core.embedding_store import EmbeddingStore
+from pr_agent.core.metrics import metrics
+from pr_agent.core.vector_index import BLOCK_ROWS, IVFIndex, exact_search, normalize, rescore
+from pr_agent.settings import settings
+
+
+class VectorBackend:
+    """
+    Where document vectors are indexed and searched.
+
+    Query results use Pinecone's shape so callers need not care which
+    backend answered: {"matches": [{"id", "score", "metadata"}, ...]}.
+    """
+    def upsert(self, items: list[tuple[str, np.ndarray, dict]]):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int = 5, include_metadata: bool = True) -> dict:
+        return self.query_many([vector], top_k, include_metadata)[0]
+
+    def query_many(self, vectors, top_k: int = 5, include_metadata: bool = True) -> list[dict]:
+        return [self.query(v, top_k, include_metadata) for v in vectors]
+
+    def delete(self, ids: list[str]):
+        raise NotImplementedError
+
+
+class PineconeBackend(VectorBackend):
+    """The remote Pinecone index named by PINECONE_INDEX (optionally one namespace of it)."""
+    def __init__(self, namespace: str = ""):
+        from pinecone import Pinecone
+
+        settings.require("PINECONE_API_KEY")
+        self._pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        self._index = self._pc.Index(settings.PINECONE_INDEX)
+        self._ns = {"namespace": namespace} if namespace else {}
+
+    def upsert(self, items):
+        # float32 arrays inside the pipeline; Pinecone's client wants lists
+        items = [(i, np.asarray(v, dtype=np.float32).tolist(), m) for i, v, m in items]
+        for start in range(0, len(items), 100):  # Pinecone caps request size
+            with metrics.timer("pinecone_request_seconds", op="upsert"):
+                self._index.upsert(items[start:start + 100], **self._ns)
+            metrics.inc("pinecone_requests_total", op="upsert")
+            metrics.inc("pinecone_vectors_upserted_total", len(items[start:start + 100]))
+
+    def query(self, vector, top_k=5, include_metadata=True):
+        metrics.inc("pinecone_requests_total", op="query")
+        with metrics.timer("pinecone_request_seconds", op="query"):
+            return self._index.query(
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
+                top_k=top_k,
+                include_metadata=include_metadata,
+                **self._ns
+            )
+
+    def delete(self, ids):
+        self._index.delete(ids=list(ids), **self._ns)
+
+
+class LocalBackend(VectorBackend):
+    """
+    Offline backend over the local EmbeddingStore.
+
+    Small corpora (or LOCAL_INDEX_TYPE=exact) are searched by exact cosine
+    top-k over the memory-mapped matrix. Otherwise an IVF index is built
+    and persisted under index_dir; rows appended since the last build are
+    scanned exactly alongside it, and it is rebuilt once they exceed
+    IVF_REBUILD_RATIO of the indexed rows. Per-vector metadata lives in a
+    small SQLite table next to the index.
+    """
+    def __init__(self, store: Optional[EmbeddingStore] = None, index_dir: Optional[str] = None):
+        if store is None:
+            store = EmbeddingStore(settings.EMBEDDINGS_DIR, dtype=settings.EMBEDDING_DTYPE,
+                                   keep_full=settings.EMBEDDING_KEEP_FULL)
+        self.store = store
+        self.index_dir = Path(index_dir or self.store.root / "local-index")
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._ivf: Optional[IVFIndex] = None
+        self._norms = np.empty(0, dtype=np.float32)
+        self._norms_generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_dir / "metadata.sqlite", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS metadata (id TEXT PRIMARY KEY, json TEXT)")
+        self._db.commit()
+
+    @property
+    def ivf_path(self) -> Path:
+        return self.index_dir / "ivf.npz"
+
+    # ─── writes ────────────────────────────────────────────────────────────
+    def upsert(self, items):
+        items = list(items)
+        self.store.put_many((doc_id, vec) for doc_id, vec, _ in items)
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO metadata (id, json) VALUES (?, ?)",
+                [(doc_id, json.dumps(meta or {}, ensure_ascii=False)) for doc_id, _, meta in items],
+            )
+            self._db.commit()
+
+    def delete(self, ids):
+        ids = list(ids)
+        self.store.delete(ids)
+        with self._lock:
+            self._db.executemany("DELETE FROM metadata WHERE id = ?", [(i,) for i in ids])
+            self._db.commit()
+
+    def metadata(self, ids: list[str]) -> dict[str, dict]:
+        """Fetch metadata for many ids in one query."""
+        if not ids:
+            return {}
+        out = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for doc_id, blob in self._db.execute(
+                        f"SELECT id, json FROM metadata WHERE id IN ({marks})", chunk):
+                    out[doc_id] = json.loads(blob)
+        return out
+
+    # ─── index maintenance ─────────────────────────────────────────────────
+    def build_index(self, nlist: Optional[int] = None) -> IVFIndex:
+        """(Re)build and persist the IVF index over all live rows."""
+        self.store.refresh()
+        _, rows, mat = self.store.live()
+        ivf = IVFIndex.build(mat, np.sort(rows), self.store.generation, nlist=nlist)
+        ivf.save(self.ivf_path)
+        self._ivf = ivf
+        return ivf
+
+    def _current_ivf(self, live_count: int) -> Optional[IVFIndex]:
+        if settings.LOCAL_INDEX_TYPE != "ivf" or live_count < settings.IVF_MIN_ROWS:
+            return None
+        ivf = self._ivf or IVFIndex.load(self.ivf_path)
+        stale = (ivf is None
+                 or ivf.generation != self.store.generation
+                 or self.store.rows - ivf.built_rows > settings.IVF_REBUILD_RATIO * ivf.built_rows)
+        if stale:
+            ivf = self.build_index()
+        self._ivf = ivf
+        return ivf
+
+    def _row_norms(self, mat: np.ndarray) -> np.ndarray:
+        """
+        L2 norm of every stored row. Rows are append-only within a
+        generation, so norms are computed once and only extended.
+        """
+        with self._lock:
+            if self._norms_generation != self.store.generation:
+                self._norms = np.empty(0, dtype=np.float32)
+                self._norms_generation = self.store.generation
+            done = len(self._norms)
+            if done < len(mat):
+                fresh = [np.linalg.norm(np.asarray(mat[start:start + BLOCK_ROWS], dtype=np.float32), axis=1)
+                         for start in range(done, len(mat), BLOCK_ROWS)]
+                self._norms = np.concatenate([self._norms, *fresh])
+            return self._norms
+
+    # ─── search ────────────────────────────────────────────────────────────
+    def search(self, vectors, top_k: int = 5) -> list[list[tuple[str, float]]]:
+        """
+        Top-k (id, cosine score) lists, one per query vector. On a quantized
+        store that keeps full-precision rows, SEARCH_RESCORE_FACTOR × top_k
+        candidates are taken from the quantized matrix and re-ranked in float32.
+        """
+        self.store.refresh()
+        queries = normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        _, rows, mat = self.store.live()
+        if len(rows) == 0:
+            return [[] for _ in queries]
+        row_ids = self.store.row_ids
+
+        full = self.store.full_matrix() if self.store.quantized else None
+        fetch_k = top_k * settings.SEARCH_RESCORE_FACTOR if full is not None else top_k
+
+        ivf = self._current_ivf(len(rows))
+        norms = self._row_norms(mat)
+        if ivf is None:
+            pos, scores = exact_search(mat, rows, queries, fetch_k, norms=norms[rows])
+            candidates = [(rows[ps], ss) for ps, ss in zip(pos, scores)]
+        else:
+            live_mask = np.zeros(self.store.rows, dtype=bool)
+            live_mask[rows] = True
+            delta = rows[rows >= ivf.built_rows]
+            candidates = []
+            for q, (cand_rows, cand_scores) in zip(queries, ivf.search(mat, queries, fetch_k, settings.IVF_NPROBE, live_mask)):
+                if len(delta):
+                    pos, scores = exact_search(mat, delta, q[None, :], fetch_k, norms=norms[delta])
+                    cand_rows = np.concatenate([cand_rows, delta[pos[0]]])
+                    cand_scores = np.concatenate([cand_scores, scores[0]])
+                order = np.argsort(-cand_scores)[:fetch_k]
+                candidates.append((cand_rows[order], cand_scores[order]))
+
+        if full is not None:
+            candidates = [rescore(full, cand_rows, q, top_k) for q, (cand_rows, _) in zip(queries, candidates)]
+        return [[(row_ids[r], float(s)) for r, s in zip(cand_rows[:top_k], cand_scores[:top_k])]
+                for cand_rows, cand_scores in candidates]
+
+    def query_many(self, vectors, top_k=5, include_metadata=True):
+        hits = self.search(vectors, top_k)
+        metas = self.metadata(list({i for h in hits for i, _ in h})) if include_metadata else {}
+        return [
+            {"matches": [
+                {"id": doc_id, "score": score, **({"metadata": metas.get(doc_id, {})} if include_metadata else {})}
+                for doc_id, score in h
+            ]}
+            for h in hits
+        ]
+
+
+_backends: dict[str, VectorBackend] = {}
+_backend_lock = threading.Lock()
+
+def get_vector_backend(namespace: str = "") -> VectorBackend:
+    """
+    The process-wide backend selected by settings.VECTOR_BACKEND. Document
+    vectors live in the default namespace; other namespaces (e.g. "chunks")
+    are a Pinecone namespace or, locally, their own store under
+    EMBEDDINGS_DIR/<namespace>.
+    """
+    with _backend_lock:
+        if namespace not in _backends:
+            if settings.VECTOR_BACKEND == "local":
+                store = None
+                if namespace:
+                    store = EmbeddingStore(settings.EMBEDDINGS_DIR / namespace, dtype=settings.EMBEDDING_DTYPE,
+                                           keep_full=settings.EMBEDDING_KEEP_FULL)
+                _backends[namespace] = LocalBackend(store)
+            elif settings.VECTOR_BACKEND == "pinecone":
+                _backends[namespace] = PineconeBackend(namespace)
+            else:
+                raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+    return _backends[namespace]
@@ -0,0 +1,185 @@
+# pr_agent/core/vector_index.py
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Rows are scored in blocks of this many so memory stays bounded on big corpora.
+BLOCK_ROWS = 65536
+
+
+def normalize(mat: np.ndarray) -> np.ndarray:
+    """L2-normalise rows as float32 (zero rows stay zero)."""
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Column-wise top-k of a (rows, queries) score matrix.
+    Returns (positions, scores), each (queries, k), best first.
+    """
+    k = min(k, scores.shape[0])
+    if k == 0:
+        return (np.empty((scores.shape[1], 0), dtype=np.int64),
+                np.empty((scores.shape[1], 0), dtype=np.float32))
+    part = np.argpartition(-scores, k - 1, axis=0)[:k].T
+    part_scores = np.take_along_axis(scores.T, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def _merge(best_pos, best_scores, pos, scores, k):
+    """Merge two (queries, *) candidate sets, keeping the k best per query."""
+    if best_pos is None:
+        return pos, scores
+    pos = np.concatenate([best_pos, pos], axis=1)
+    scores = np.concatenate([best_scores, scores], axis=1)
+    sel, sel_scores = top_k(scores.T, k)
+    return np.take_along_axis(pos, sel, axis=1), sel_scores
+
+
+def exact_search(matrix: np.ndarray, rows: np.ndarray, queries: np.ndarray,
+                 k: int, norms: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force cosine top-k of `queries` (normalised, (q, d)) against
+    matrix[rows], scanned block by block. Returns (positions into `rows`,
+    scores), each (q, k).
+    """
+    best_pos = best_scores = None
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block_rows = rows[start:start + BLOCK_ROWS]
+        if np.all(np.diff(block_rows) == 1):
+            # ascending contiguous run (the common no-tombstone case): slice, don't gather
+            block = np.asarray(matrix[block_rows[0]:block_rows[-1] + 1], dtype=np.float32)
+        else:
+            block = np.asarray(matrix[block_rows], dtype=np.float32)
+        scores = block @ queries.T
+        if norms is None:
+            block_norms = np.linalg.norm(block, axis=1)
+        else:
+            block_norms = norms[start:start + BLOCK_ROWS]
+        scores /= np.where(block_norms == 0, 1.0, block_norms)[:, None]
+        pos, sc = top_k(scores, k)
+        best_pos, best_scores = _merge(best_pos, best_scores, pos + start, sc, k)
+    if best_pos is None:
+        empty = np.empty((len(queries), 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    return best_pos, best_scores
+
+
+def rescore(full: np.ndarray, cand_rows: np.ndarray, query: np.ndarray,
+            k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Re-rank candidate rows found on a quantized matrix by exact float32
+    cosine against `full`. Returns (rows, scores), best first.
+    """
+    if len(cand_rows) == 0:
+        return cand_rows, np.empty(0, dtype=np.float32)
+    cand_rows = np.sort(cand_rows)          # sequential reads from the memmap
+    vecs = np.asarray(full[cand_rows], dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1)
+    scores = (vecs @ query) / np.where(norms == 0, 1.0, norms)
+    pos, sc = top_k(scores[:, None], k)
+    return cand_rows[pos[0]], sc[0]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index over rows of an EmbeddingStore matrix.
+
+    Rows are clustered by spherical k-means into `nlist` lists; a query
+    scores only the rows in its `nprobe` closest lists. The index stores
+    row numbers and norms, never vectors, so it stays small and reads the
+    vectors themselves from the store's memmap.
+    """
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray,
+                 list_rows: np.ndarray, list_norms: np.ndarray,
+                 generation: int, built_rows: int):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.list_rows = list_rows
+        self.list_norms = list_norms
+        self.generation = generation
+        self.built_rows = built_rows
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, rows: np.ndarray, generation: int,
+              nlist: Optional[int] = None, iters: int = 10,
+              sample_size: int = 100_000, seed: int = 0) -> "IVFIndex":
+        n = len(rows)
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 8 or 1))
+        rng = np.random.default_rng(seed)
+
+        # 1) spherical k-means on a sample
+        sample = rows if n <= sample_size else np.sort(rng.choice(rows, sample_size, replace=False))
+        data = normalize(matrix[sample])
+        centroids = data[rng.choice(len(data), nlist, replace=False)]
+        for _ in range(iters):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+
+        # 2) assign every row, block by block
+        assign = np.empty(n, dtype=np.int64)
+        norms = np.empty(n, dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            block = np.asarray(matrix[rows[start:start + BLOCK_ROWS]], dtype=np.float32)
+            norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+        return cls(centroids, offsets, rows[order], norms[order],
+                   generation, int(rows.max()) + 1 if n else 0)
+
+    def search(self, matrix: np.ndarray, queries: np.ndarray, k: int,
+               nprobe: int, live_mask: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns one (rows, scores) pair per query, best first. Rows that
+        are no longer live are skipped.
+        """
+        nprobe = min(nprobe, self.nlist)
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for q, lists in zip(queries, probes):
+            cand_rows = np.concatenate([self.list_rows[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            cand_norms = np.concatenate([self.list_norms[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            keep = live_mask[cand_rows]
+            cand_rows, cand_norms = cand_rows[keep], cand_norms[keep]
+            order = np.argsort(cand_rows)       # sequential reads from the memmap
+            cand_rows, cand_norms = cand_rows[order], cand_norms[order]
+            if len(cand_rows) == 0:
+                results.append((cand_rows, np.empty(0, dtype=np.float32)))
+                continue
+            pos, scores = exact_search(matrix, cand_rows, q[None, :], k, norms=cand_norms)
+            results.append((cand_rows[pos[0]], scores[0]))
+        return results
+
+    def save(self, path: Path):
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, centroids=self.centroids, offsets=self.offsets,
+                 list_rows=self.list_rows, list_norms=self.list_norms,
+                 generation=self.generation, built_rows=self.built_rows)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["IVFIndex"]:
+        if not path.exists():
+            return None
+        with np.load(path) as z:
+            return cls(z["centroids"], z["offsets"], z["list_rows"], z["list_norms"],
+                       int(z["generation"]), int(z["built_rows"]))
@@ -1,24 +1,112 @@
 # pr_agent/drive_client.py
 
+import hashlib
 import io
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Optional
 #from pr_agent.settings import GDRIVE_CREDFILE, GDRIVE_SCOPES
 
+from pr_agent.core.http_cache import get_http_cache
+from pr_agent.core.metrics import metrics
 from pr_agent.settings import settings  
 
-credfile = settings.GDRIVE_CRED_FILE
 gdrive_scope = settings.GDRIVE_SCOPES
 
+# The google client libraries take a while to import; they are loaded on
+# first use so commands that never touch Drive don't pay for them.
+
+def _download(request) -> io.BytesIO:
+    """Run a media request chunk by chunk into a BytesIO positioned at start."""
+    from googleapiclient.http import MediaIoBaseDownload
+
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, request)
+    done = False
+    with metrics.timer("drive_request_seconds", op="download"):
+        while not done:
+            status, done = downloader.next_chunk()
+            metrics.inc("drive_requests_total", op="download")
+    metrics.inc("drive_bytes_total", buffer.tell(), op="download")
+    buffer.seek(0)
+    return buffer
+
+def _conditional(request, key: str):
+    """
+    Make `request` conditional on the cached response for `key`: its ETag
+    goes out as If-None-Match, and the response's ETag is captured into
+    the returned dict. Returns (cache, cached response, captured).
+    """
+    cache = get_http_cache()
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None and cached.etag:
+        request.headers["If-None-Match"] = cached.etag
+
+    captured = {}
+    postproc = request.postproc
+
+    def _capture(resp, content):
+        captured["etag"] = resp.get("etag")
+        return postproc(resp, content)
+
+    request.postproc = _capture
+    return cache, cached, captured
+
+
+def _settle(key: str, cache, cached, captured: dict, result=None, error=None):
+    """
+    The outcome of a conditional request: a 304 returns the cached body,
+    a fresh result is stored with its ETag, any other error is raised.
+    """
+    if error is not None:
+        if cached is not None and getattr(getattr(error, "resp", None), "status", None) == 304:
+            metrics.inc("http_cache_total", api="drive", result="revalidated")
+            metrics.inc("http_cache_bytes_saved_total", len(cached.body), api="drive")
+            return json.loads(cached.body)
+        raise error
+    if cache is not None:
+        metrics.inc("http_cache_total", api="drive", result="miss")
+        cache.put(key, json.dumps(result).encode(), etag=captured.get("etag"))
+    return result
+
+
+def _execute_cached(request, key: str) -> dict:
+    """
+    request.execute(), made conditional on the HTTP cache: an unchanged
+    listing costs a round trip (a 304) but no transfer.
+    """
+    from googleapiclient.errors import HttpError
+
+    state = _conditional(request, key)
+    try:
+        result = request.execute()
+    except HttpError as e:
+        return _settle(key, *state, error=e)
+    return _settle(key, *state, result=result)
+
+# httplib2 (under the Drive client) is not thread-safe: one client per thread
+_local = threading.local()
+
 def get_drive_service():
     """
-    Returns an authenticated Drive API client (service account).
+    Returns an authenticated Drive API client (service account), built on
+    first use in each thread and reused after that.
     """
+    service = getattr(_local, "service", None)
+    if service is not None:
+        return service
+
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
+    settings.require("GDRIVE_CRED_FILE")
     creds = service_account.Credentials.from_service_account_file(
-        credfile, scopes=gdrive_scope
+        settings.GDRIVE_CRED_FILE, scopes=gdrive_scope
     )
-    return build("drive", "v3", credentials=creds)
+    _local.service = build("drive", "v3", credentials=creds)
+    return _local.service
 
 def list_files_in_folder(folder_id: str):
     """
@@ -31,21 +119,166 @@ def list_files_in_folder(folder_id: str):
 
     query = f"'{folder_id}' in parents and trashed = false"
     while True:
-        resp = service.files().list(
+        request = service.files().list(
             q=query,
             corpora="allDrives",
             includeItemsFromAllDrives=True,
             supportsAllDrives=True,
             spaces="drive",
-            fields="nextPageToken, files(id, name, mimeType, modifiedTime, webViewLink)",
+            fields=LIST_FIELDS,
             pageToken=page_token
-        ).execute()
+        )
+        with metrics.timer("drive_request_seconds", op="list"):
+            resp = _execute_cached(request, f"drive:list:{folder_id}:{page_token or ''}")
+        metrics.inc("drive_requests_total", op="list")
         results.extend(resp.get("files", []))
         page_token = resp.get("nextPageToken")
         if not page_token:
             break
     return results
 
+# ─── Batches ───────────────────────────────────────────────────────────────
+# Metadata calls for many files go out as Google batch requests (one HTTP
+# round trip for up to DRIVE_BATCH_SIZE calls, 100 at most). Each call in
+# a batch succeeds or fails on its own; failures worth retrying (rate
+# limits, 5xx) are sent again in a later batch with backoff.
+
+FILE_FIELDS = "id, name, mimeType, md5Checksum, size, modifiedTime, webViewLink, parents, trashed"
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, modifiedTime, webViewLink)"
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _retryable(error: Exception) -> bool:
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status == 403:
+        # Drive reports per-user rate limits as 403 rateLimitExceeded
+        return b"ateLimitExceeded" in (getattr(error, "content", b"") or b"")
+    return status in _RETRY_STATUS
+
+
+def is_not_found(error: Exception) -> bool:
+    return getattr(getattr(error, "resp", None), "status", None) == 404
+
+
+def execute_batch(calls: dict, max_retries: Optional[int] = None, on_result=None) -> tuple[dict, dict]:
+    """
+    Run `calls` (key → function building an HttpRequest from the service)
+    in batches. Returns (results, errors), both keyed like `calls`; a call
+    ends up in `errors` once it fails with a non-retryable error or has
+    used up `max_retries` (DRIVE_BATCH_RETRIES) retries. `on_result(key,
+    response, error)`, if given, sees every outcome and returns the value
+    to keep (or raises to record an error).
+    """
+    from googleapiclient.errors import HttpError
+
+    max_retries = settings.DRIVE_BATCH_RETRIES if max_retries is None else max_retries
+    size = min(settings.DRIVE_BATCH_SIZE, 100)
+    service = get_drive_service()
+    results, errors = {}, {}
+    pending = list(calls)
+    attempt = 0
+    while pending:
+        retry = []
+
+        def _callback(key, response, error):
+            if error is not None and _retryable(error) and attempt < max_retries:
+                retry.append(key)
+                return
+            if on_result is not None:
+                try:
+                    response, error = on_result(key, response, error), None
+                except Exception as e:
+                    error = e
+            if error is None:
+                results[key] = response
+            else:
+                errors[key] = error
+
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            batch = service.new_batch_http_request(callback=_callback)
+            for key in chunk:
+                batch.add(calls[key](service), request_id=key)
+            try:
+                with metrics.timer("drive_request_seconds", op="batch"):
+                    batch.execute()
+            except HttpError as e:
+                # the whole batch was refused (e.g. 503 from the batch endpoint)
+                for key in chunk:
+                    _callback(key, None, e)
+            metrics.inc("drive_requests_total", op="batch")
+            metrics.inc("drive_batched_calls_total", len(chunk))
+
+        pending = retry
+        attempt += 1
+        if pending:
+            metrics.inc("drive_retries_total", len(pending), op="batch")
+            time.sleep(settings.DRIVE_BATCH_BACKOFF * 2 ** (attempt - 1))
+    return results, errors
+
+
+def get_files(file_ids, fields: str = FILE_FIELDS) -> tuple[dict, dict]:
+    """
+    files.get for many IDs at once. Returns (files, errors): files maps
+    every ID to its metadata, or to None if Drive no longer has it (404);
+    errors holds the IDs whose lookup failed otherwise.
+    """
+    calls = {
+        file_id: (lambda service, file_id=file_id: service.files().get(
+            fileId=file_id, fields=fields, supportsAllDrives=True))
+        for file_id in dict.fromkeys(file_ids)
+    }
+    found, errors = execute_batch(calls)
+    for file_id, error in list(errors.items()):
+        if is_not_found(error):
+            found[file_id] = None
+            del errors[file_id]
+    return found, errors
+
+
+def list_folders(folder_ids) -> tuple[dict, dict]:
+    """
+    list_files_in_folder() for many folders at once: first pages in
+    batches, then the next pages of the folders that have more, each
+    revalidated against the HTTP cache like a single listing. Returns
+    (files per folder ID, errors per folder ID).
+    """
+    listed = {folder_id: [] for folder_id in dict.fromkeys(folder_ids)}
+    errors = {}
+    tokens = {folder_id: None for folder_id in listed}
+    while tokens:
+        states = {}
+
+        def _build(service, folder_id):
+            request = service.files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                corpora="allDrives",
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+                spaces="drive",
+                fields=LIST_FIELDS,
+                pageToken=tokens[folder_id],
+            )
+            states[folder_id] = _conditional(request, f"drive:list:{folder_id}:{tokens[folder_id] or ''}")
+            return request
+
+        def _result(folder_id, response, error):
+            key = f"drive:list:{folder_id}:{tokens[folder_id] or ''}"
+            return _settle(key, *states[folder_id], result=response, error=error)
+
+        pages, failed = execute_batch({f: (lambda service, f=f: _build(service, f)) for f in tokens},
+                                      on_result=_result)
+        errors.update(failed)
+        tokens = {}
+        for folder_id, page in pages.items():
+            listed[folder_id].extend(page.get("files", []))
+            if page.get("nextPageToken"):
+                tokens[folder_id] = page["nextPageToken"]
+    for folder_id in errors:
+        listed.pop(folder_id, None)
+    return listed, errors
+
+
 def fetch_file_bytes(file_id: str):
     """
     Download a file’s raw bytes from Drive into an in‐memory BytesIO buffer.
@@ -53,13 +286,7 @@ def fetch_file_bytes(file_id: str):
     """
     service = get_drive_service()
     request = service.files().get_media(fileId=file_id)
-    buffer = io.BytesIO()
-    downloader = MediaIoBaseDownload(buffer, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    buffer.seek(0)
-    return buffer
+    return _download(request)
 
 def download_file_bytes(file_id: str, mime_type: str) -> io.BytesIO:
     """
@@ -97,10 +324,100 @@ def download_file_bytes(file_id: str, mime_type: str) -> io.BytesIO:
     else:
         request = service.files().get_media(fileId=file_id)
 
-    buffer = io.BytesIO()
-    downloader = MediaIoBaseDownload(buffer, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    buffer.seek(0)
-    return buffer
+    return _download(request)
+
+
+def _media_request(service, file_id: str, mime_type: str):
+    if mime_type and mime_type.startswith("application/vnd.google-apps"):
+        return service.files().export_media(fileId=file_id, mimeType="application/pdf")
+    return service.files().get_media(fileId=file_id)
+
+
+def _mismatch(path: Path, size: Optional[str], md5: Optional[str]) -> Optional[str]:
+    """Why `path` does not match the size / MD5 Drive reports, or None if it does."""
+    if size and path.stat().st_size != int(size):
+        return f"size {path.stat().st_size} != {size}"
+    if md5:
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        if digest.hexdigest() != md5:
+            return f"md5 {digest.hexdigest()} != {md5}"
+    return None
+
+
+def stream_file_to(file_id: str, mime_type: str, path, on_bytes=None, max_retries: int = 3,
+                   size: Optional[str] = None, md5: Optional[str] = None) -> int:
+    """
+    Download a file straight to disk, DOWNLOAD_CHUNK_MB per ranged request,
+    through `<path>.part`, which is renamed to `path` once complete. A
+    `.part` left by an interrupted download is resumed where it stopped
+    (exports of native Google files cannot be ranged and start over).
+    The finished file is checked against the `size` / `md5` Drive reports:
+    a resumed `.part` of an older revision is discarded and the download
+    restarted, a fresh one that does not match raises IOError.
+    `on_bytes(n)` is called after each chunk. Returns the bytes fetched.
+    """
+    path = Path(path)
+    part = path.with_name(path.name + ".part")
+    request = _media_request(get_drive_service(), file_id, mime_type)
+    ranged = not (mime_type or "").startswith("application/vnd.google-apps")
+
+    offset = part.stat().st_size if ranged and part.exists() else 0
+    fetched = _stream_part(request, part, offset, ranged, on_bytes, max_retries)
+    problem = _mismatch(part, size, md5)
+    if problem and offset:
+        # the file changed on Drive since the .part was written
+        part.unlink()
+        fetched += _stream_part(request, part, 0, ranged, on_bytes, max_retries)
+        problem = _mismatch(part, size, md5)
+    if problem:
+        part.unlink()
+        raise IOError(f"Drive file {file_id} downloaded corrupt: {problem}")
+    part.replace(path)
+    return fetched
+
+
+def _stream_part(request, part: Path, offset: int, ranged: bool, on_bytes, max_retries: int) -> int:
+    """Fill `part` from `offset` to the end of the file; returns the bytes fetched."""
+    from googleapiclient.errors import HttpError
+
+    chunk = max(int(settings.DOWNLOAD_CHUNK_MB * 2**20), 1)
+    fetched, total, attempt = 0, None, 0
+    with open(part, "r+b" if offset else "wb") as out:
+        out.seek(offset)
+        while total is None or offset < total:
+            headers = dict(request.headers)
+            if ranged:
+                headers["range"] = f"bytes={offset}-{offset + chunk - 1}"
+            with metrics.timer("drive_request_seconds", op="download"):
+                resp, content = request.http.request(request.uri, method="GET", headers=headers)
+            metrics.inc("drive_requests_total", op="download")
+            if resp.status == 416:
+                break       # the .part already holds the whole file
+            if resp.status in _RETRY_STATUS and attempt < max_retries:
+                attempt += 1
+                metrics.inc("drive_retries_total", op="download")
+                time.sleep(settings.DRIVE_BATCH_BACKOFF * 2 ** (attempt - 1))
+                continue
+            if resp.status >= 300:
+                raise HttpError(resp, content, uri=request.uri)
+            attempt = 0
+            if resp.status == 200 and offset:
+                # no range support after all: the body is the whole file
+                out.seek(0)
+                out.truncate()
+                offset = 0
+            out.write(content)
+            offset += len(content)
+            fetched += len(content)
+            metrics.inc("drive_bytes_total", len(content), op="download")
+            if on_bytes is not None:
+                on_bytes(len(content))
+            content_range = resp.get("content-range", "")
+            if resp.status == 200 or not content:
+                total = offset
+            elif "/" in content_range and not content_range.endswith("*"):
+                total = int(content_range.rsplit("/", 1)[1])
+    return fetched
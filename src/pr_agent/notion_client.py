@@ -1,18 +1,65 @@
 # pr_agent/notion_client.py
 
+import json
 import requests
+import threading
 import time
+from datetime import datetime
 from typing import Optional
+from urllib.parse import urlparse
 
+from pr_agent.core.http_cache import get_http_cache
+from pr_agent.core.metrics import metrics
 from pr_agent.settings import settings
 
 
 
+_local = threading.local()
+
+# page id → last_edited_time from the latest get_page(). Notion sends no
+# ETags; a page's last_edited_time moves whenever any of its blocks
+# changes, so it validates the cached children of that page.
+_edited: dict[str, str] = {}
+
+# last_edited_time is rounded down to the minute, so an edit made in the
+# same minute as a fetch leaves it unchanged: cached children are only
+# trusted if they were fetched at least this long after that time.
+_EDIT_GRANULARITY_S = 60
+
+
+def _settled(cached, edited: str) -> bool:
+    """True if `cached` was fetched late enough that no edit can hide behind `edited`."""
+    if cached.validator != edited or cached.fetched_at is None:
+        return False
+    try:
+        edited_at = datetime.fromisoformat(edited.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return False
+    return cached.fetched_at - edited_at >= _EDIT_GRANULARITY_S
+
+def _session() -> requests.Session:
+    """A keep-alive session per thread, so repeated calls reuse the connection."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _request(op: str, method: str, url: str, **kwargs) -> requests.Response:
+    """A request on the session, counted (calls, bytes received, latency) per operation."""
+    with metrics.timer("notion_request_seconds", op=op):
+        resp = _session().request(method, url, **kwargs)
+    metrics.inc("notion_requests_total", op=op, status=resp.status_code)
+    metrics.inc("notion_bytes_total", len(resp.content), op=op)
+    return resp
+
+
 def _get_notion_headers() -> dict:
     """
     Returns the HTTP headers required for every Notion API call.
     Includes Authorization and Notion-Version.
     """
+    settings.require("NOTION_TOKEN")
     return {
         "Authorization": f"Bearer {settings.NOTION_TOKEN}",
         "Notion-Version": "2022-06-28",
@@ -28,9 +75,12 @@ def get_page(page_id: str) -> dict:
     url = f"https://api.notion.com/v1/pages/{page_id}"
     headers = _get_notion_headers()
 
-    resp = requests.get(url, headers=headers)
+    resp = _request("page", "GET", url, headers=headers)
     resp.raise_for_status()
-    return resp.json()
+    page = resp.json()
+    if page.get("last_edited_time"):
+        _edited[page_id] = page["last_edited_time"]
+    return page
 
 
 def list_block_children(block_id: str, start_cursor: Optional[str] = None) -> dict:
@@ -40,15 +90,34 @@ def list_block_children(block_id: str, start_cursor: Optional[str] = None) -> di
       - results: List of block objects
       - has_more: bool
       - next_cursor: Optional[str]
-    """
+    If block_id is a page fetched with get_page() and its last_edited_time
+    has not moved since the children were cached, they come from the HTTP
+    cache without a request (cursors then match the cached pages too).
+    Children fetched within a minute of that time are fetched again: the
+    minute-rounded timestamp cannot tell them apart from a later edit.
+    """
+    cache = get_http_cache()
+    edited = _edited.get(block_id)
+    key = f"notion:children:{block_id}:{start_cursor or ''}"
+    if cache is not None and edited:
+        cached = cache.get(key)
+        if cached is not None and _settled(cached, edited):
+            metrics.inc("http_cache_total", api="notion", result="hit")
+            metrics.inc("http_cache_bytes_saved_total", len(cached.body), api="notion")
+            return json.loads(cached.body)
+
     url = f"https://api.notion.com/v1/blocks/{block_id}/children"
     headers = _get_notion_headers()
     params = {}
     if start_cursor:
         params["start_cursor"] = start_cursor
 
-    resp = requests.get(url, headers=headers, params=params)
+    fetched_at = time.time()
+    resp = _request("children", "GET", url, headers=headers, params=params)
     resp.raise_for_status()
+    if cache is not None and edited:
+        metrics.inc("http_cache_total", api="notion", result="miss")
+        cache.put(key, resp.content, validator=edited, fetched_at=fetched_at)
     return resp.json()
 
 
@@ -66,7 +135,7 @@ def query_database(database_id: str, start_cursor: Optional[str] = None) -> dict
     if start_cursor:
         body["start_cursor"] = start_cursor
 
-    resp = requests.post(url, headers=headers, json=body)
+    resp = _request("query", "POST", url, headers=headers, json=body)
     resp.raise_for_status()
     return resp.json()
 
@@ -75,14 +144,30 @@ def download_file(file_url: str, max_retries: int = 3, backoff: float = 1.0) ->
     """
     Download raw bytes from a Notion-hosted file/image URL.
     Retries on 429/5xx errors with exponential backoff.
+    The URLs are signed and change on every fetch, so files are cached by
+    URL path and revalidated with If-None-Match against the stored ETag.
     Returns: raw bytes
     """
+    cache = get_http_cache()
+    parts = urlparse(file_url)
+    key = f"notion:file:{parts.netloc}{parts.path}"
+    cached = cache.get(key) if cache is not None else None
+    headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+
     for attempt in range(1, max_retries + 1):
-        resp = requests.get(file_url)
+        resp = _request("file", "GET", file_url, headers=headers)
+        if resp.status_code == 304 and cached is not None:
+            metrics.inc("http_cache_total", api="notion", result="revalidated")
+            metrics.inc("http_cache_bytes_saved_total", len(cached.body), api="notion")
+            return cached.body
         if resp.status_code == 200:
+            if cache is not None:
+                metrics.inc("http_cache_total", api="notion", result="miss")
+                cache.put(key, resp.content, etag=resp.headers.get("ETag"))
             return resp.content
 
         if resp.status_code in (429, 500, 502, 503, 504) and attempt < max_retries:
+            metrics.inc("notion_retries_total", op="file")
             time.sleep(backoff * attempt)
             continue
 
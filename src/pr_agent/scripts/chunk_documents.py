@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# scripts/chunk_documents.py
+
+import argparse
+import time
+
+from pr_agent.core.chunker import ChunkStats, get_chunk_manifest, index_chunks, remove_chunks
+from pr_agent.core.metadata_manager import DirectoryMetadataStore
+from pr_agent.core.raw_store import get_raw_store
+from pr_agent.settings import settings
+
+
+def _is_processed(meta: dict) -> bool:
+    # processed documents carry the lowercase payload written by json_writer
+    meta = meta or {}
+    return (meta.get("Status") or meta.get("status")) == "Processed"
+
+
+def chunk_documents(doc_ids: list[str] = None, batch_docs: int = None) -> ChunkStats:
+    """
+    Bring chunk embeddings up to date for every processed document (or just
+    `doc_ids`). Raw text comes from the raw-text store; documents are
+    chunked and encoded CHUNK_DOC_BATCH at a time so the model always gets
+    full batches. Chunks of documents that are gone are removed.
+    """
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    raw_store = get_raw_store()
+    batch_docs = batch_docs or settings.CHUNK_DOC_BATCH
+
+    if doc_ids is None:
+        doc_ids = [d for d in sorted(store.get_all_ids()) if _is_processed(store.read(d)) and d in raw_store]
+        gone = sorted(set(get_chunk_manifest().text_hashes()) - set(doc_ids))
+        if gone:
+            print(f"Removed {remove_chunks(gone)} chunk vector(s) of {len(gone)} deleted document(s).")
+
+    total = ChunkStats()
+    t0 = time.perf_counter()
+    for start in range(0, len(doc_ids), batch_docs):
+        batch = doc_ids[start:start + batch_docs]
+        stats = index_chunks({doc_id: raw_store.read_text(doc_id) for doc_id in batch})
+        total.add(stats)
+        print(f"[{min(start + batch_docs, len(doc_ids))}/{len(doc_ids)}] "
+              f"{stats.chunks} chunks, {stats.encoded} encoded, {stats.reused} reused, "
+              f"{stats.deleted} deleted")
+    elapsed = time.perf_counter() - t0
+
+    rate = total.encoded / total.seconds["encode"] if total.seconds["encode"] else 0.0
+    print(f"\n{total.docs} changed document(s) of {len(doc_ids)}: {total.chunks} chunks "
+          f"({total.encoded} encoded, {total.reused} reused, {total.unchanged} unchanged, "
+          f"{total.deleted} deleted) in {elapsed:.1f}s")
+    print("  " + "  ".join(f"{stage} {secs:.1f}s" for stage, secs in total.seconds.items())
+          + f"  ({rate:.0f} chunks/s encoded)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk raw text and embed the chunks")
+    parser.add_argument("doc_ids", nargs="*", help="Only these documents (default: all processed)")
+    parser.add_argument("--batch-docs", type=int, default=None,
+                        help="Documents per batch (default CHUNK_DOC_BATCH)")
+    args = parser.parse_args()
+    chunk_documents(args.doc_ids or None, args.batch_docs)
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,35 @@
 #!/usr/bin/env python
 # scripts/discover_sources.py
 
+import argparse
 from datetime import datetime
 from pr_agent.settings import settings
 from pr_agent.connectors.gdrive_connector import list_new_items as list_drive_items
 from pr_agent.connectors.notion_connector import list_new_items as list_notion_items
-from pr_agent.core.metadata_manager import DirectoryMetadataStore, next_document_id
+from pr_agent.core.metadata_manager import DirectoryMetadataStore, get_id_allocator
+from pr_agent.core.metrics import metrics
+from pr_agent.core.profiling import profiler, stage
 
 def discover_sources():
     # 1) Open JSON store
     store = DirectoryMetadataStore(settings.METADATA_DIR)
 
     
-    # 2a) Gather existing doc-IDs (for naming new JSONs)
-    seen_doc_ids = store.get_all_ids()
+    # 2a) New doc-IDs come from the allocator: a locked counter, so no scan
+    #     of existing IDs and no clashes with a concurrent discovery
+    allocator = get_id_allocator(settings.METADATA_DIR)
 
     # 2b) Gather existing connector-IDs (so we don’t re-discover the same file/page)
     existing_source_ids = set()
-    for doc_id in seen_doc_ids:
+    for doc_id in store.get_all_ids():
         meta = store.read(doc_id)
         if meta and meta.get("source_id"):
             existing_source_ids.add(meta["source_id"])
 
     # 3) Ask each connector for new items
-    drive_items  = list_drive_items(existing_source_ids, settings.GDRIVE_FOLDER_ID)
+    settings.require("GDRIVE_CRED_FILE", "GDRIVE_FOLDER_ID")
+    with stage("discover", source="GoogleDrive"):
+        drive_items  = list_drive_items(existing_source_ids, settings.GDRIVE_FOLDER_ID)
     #notion_items = list_notion_items(existing_source_ids)
 
     new_items = []
@@ -34,12 +40,9 @@ def discover_sources():
         new_items.append(item)
         existing_source_ids.add(item.id)
 
-        # 5) Process only truly new items
-    for item in new_items:
-        doc_id = next_document_id(seen_doc_ids)
-        seen_doc_ids.add(doc_id)
-
-
+    # 5) Process only truly new items, with IDs reserved as one block
+    doc_ids = allocator.reserve(len(new_items)) if new_items else []
+    for item, doc_id in zip(new_items, doc_ids):
         metadata = {
             "source_id":        item.id,
             "Document ID":       doc_id,
@@ -58,13 +61,19 @@ def discover_sources():
         }
 
         store.upsert(doc_id, metadata)
+        metrics.inc("documents_discovered_total", source=item.source_system)
         print(f"Discovered {item.name} → saved metadata as {doc_id}.json")
 
     if not (new_items):
         print("No new items found in any source.")
 
 def main():
-    discover_sources()
+    parser = argparse.ArgumentParser(description="Discover new source documents and write their metadata")
+    parser.add_argument("--profile", action="store_true",
+                        help="Sample stacks of the discovery stage into PROFILE_DIR")
+    args = parser.parse_args()
+    with metrics.run("discover"), profiler.run("discover", enabled=args.profile):
+        discover_sources()
 
 if __name__ == "__main__":
     main()
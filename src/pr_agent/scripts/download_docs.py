@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# scripts/download_docs.py
+
+import hashlib
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+from pr_agent.core.metrics import metrics
+from pr_agent.settings import settings
+
+
+def _field(meta: dict, processed: str, pending: str) -> str:
+    # processed records use lower-case keys, pending ones the original titles
+    return meta.get(processed) or meta.get(pending) or ""
+
+
+def _md5(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def already_present(path: Path, size: Optional[str], md5: Optional[str]) -> bool:
+    """True if `path` exists and matches the size and checksum Drive reports (if it reports any)."""
+    if not path.exists() or not (size or md5):
+        return False
+    if size and path.stat().st_size != int(size):
+        return False
+    return not md5 or _md5(path) == md5
+
+
+def _validator(resp) -> Optional[str]:
+    """The response's strong ETag, else its Last-Modified (what If-Range accepts)."""
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def download_url(url: str, path: Path, on_bytes=None) -> Optional[int]:
+    """
+    Stream `url` to `path` through `<path>.part`, resuming a partial file
+    with a Range request. The ETag / Last-Modified of the response that
+    started the `.part` is kept in `<path>.part.validator` and sent as
+    If-Range, so a file that changed since restarts from scratch instead
+    of being spliced; a `.part` without one is not resumed. Returns the
+    bytes fetched, or None if `path` already has the Content-Length the
+    server announces.
+    """
+    import requests
+
+    part = path.with_name(path.name + ".part")
+    validator_file = path.with_name(path.name + ".part.validator")
+    validator = validator_file.read_text() if validator_file.exists() else None
+    offset = part.stat().st_size if part.exists() and validator else 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+    with requests.get(url, headers=headers, stream=True, timeout=60) as resp:
+        if resp.status_code == 416:
+            # with If-Range the server only answers 416 for an unchanged file
+            part.replace(path)
+            validator_file.unlink(missing_ok=True)
+            return 0
+        resp.raise_for_status()
+        length = resp.headers.get("Content-Length")
+        if resp.status_code == 200 and length and path.exists() and path.stat().st_size == int(length):
+            return None
+        if resp.status_code != 206:
+            # the server ignored the range, or the file changed
+            offset = 0
+            if _validator(resp):
+                validator_file.write_text(_validator(resp))
+            else:
+                validator_file.unlink(missing_ok=True)
+        fetched = 0
+        with open(part, "r+b" if offset else "wb") as out:
+            out.seek(offset)
+            for chunk in resp.iter_content(chunk_size=1 << 20):
+                out.write(chunk)
+                fetched += len(chunk)
+                if on_bytes is not None:
+                    on_bytes(len(chunk))
+    part.replace(path)
+    validator_file.unlink(missing_ok=True)
+    return fetched
+
+
+class Progress:
+    """Aggregate files and throughput over all workers, redrawn once a second on stderr."""
+    def __init__(self, total: int):
+        self.total = total
+        self.counts: Counter = Counter()
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._draw, name="download-progress", daemon=True)
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes += n
+
+    def done(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        finished = sum(self.counts.values())
+        return (f"{finished}/{self.total} files  {self.bytes / 2**20:,.1f} MiB  "
+                f"{self.bytes / 2**20 / elapsed:,.1f} MiB/s")
+
+    def _draw(self):
+        while not self._stop.wait(1.0):
+            sys.stderr.write(f"\r  {self.line()}   ")
+            sys.stderr.flush()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        sys.stderr.write(f"\r  {self.line()}   \n")
+
+
+def download_documents(metas: dict, output_dir: Path, workers: Optional[int] = None) -> dict:
+    """
+    Download the original files of `metas` (doc_id → metadata, read once
+    by the caller) into output_dir, `workers` (DOWNLOAD_WORKERS) at a time.
+    Drive sizes and checksums are looked up in batch requests first, and
+    files already on disk with a matching size / MD5 are skipped; the
+    rest stream to disk in chunks and resume from their `.part` file if a
+    previous run was interrupted. Returns the outcome per doc_id
+    ("downloaded", "skipped" or the error message).
+    """
+    workers = workers or settings.DOWNLOAD_WORKERS
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # one file name per document; documents sharing a name get their doc_id prefixed
+    names = {d: (_field(m, "original_filename", "Original Filename") or d).replace("/", "_")
+             for d, m in metas.items()}
+    taken = Counter(names.values())
+    paths = {d: output_dir / (f"{d}_{n}" if taken[n] > 1 else n) for d, n in names.items()}
+
+    drive_ids = [m["source_id"] for m in metas.values()
+                 if _field(m, "source_system", "Source System") == "GoogleDrive" and m.get("source_id")]
+    drive_files, lookup_errors = {}, {}
+    if drive_ids:
+        from pr_agent.drive_client import get_files
+
+        drive_files, lookup_errors = get_files(drive_ids)
+
+    def _one(doc_id: str) -> str:
+        meta, path = metas[doc_id], paths[doc_id]
+        if _field(meta, "source_system", "Source System") == "GoogleDrive" and meta.get("source_id"):
+            from pr_agent.drive_client import stream_file_to
+
+            file_id = meta["source_id"]
+            if file_id in lookup_errors:
+                raise lookup_errors[file_id]
+            drive_file = drive_files.get(file_id)
+            if drive_file is None or drive_file.get("trashed"):
+                raise FileNotFoundError(f"Drive file {file_id} is gone")
+            if already_present(path, drive_file.get("size"), drive_file.get("md5Checksum")):
+                return "skipped"
+            mime_type = drive_file.get("mimeType") or _field(meta, "mime_type", "MIME Type")
+            stream_file_to(file_id, mime_type, path, on_bytes=progress.add_bytes,
+                           size=drive_file.get("size"), md5=drive_file.get("md5Checksum"))
+            return "downloaded"
+
+        url = _field(meta, "file_url", "File URL")
+        if not url:
+            raise ValueError("no file URL")
+        fetched = download_url(url, path, on_bytes=progress.add_bytes)
+        return "skipped" if fetched is None else "downloaded"
+
+    outcomes = {}
+    with Progress(len(metas)) as progress, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_one, doc_id): doc_id for doc_id in metas}
+        for future in as_completed(futures):
+            doc_id = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = f"{type(e).__name__}: {e}"
+            progress.done(outcome if outcome in ("downloaded", "skipped") else "failed")
+            metrics.inc("downloads_total", outcome=outcome if outcome in ("downloaded", "skipped") else "failed")
+            outcomes[doc_id] = outcome
+    return outcomes
@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# scripts/embed_daemon.py
+
+from pr_agent.core.daemon import serve
+
+
+def main():
+    # Loads the embedding model (and the local index, if configured) once and
+    # serves every internal-process / internal search call until stopped.
+    serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# scripts/export_onnx.py
+
+import argparse
+
+from pr_agent.core.onnx_embedder import export_onnx
+from pr_agent.settings import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the embedding model to ONNX (plus an int8-quantized copy) for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL, help="SentenceTransformer model name")
+    parser.add_argument("--out", default=str(settings.ONNX_MODEL_DIR), help="Output directory (default ONNX_MODEL_DIR)")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    out = export_onnx(args.model, args.out, quantize=not args.no_quantize, opset=args.opset)
+    print(f"Exported {args.model} to {out}")
+    print("Check parity and speed with: python benchmarks/bench_embedding_backends.py")
+
+if __name__ == "__main__":
+    main()
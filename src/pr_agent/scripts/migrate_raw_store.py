@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# scripts/migrate_raw_store.py
+
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from pr_agent.core.raw_store import get_raw_store
+from pr_agent.settings import settings
+
+
+def _mb(n: int) -> float:
+    return n / (1024 * 1024)
+
+
+def _stream_hash(store, doc_id: str) -> str:
+    h = hashlib.sha256()
+    with store.open_reader(doc_id) as r:
+        for chunk in iter(lambda: r.read(1 << 16), ""):
+            h.update(chunk.encode("utf-8"))
+    return h.hexdigest()
+
+
+def migrate_raw_store(delete_legacy: bool = False) -> dict:
+    """
+    Move every legacy RAW_DIR/{doc_id}_raw.json into the content-addressed
+    raw-text store, verify each document reads back identically, and
+    report on-disk savings and read/write throughput.
+    """
+    raw_dir = Path(settings.RAW_DIR)
+    store = get_raw_store()
+    legacy_files = sorted(raw_dir.glob("*_raw.json"))
+    if not legacy_files:
+        print(f"No legacy _raw.json files found in {raw_dir}.")
+        return {}
+
+    before_objects = store.disk_usage()
+    legacy_bytes = 0
+    text_bytes = 0
+    migrated = []
+
+    # 1) Write
+    t0 = time.perf_counter()
+    for path in legacy_files:
+        doc_id = path.name[: -len("_raw.json")]
+        legacy_bytes += path.stat().st_size
+        data = json.loads(path.read_text(encoding="utf-8"))
+        with store.open_writer(doc_id) as w:
+            w.write(data.get("raw_text", ""))
+        text_bytes += w.size
+        migrated.append((doc_id, path, w.digest))
+    write_secs = time.perf_counter() - t0
+
+    # 2) Read back and verify
+    t0 = time.perf_counter()
+    mismatches = [doc_id for doc_id, _, digest in migrated if _stream_hash(store, doc_id) != digest]
+    read_secs = time.perf_counter() - t0
+
+    if delete_legacy and not mismatches:
+        for _, path, _ in migrated:
+            path.unlink()
+
+    stored_bytes = store.disk_usage() - before_objects
+    distinct = len({digest for _, _, digest in migrated})
+    report = {
+        "documents":          len(migrated),
+        "distinct_texts":     distinct,
+        "codec":              store.codec,
+        "legacy_bytes":       legacy_bytes,
+        "stored_bytes":       stored_bytes,
+        "savings_pct":        round(100 * (1 - stored_bytes / legacy_bytes), 1) if legacy_bytes else 0.0,
+        "write_mb_per_s":     round(_mb(text_bytes) / write_secs, 1) if write_secs else None,
+        "read_mb_per_s":      round(_mb(text_bytes) / read_secs, 1) if read_secs else None,
+        "mismatches":         mismatches,
+    }
+
+    print(f"Migrated {report['documents']} documents "
+          f"({report['distinct_texts']} distinct texts, codec={report['codec']})")
+    print(f"  on disk: {_mb(legacy_bytes):.1f} MB → {_mb(stored_bytes):.1f} MB "
+          f"({report['savings_pct']}% saved)")
+    print(f"  write: {report['write_mb_per_s']} MB/s   read: {report['read_mb_per_s']} MB/s")
+    if mismatches:
+        print(f"⚠ {len(mismatches)} document(s) did not read back identically; "
+              "legacy files were kept: " + ", ".join(mismatches))
+    elif delete_legacy:
+        print("  legacy _raw.json files removed")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate legacy _raw.json files into the raw-text store")
+    parser.add_argument("--delete-legacy", action="store_true",
+                        help="remove each _raw.json once every document verified")
+    args = parser.parse_args()
+    migrate_raw_store(delete_legacy=args.delete_legacy)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# scripts/ocr_pending.py
+
+from pr_agent.core.leases import get_lease_manager
+from pr_agent.core.metadata_manager import DirectoryMetadataStore
+from pr_agent.core.metrics import metrics
+from pr_agent.core.profiling import stage
+from pr_agent.core.ocr import ocr_documents
+from pr_agent.scripts.process_pending import (
+    StageFailed, fetch_item, record_failure, refresh_related, summarize_and_index, write_raw_text,
+)
+from pr_agent.settings import settings
+
+
+def ocr_pending():
+    """
+    Pick up every document marked “Needs OCR”, OCR it locally and feed
+    the text back through the normal summarize/embed/index path.
+    Failures are retried on later runs, up to PROCESS_MAX_ATTEMPTS.
+    Documents are OCR'd in batches of OCR_BATCH_SIZE so the process pool
+    always has pages from several documents to chew on. Like
+    internal-process, documents are claimed with leases, so several OCR
+    workers can share the queue.
+    """
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    leases = get_lease_manager()
+
+    pending = []
+    for doc_id in sorted(store.get_all_ids()):
+        meta = store.read(doc_id)
+        if meta and meta.get("Status") == "Needs OCR":
+            pending.append((doc_id, meta))
+
+    if not pending:
+        print("No documents need OCR.")
+        return
+
+    batch_size = settings.OCR_BATCH_SIZE
+    finished = []
+    with leases.heartbeat():
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+
+            # 1) Claim and re-fetch bytes for the whole batch
+            docs, metas = [], {}
+            for doc_id, _ in batch:
+                if not leases.acquire(doc_id):
+                    continue
+                meta = store.read(doc_id)
+                if not meta or meta.get("Status") != "Needs OCR":
+                    leases.release(doc_id)
+                    continue
+                try:
+                    item = fetch_item(meta)
+                except Exception as e:
+                    record_failure(store, doc_id, meta, e)
+                    leases.release(doc_id)
+                    continue
+                if item is None:
+                    record_failure(store, doc_id, meta, StageFailed(f"Cannot fetch bytes from {meta['Source System']}"))
+                    leases.release(doc_id)
+                    continue
+                docs.append((doc_id, item.raw_bytes.getvalue(), item.name))
+                metas[doc_id] = meta
+            if not docs:
+                continue
+
+            # 2) OCR all pages of the batch in parallel
+            print(f"OCR'ing {len(docs)} document(s)…")
+            with stage("ocr"):
+                texts, errors = ocr_documents(docs)
+            for doc_id, error in errors.items():
+                record_failure(store, doc_id, metas[doc_id], StageFailed(f"OCR failed: {type(error).__name__}: {error}"))
+                leases.release(doc_id)
+
+            # 3) Hand the text to the regular pipeline
+            for doc_id, text in texts.items():
+                meta = metas[doc_id]
+                write_raw_text(doc_id, text)
+                if not text:
+                    # retried, then parked as Dead Letter, like any other failed stage
+                    record_failure(store, doc_id, meta, StageFailed("OCR found no text"))
+                else:
+                    try:
+                        if summarize_and_index(store, doc_id, meta, text):
+                            finished.append(doc_id)
+                    except Exception as e:
+                        record_failure(store, doc_id, meta, e)
+                leases.release(doc_id)
+
+    refresh_related(finished)
+    print("All OCR-pending items have been processed.")
+
+def main():
+    with metrics.run("ocr"):
+        ocr_pending()
+
+if __name__ == "__main__":
+    main()
@@ -1,176 +1,423 @@
 #!/usr/bin/env python
 # scripts/process_pending.py
 
-import json
+import argparse
+import multiprocessing
+import random
+import threading
 from datetime import datetime
-import pandas as pd
-from pathlib import Path
+from typing import Iterable, Optional
 
 from pr_agent.core.metadata_manager import DirectoryMetadataStore
-#from pr_agent.core.metadata_manager import load_metadata, mark_row
+from pr_agent.core.checkpoints import DEAD_LETTER, get_checkpoint_store, reached
+from pr_agent.core.leases import get_lease_manager, in_shard, parse_shard
+from pr_agent.core.metrics import metrics
+from pr_agent.core.profiling import profiler, stage
 from pr_agent.core.text_extractor import extract_text
+from pr_agent.core.converter import ConversionError
+from pr_agent.core.raw_store import get_raw_store
 from pr_agent.core.summarizer import extract_summary
-#from pr_agent.core.embedder import generate_embedding, save_embedding
-from pr_agent.core.embedder import generate_embedding
+from pr_agent.core.embedder import generate_embedding, save_embedding
 from pr_agent.core.pinecone_manager import upsert_embedding
+from pr_agent.core.chunker import index_chunks
+from pr_agent.core.dedup import DuplicateMatch, get_dedup_index, minhash_signature
+from pr_agent.core.keyword_index import get_keyword_index
+from pr_agent.core.related import build_related
 from pr_agent.core.json_writer import build_json_payload, write_json_file
-# from pr_agent.settings import METADATA_DIR, EMBEDDINGS_DIR, RAW_DIR
-# from pr_agent.settings import GDRIVE_FOLDER_ID
 
 from pr_agent.settings import settings
 
 
+class StageFailed(Exception):
+    """A document could not get past a pipeline stage; it is retried later."""
+
+
+def fetch_item(meta: dict, drive_file: Optional[dict] = None):
+    """
+    Re-fetch the SourceItem (with raw_bytes) for a metadata record.
+    Drive documents are downloaded by their file ID; `drive_file` is the
+    file's current Drive metadata if the caller already looked it up
+    (see lookup_drive_files), otherwise it is fetched here. Other sources
+    re-invoke the connector.
+    Returns None if the item can no longer be found.
+    """
+    from pr_agent.connectors.gdrive_connector import list_new_items as list_gdrive
+    #from pr_agent.connectors.notion_connector import list_new_items as list_notion
+
+    fname  = meta["Original Filename"]
+    source = meta["Source System"]
+    file_id = meta.get("source_id")
+
+    if source == "GoogleDrive" and file_id:
+        from pr_agent.connectors.base_connector import SourceItem
+        from pr_agent.drive_client import download_file_bytes, get_files
+
+        if drive_file is None:
+            found, errors = get_files([file_id])
+            if file_id in errors:
+                raise errors[file_id]
+            drive_file = found[file_id]
+        if drive_file is None or drive_file.get("trashed"):
+            return None
+        mime_type = drive_file.get("mimeType") or meta.get("MIME Type", "")
+        return SourceItem(
+            id=file_id,
+            name=fname,
+            raw_bytes=download_file_bytes(file_id, mime_type),
+            last_modified=drive_file.get("modifiedTime", ""),
+            source_system="GoogleDrive",
+            url=drive_file.get("webViewLink") or meta.get("File URL"),
+            mime_type=mime_type,
+        )
 
-def process_pending():
-    # # 1) Load sheet
-    # df = load_metadata()
-
-    # 1) Open JSON store
-    store = DirectoryMetadataStore(settings.METADATA_DIR)
-
-    # for idx, row in df.iterrows():
-    #     if row.get("Status", "") != "Pending":
-    #         continue
-
-    for doc_id in store.get_all_ids():
-        meta = store.read(doc_id)
-        if meta.get("Status") != "Pending":
-            continue
-
-        # doc_id   = row["Document ID"]
-        # fname    = row["Original Filename"]
-        # source   = row["Source System"]
-        # drive_id = row.get("Drive File ID", "")
-
-        fname  = meta["Original Filename"]
-        source = meta["Source System"]
-
-
-        print(f"Processing {fname} (Doc ID: {doc_id}, Source: {source})…")
-
-        # 2) Based on source, we need to fetch raw_bytes again. 
-        #    But since discover already pulled bytes into memory, 
-        #    we actually stored NOTHING in the sheet except IDs.
-        #    → So we need to re-invoke the correct connector to get bytes:
-        from pr_agent.connectors.gdrive_connector import list_new_items as list_gdrive
-        #from pr_agent.connectors.notion_connector import list_new_items as list_notion
-
-        existing = set()  # we just want to fetch this single item
-        if source == "GoogleDrive":
-            items = list_gdrive(existing, settings.GDRIVE_FOLDER_ID)
-            #print("DEBUG: Drive connector returned these names:", [it.name for it in items])
-            matches = [it for it in items if it.name == fname]
-
-        else:  # source == "Notion"
-            matches = [it for it in list_notion(existing) if it.name == fname]
-
-        if not matches:
-            # Update the JSON metadata instead of Excel:
-            meta = store.read(doc_id)
-            meta["Status"] = "Error: Cannot fetch bytes"
-            store.upsert(doc_id, meta)
-            print(f"⚠ Unable to re-fetch {fname} from {source}. Skipping.")
-            continue
-
-        item = matches[0]
-
-        # 3) Extract raw text in memory
-        raw_text = extract_text(item)
-
-        # 3.b) Write raw text out as JSON in RAW_DIR
-        raw_path = Path(settings.RAW_DIR)
-        raw_path.mkdir(parents=True, exist_ok=True)
-        raw_json = raw_path / f"{doc_id}_raw.json"
-        with open(raw_json, "w", encoding="utf-8") as rf:
-            json.dump(
-                {"document_id": doc_id, "raw_text": raw_text},
-                rf,
-                ensure_ascii=False,
-                indent=2
+    existing = set()  # we just want to fetch this single item
+    if source == "GoogleDrive":
+        # records from before discovery kept source_id: find it by name
+        items = list_gdrive(existing, settings.GDRIVE_FOLDER_ID)
+        matches = [it for it in items if it.name == fname]
+    else:  # source == "Notion"
+        matches = [it for it in list_notion(existing) if it.name == fname]
+
+    return matches[0] if matches else None
+
+
+def lookup_drive_files(metas: Iterable[Optional[dict]]) -> tuple[dict, dict]:
+    """
+    Current Drive metadata (see drive_client.FILE_FIELDS) of the Drive
+    documents among `metas` (pending or processed records), looked up in
+    Google batch requests. Returns (found, errors): source_id → file, or
+    None if the file is gone; source_id → exception for lookups that
+    failed (fetch_item looks those up again on its own).
+    """
+    from pr_agent.drive_client import get_files
+
+    file_ids = [m["source_id"] for m in metas
+                if m and (m.get("source_system") or m.get("Source System")) == "GoogleDrive" and m.get("source_id")]
+    if not file_ids:
+        return {}, {}
+    return get_files(file_ids)
+
+
+def write_raw_text(doc_id: str, raw_text: str) -> str:
+    """
+    Store raw text in the compressed, content-addressed raw-text store.
+    Returns the content hash.
+    """
+    return get_raw_store().write_text(doc_id, raw_text)
+
+
+def mark_duplicate(store: DirectoryMetadataStore, doc_id: str, meta: dict, match: DuplicateMatch) -> bool:
+    """
+    Record doc_id as a near-duplicate of an already processed document:
+    it gets the canonical summary and embedding reference, and is kept out
+    of the vector, chunk and keyword indexes so copies don't crowd search
+    results. Returns False if the canonical has no summary to reuse.
+    """
+    canonical = store.read(match.canonical) or {}
+    summary = canonical.get("summary") or canonical.get("Summary")
+    if not summary:
+        return False
+    emb_path = canonical.get("embedding_file_path") or canonical.get("Embedding File Path / ID", "")
+    meta.update({
+        "Status":            f"Duplicate of {match.canonical}",
+        "Ingested At":       datetime.utcnow().isoformat() + "Z",
+        "Summary":           summary,
+        "Embedding File Path / ID": emb_path,
+        "Duplicate Of":      match.canonical,
+        "Duplicate Similarity": round(match.similarity, 3),
+    })
+    payload = build_json_payload(meta, summary, emb_path)
+    write_json_file(payload, doc_id, str(settings.METADATA_DIR))
+    return True
+
+
+def summarize_and_index(store: DirectoryMetadataStore, doc_id: str, meta: dict, raw_text: str) -> bool:
+    """
+    Summarize `raw_text`, embed the summary and the raw-text chunks, push
+    them into the vector backend and flip the document to “Processed”.
+    Shared by process_pending and the OCR stage. Returns True if the
+    document got a vector of its own (False for a near-duplicate); the
+    caller passes those to refresh_related() once per pass.
+
+    Picks up after the document's last checkpointed stage: a summary (or
+    the chunk extracts of a long one) and an embedding made by an earlier,
+    interrupted attempt are reused, never requested again.
+    """
+    fname = meta["Original Filename"]
+    checkpoints = get_checkpoint_store()
+    state = checkpoints.load(doc_id)
+    signature = minhash_signature(raw_text) if settings.DEDUP_ENABLED else None
+
+    # 3.c) A near-copy of something already processed ("final v2", "Copy of …")?
+    #      Reuse its summary and vector instead of summarizing again
+    if signature is not None and not reached(state, "summarized"):
+        with stage("dedup"):
+            match = get_dedup_index().find(signature, exclude=doc_id)
+        if match is not None and mark_duplicate(store, doc_id, meta, match):
+            get_dedup_index().add(doc_id, signature, duplicate_of=match.canonical)
+            checkpoints.clear(doc_id)
+            metrics.inc("documents_total", outcome="duplicate")
+            print(f"{fname} is a near-duplicate of {match.canonical} "
+                  f"(similarity {match.similarity:.2f}); reused its summary.")
+            return False
+
+    # 4) Summarize (using summarizer.py)
+    if reached(state, "summarized"):
+        summary = state["summary"]
+        print(f"Resuming {doc_id} after “{state['stage']}”; reusing its summary.")
+    else:
+        with stage("summarize"):
+            summary = extract_summary(
+                raw_text, state.get("partial_summaries"),
+                on_extract=lambda parts: checkpoints.update(doc_id, partial_summaries=parts),
             )
-        print(f"Wrote raw text JSON to {raw_json}")
-
-        if not raw_text:
-            #mark_row(df, idx, {"Status": "Needs OCR"})
-            meta["Status"] = "Needs OCR"
-            store.upsert(doc_id, meta)
-
-            continue
-
-        # 4) Summarize (using summarizer.py)
-        summary = extract_summary(raw_text)
-
-        # 5) Generate embedding over the summary (not raw text)
-        vector   = generate_embedding(summary)
-        #emb_path = save_embedding(vector, doc_id, str(settings.EMBEDDINGS_DIR))
-        ingest_ts = datetime.utcnow().isoformat() + "Z"
-        emb_path = f"PineconeIndex<{settings.PINECONE_INDEX}>/{doc_id}"
-        # Push into Pinecone
-        # upsert_embedding(
-        #     doc_id=doc_id,
-        #     vector=vector,
-        #     metadata={
-        #     "source": source,
-        #     "original_filename": fname,
-        #     #"ingested_at": ingest_ts
-        #     }
-        # )
-        #emb_path = f"PineconeIndex<{settings.PINECONE_INDEX}>/{doc_id}"
-
-        # # 6) Flip status → “Processed” and set “Ingested At”
-        # ingest_ts = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-        # mark_row(df, idx, {"Status": "Processed", "Ingested At": ingest_ts})
-
-        # 6) Flip status → “Processed” and set “Ingested At”
-        #ingest_ts = datetime.utcnow().isoformat() + "Z"
+        if not (summary or "").strip():
+            # nothing to embed; retried like any failed stage, then dead-lettered
+            raise StageFailed("Summarizer returned an empty summary")
+        state = checkpoint(store, doc_id, meta, "summarized", summary=summary, partial_summaries=None)
+
+    # 5) Generate embedding over the summary (not raw text) and push it
+    #    into the vector backend (Pinecone or local)
+    if reached(state, "embedded"):
+        emb_path = state["embedding_ref"]
         meta.update({
-            "Status":            "Processed",
-            "Ingested At":       ingest_ts,
+            "Ingested At":       state["ingested_at"],
             "Summary":           summary,
             "Embedding File Path / ID": emb_path
         })
+    else:
+        with stage("embed"):
+            vector   = generate_embedding(summary)
+            # keep a local copy in the corpus matrix for bulk similarity work
+            local_ref = save_embedding(vector, doc_id, str(settings.EMBEDDINGS_DIR))
+            if settings.VECTOR_BACKEND == "local":
+                emb_path = local_ref
+            else:
+                emb_path = f"PineconeIndex<{settings.PINECONE_INDEX}>/{doc_id}"
+            meta.update({
+                "Ingested At":       datetime.utcnow().isoformat() + "Z",
+                "Summary":           summary,
+                "Embedding File Path / ID": emb_path
+            })
+            upsert_embedding(
+                doc_id=doc_id,
+                vector=vector,
+                metadata={**meta, "Status": "Processed"}
+            )
+        state = checkpoint(store, doc_id, meta, "embedded",
+                           embedding_ref=emb_path, ingested_at=meta["Ingested At"])
+
+    # 6) Embed the raw text itself, chunk by chunk, so search can find
+    #    passages the summary left out; index its words for keyword / hybrid
+    #    search; let later near-copies be matched against it. All three are
+    #    idempotent, so an interrupted attempt simply redoes them.
+    if not reached(state, "indexed"):
+        with stage("index"):
+            chunks = index_chunks({doc_id: raw_text})
+            print(f"Indexed {chunks.chunks} chunks for {doc_id} ({chunks.encoded} encoded).")
+            get_keyword_index().update({doc_id: raw_text})
+            if signature is not None:
+                get_dedup_index().add(doc_id, signature)
+        checkpoint(store, doc_id, meta, "indexed")
+
+    # 7) Flip status → “Processed”: build the JSON payload and write it to disk
+    meta["Status"] = "Processed"
+    payload = build_json_payload(meta, summary, emb_path)
+    write_json_file(payload, doc_id, str(settings.METADATA_DIR))
+    checkpoints.clear(doc_id)
+
+    metrics.inc("documents_total", outcome="processed")
+    print(f"Processed {fname}. Metadata JSON updated.")
+    return True
+
+
+def refresh_related(doc_ids: list[str]):
+    """
+    Bring related-document lists up to date for the documents a pass
+    finished: theirs, plus any they now belong in. One build per pass,
+    since each build reads the whole embedding matrix.
+    """
+    if not doc_ids:
+        return
+    try:
+        with stage("related"):
+            stats = build_related(doc_ids=doc_ids)
+        print(f"Refreshed related documents for {len(doc_ids)} document(s) "
+              f"({stats.recomputed} recomputed, {stats.updated} updated).")
+    except Exception as e:
+        # the documents are done; `internal build-related` catches the lists up
+        print(f"⚠ Could not refresh related documents: {e}")
+
+
+def checkpoint(store: DirectoryMetadataStore, doc_id: str, meta: dict, stage: str, **artifacts) -> dict:
+    """Record a completed stage in doc_id's checkpoint, and as its “Stage”."""
+    state = get_checkpoint_store().advance(doc_id, stage, **artifacts)
+    meta["Stage"] = stage
+    store.upsert(doc_id, meta)
+    return state
+
+
+def record_failure(store: DirectoryMetadataStore, doc_id: str, meta: dict, error: Exception) -> bool:
+    """
+    Count a failed attempt at doc_id. It keeps its status and checkpoint,
+    so the next run retries it from the stage that failed, until
+    PROCESS_MAX_ATTEMPTS failures park it as “Dead Letter” (`internal
+    requeue` puts it back). Returns True if it was parked.
+    """
+    message = str(error) if isinstance(error, StageFailed) else f"{type(error).__name__}: {error}"
+    attempts = get_checkpoint_store().record_failure(doc_id, message)
+    meta["Attempts"] = attempts
+    meta["Last Error"] = message
+    parked = attempts >= settings.PROCESS_MAX_ATTEMPTS
+    metrics.inc("documents_total", outcome="dead_letter" if parked else "failed")
+    if parked:
+        meta["Dead Letter From"] = meta.get("Status")
+        meta["Status"] = DEAD_LETTER
+        print(f"⚠ {meta.get('Original Filename', doc_id)} failed {attempts} times ({message}); "
+              f"parked as {DEAD_LETTER}.")
+    else:
+        print(f"⚠ {meta.get('Original Filename', doc_id)} failed ({message}); "
+              f"attempt {attempts} of {settings.PROCESS_MAX_ATTEMPTS}, will retry.")
+    store.upsert(doc_id, meta)
+    return parked
+
+
+def process_document(store: DirectoryMetadataStore, doc_id: str, meta: dict,
+                     drive_file: Optional[dict] = None) -> bool:
+    """
+    Take one Pending document through fetch → extract → summarize → embed
+    → index, starting after its last checkpointed stage. Raises on failure.
+    `drive_file` is passed on to fetch_item. Returns True if the document
+    was processed with a vector of its own (see summarize_and_index).
+    """
+    checkpoints = get_checkpoint_store()
+    state = checkpoints.load(doc_id)
+    source = meta["Source System"]
+
+    # 2) Re-fetch the raw bytes from the source connector
+    item = checkpoints.load_source(doc_id) if reached(state, "fetched") else None
+    if not reached(state, "extracted") and item is None:
+        with stage("fetch"):
+            item = fetch_item(meta, drive_file)
+        if item is None:
+            raise StageFailed(f"Cannot fetch bytes from {source}")
+        state = checkpoints.save_source(doc_id, item)
+
+    # 3) Extract raw text and store it in RAW_DIR
+    if reached(state, "extracted"):
+        raw_text = get_raw_store().read_text(doc_id)
+    else:
+        try:
+            with stage("extract"):
+                raw_text = extract_text(item)
+        except ConversionError as e:
+            meta["Conversion Error"] = str(e)
+            raise StageFailed(f"Conversion failed: {e}") from e
+        raw_hash = write_raw_text(doc_id, raw_text)
+        print(f"Stored raw text for {doc_id} (sha256 {raw_hash[:12]})")
+        checkpoint(store, doc_id, meta, "extracted", raw_hash=raw_hash)
+
+    if not raw_text:
+        # picked up later by `internal-ocr`
+        meta["Status"] = "Needs OCR"
         store.upsert(doc_id, meta)
+        metrics.inc("documents_total", outcome="needs_ocr")
+        return False
+
+    # 4–7) Summarize, embed, index
+    return summarize_and_index(store, doc_id, meta, raw_text)
+
+
+def process_pending(shard: Optional[tuple[int, int]] = None, stop: Optional[threading.Event] = None):
+    """
+    Process every Pending document (of `shard`, if given). Each document
+    is claimed with a lease first, so any number of workers, on this
+    machine or others sharing the store, can run at once: each skips what
+    another holds, and takes over a document whose worker died once its
+    lease expires. Workers walk the queue in different orders so they
+    rarely contend for the same document. Once `stop` is set, the document
+    in hand is finished and the rest are left for the next run.
+    Drive files are looked up DRIVE_BATCH_SIZE documents ahead, in one
+    batch request, instead of one request per document.
+    """
+    # 1) Open JSON store
+    store = DirectoryMetadataStore(settings.METADATA_DIR)
+    leases = get_lease_manager()
+
+    doc_ids = [d for d in store.get_all_ids() if in_shard(d, shard)]
+    random.Random(leases.owner).shuffle(doc_ids)
+    drive_files: dict = {}
+    looked_up = 0       # doc_ids[:looked_up] have had their Drive lookup
+    finished = []
+    with leases.heartbeat():
+        for n, doc_id in enumerate(doc_ids):
+            if stop is not None and stop.is_set():
+                print("Stopped; the remaining documents stay Pending.")
+                break
+            meta = store.read(doc_id)
+            if not meta or meta.get("Status") != "Pending":
+                continue
+            if meta.get("Source System") == "GoogleDrive" and n >= looked_up:
+                looked_up = n + settings.DRIVE_BATCH_SIZE
+                try:
+                    pending = (store.read(d) for d in doc_ids[n:looked_up])
+                    drive_files, _ = lookup_drive_files(m for m in pending if m and m.get("Status") == "Pending")
+                except Exception as e:
+                    # fetch_item looks each file up on its own instead
+                    print(f"⚠ Drive batch lookup failed: {type(e).__name__}: {e}")
+                    drive_files = {}
+            with leases.claim(doc_id) as claimed:
+                # re-read under the lease: another worker may have finished it meanwhile
+                meta = store.read(doc_id) if claimed else None
+                if not meta or meta.get("Status") != "Pending":
+                    continue
+
+                print(f"Processing {meta['Original Filename']} (Doc ID: {doc_id}, Source: {meta['Source System']})…")
+                try:
+                    with metrics.timer("document_seconds"), \
+                            profiler.document(doc_id, file=meta["Original Filename"], source=meta["Source System"]):
+                        if process_document(store, doc_id, meta, drive_files.get(meta.get("source_id"))):
+                            finished.append(doc_id)
+                except Exception as e:
+                    record_failure(store, doc_id, meta, e)
+        else:
+            print("All pending items have been processed.")
+
+    # 8) Related-document lists for everything this pass finished, in one build
+    refresh_related(finished)
+
+
+def _worker(shard: Optional[tuple[int, int]], index: int, profile: bool = False):
+    # one run report (and profile) per worker
+    with metrics.run(f"process-{index}"), profiler.run(f"process-{index}", enabled=profile):
+        process_pending(shard)
 
-        upsert_embedding(
-            doc_id=doc_id,
-            vector=vector,
-            metadata=meta
-        )
-
-        # 10) Build JSON payload
-        #     Coerce any NaN → "" first
-        # def safe(val):
-        #     return "" if pd.isna(val) else str(val)
-
-        # metadata_row = {col: safe(row[col]) for col in df.columns}
-
-        payload = build_json_payload(meta, summary, emb_path)
-
-        # payload = build_json_payload(
-        #     metadata_row,
-        #     summary=summary,
-        #     embedding_path=emb_path
-        # )
-
-        # 11) Write JSON to disk
-        write_json_file(payload, doc_id, str(settings.METADATA_DIR))
-
-
-        # 12) Update sheet with NLP fields
-        # updates = {
-        #     "Summary":                 summary,
-        #     "Embedding File Path / ID":emb_path
-        # }
-        # mark_row(df, idx, updates)
-        # print(f"Processed {fname}. JSON & sheet updated.")
-
-        print(f"Processed {fname}. Metadata JSON updated.")
-
-
-    print("All pending items have been processed.")
 
 def main():
-    process_pending()
+    parser = argparse.ArgumentParser(description="Summarize, embed and index Pending documents")
+    parser.add_argument("--shard", default=None, metavar="I/N",
+                        help="Only documents of shard I of N (0-based), e.g. one shard per machine")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes to run (they claim documents from each other's queue)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Sample per-stage stacks and per-document time/memory into PROFILE_DIR")
+    args = parser.parse_args()
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.workers <= 1:
+        with metrics.run("process"), profiler.run("process", enabled=args.profile):
+            process_pending(shard)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_worker, args=(shard, i, args.profile), name=f"internal-process-{i}")
+               for i in range(args.workers)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
 
 if __name__ == "__main__":
     main()
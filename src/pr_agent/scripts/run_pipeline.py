@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# scripts/run_pipeline.py
+
+import os
+import signal
+import threading
+import time
+from typing import Optional
+
+from pr_agent.core.metrics import metrics
+from pr_agent.scripts.discover_sources import discover_sources
+from pr_agent.scripts.process_pending import process_pending
+from pr_agent.settings import settings
+
+
+def warm_up():
+    """
+    Build the clients and load the embedding model before the first pass.
+    They stay resident afterwards (module singletons), so later passes
+    start warm. Failures are only reported: the pass that needs the
+    client raises the real error.
+    """
+    from pr_agent.core.embedder import generate_embeddings
+    from pr_agent.core.summarizer import _get_agent
+    from pr_agent.core.vector_backends import get_vector_backend
+    from pr_agent.drive_client import get_drive_service
+
+    for name, load in (("Drive client", get_drive_service), ("Gemini agent", _get_agent),
+                       ("vector backend", get_vector_backend),
+                       ("embedding model", lambda: generate_embeddings(["warm-up"]))):
+        try:
+            load()
+        except Exception as e:
+            print(f"⚠ Could not load the {name}: {type(e).__name__}: {e}")
+
+
+def run_pass(stop: threading.Event, shard: Optional[tuple[int, int]] = None):
+    """Discover new documents, then work through the Pending queue."""
+    with metrics.run("run"):
+        for step, call in (("Discovery", discover_sources),
+                           ("Processing", lambda: process_pending(shard, stop))):
+            if stop.is_set():
+                return
+            try:
+                call()
+            except Exception as e:
+                # a Drive or Notion outage must not end a watcher; the next pass retries
+                print(f"⚠ {step} failed: {type(e).__name__}: {e}")
+
+
+def run(watch: bool = False, interval: Optional[float] = None, shard: Optional[tuple[int, int]] = None):
+    """
+    One discover + process pass, or with `watch` one every `interval`
+    seconds (WATCH_INTERVAL) in this process, so clients and models are
+    loaded once. SIGTERM / Ctrl-C finishes the document in hand, releases
+    its lease and exits; a second signal exits at once (checkpoints and
+    lease expiry make that safe too).
+    """
+    interval = settings.WATCH_INTERVAL if interval is None else interval
+    stop = threading.Event()
+
+    def _stop(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        print(f"Received {signal.Signals(signum).name}; finishing the current document…")
+        stop.set()
+
+    previous = {sig: signal.signal(sig, _stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        if watch:
+            warm_up()
+            print(f"Watching for new documents every {interval:g}s (pid {os.getpid()}; Ctrl-C or SIGTERM stops it)…")
+        while not stop.is_set():
+            started = time.monotonic()
+            run_pass(stop, shard)
+            if not watch:
+                break
+            stop.wait(max(interval - (time.monotonic() - started), 0))
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    if watch:
+        print("Watcher stopped.")
@@ -1,6 +1,7 @@
 # pr_agent/settings.py
 import os
-from typing import ClassVar
+import tempfile
+from typing import ClassVar, Optional
 from pathlib import Path
 from pydantic_settings import BaseSettings
 from pydantic import Field
@@ -13,15 +14,60 @@ class Settings(BaseSettings):
         default=BASE_DIR / "internal-processed-docs" / "metadata",
         description="Where per-doc metadata JSONs live",
     )
+
+    ID_ALLOCATOR: str = Field(
+        "file", env="ID_ALLOCATOR",
+        description="Where new document ids come from: 'file' (fcntl-locked counter) or 'sqlite' (a sequence table)",
+    )
     
     RAW_DIR: Path = Field(
         default=BASE_DIR / "internal-processed-docs" / "raw",
-        description="Where raw text JSONs are written",
+        description="Root of the content-addressed raw-text store",
+    )
+
+    RAW_COMPRESSION: str = Field(
+        "zstd", env="RAW_COMPRESSION",
+        description="Codec for the raw-text store: 'zstd' (falls back to gzip if unavailable) or 'gzip'",
     )
 
     EMBEDDINGS_DIR: Path = Field(
         default=BASE_DIR / "internal-processed-docs" / "embeddings",
-        description="Where .npy embeddings are stored",
+        description="Where the memory-mapped embedding store lives",
+    )
+
+    EMBEDDING_DTYPE: str = Field(
+        "float32", env="EMBEDDING_DTYPE",
+        description="On-disk dtype of the embedding store: 'float32', 'float16' or 'int8' (per-vector scale)",
+    )
+
+    EMBEDDING_KEEP_FULL: bool = Field(
+        True, env="EMBEDDING_KEEP_FULL",
+        description="Quantized stores: keep a float32 copy on disk to rescore search candidates",
+    )
+
+    EMBEDDING_BACKEND: str = Field(
+        "torch", env="EMBEDDING_BACKEND",
+        description="Embedding model runtime: 'torch' (SentenceTransformer) or 'onnx' (ONNX Runtime, no torch)",
+    )
+
+    ONNX_MODEL_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "models" / "onnx",
+        description="Where internal-export-onnx writes, and the onnx backend loads, the model",
+    )
+
+    ONNX_QUANTIZED: bool = Field(
+        True, env="ONNX_QUANTIZED",
+        description="Use the dynamically int8-quantized ONNX model (False: the float32 export)",
+    )
+
+    ONNX_THREADS: int = Field(
+        0, env="ONNX_THREADS",
+        description="ONNX Runtime intra-op threads (0 = one per physical core)",
+    )
+
+    EMBEDDING_COMPACT_RATIO: float = Field(
+        0.25, env="EMBEDDING_COMPACT_RATIO",
+        description="Compact the embedding store once this fraction of rows are tombstones",
     )
 
     # ─── Download directory ────────────────────────────────────────────────
@@ -30,35 +76,55 @@ class Settings(BaseSettings):
         env="DOWNLOAD_DIR",
         description="Default directory where downloaded files are saved"
     )
+    DOWNLOAD_WORKERS: int = Field(
+        8, env="DOWNLOAD_WORKERS",
+        description="Files `internal download` fetches at once"
+    )
+    DOWNLOAD_CHUNK_MB: float = Field(
+        8.0, env="DOWNLOAD_CHUNK_MB",
+        description="Bytes per ranged request when streaming a download to disk"
+    )
 
     # ─── Google Drive settings ──────────────────────────────────────────────
-    GDRIVE_CRED_FILE: Path = Field(
-        ...,
+    GDRIVE_CRED_FILE: Optional[Path] = Field(
+        None,
         description="Path to your Google service-account JSON",
     )
-    GDRIVE_FOLDER_ID: str = Field(
-        ...,
+    GDRIVE_FOLDER_ID: Optional[str] = Field(
+        None,
         description="Root folder ID in Google Drive to crawl",
     )
+    DRIVE_BATCH_SIZE: int = Field(
+        100, env="DRIVE_BATCH_SIZE",
+        description="Metadata calls per Google batch request (Drive allows at most 100)"
+    )
+    DRIVE_BATCH_RETRIES: int = Field(
+        3, env="DRIVE_BATCH_RETRIES",
+        description="Times a call in a batch is retried after a rate limit or 5xx"
+    )
+    DRIVE_BATCH_BACKOFF: float = Field(
+        1.0, env="DRIVE_BATCH_BACKOFF",
+        description="Seconds before the first batch retry; doubles on each further one"
+    )
 
     # ─── Notion settings ────────────────────────────────────────────────────
-    NOTION_TOKEN: str = Field(
-        ...,
+    NOTION_TOKEN: Optional[str] = Field(
+        None,
         description="Integration token for your Notion workspace",
     )
-    NOTION_ROOT_PAGE_ID: str = Field(
-        ...,
+    NOTION_ROOT_PAGE_ID: Optional[str] = Field(
+        None,
         description="Root page ID in Notion to crawl",
     )
 
     # ─── Pinecone settings ────────────────────────────────────────────────────
-    PINECONE_API_KEY: str = Field(
-        ..., env="PINECONE_API_KEY",
-        description="Your Pinecone API key"
+    PINECONE_API_KEY: Optional[str] = Field(
+        None, env="PINECONE_API_KEY",
+        description="Your Pinecone API key (required when VECTOR_BACKEND=pinecone)"
     )
 
-    PINECONE_ENV: str = Field(
-        ..., env="PINECONE_ENV",
+    PINECONE_ENV: Optional[str] = Field(
+        None, env="PINECONE_ENV",
         description="Your Pinecone environment"
     )
 
@@ -67,9 +133,232 @@ class Settings(BaseSettings):
         description="Name of your Pinecone index"
     )
 
+    # ─── Vector backend ──────────────────────────────────────────────────────
+    VECTOR_BACKEND: str = Field(
+        "pinecone", env="VECTOR_BACKEND",
+        description="Where vectors are upserted and queried: 'pinecone' or 'local'"
+    )
+    LOCAL_INDEX_TYPE: str = Field(
+        "ivf", env="LOCAL_INDEX_TYPE",
+        description="Local backend search: 'exact' or 'ivf' (approximate, for large corpora)"
+    )
+    IVF_MIN_ROWS: int = Field(
+        20000, env="IVF_MIN_ROWS",
+        description="Below this many vectors the local backend always searches exactly"
+    )
+    IVF_NPROBE: int = Field(
+        16, env="IVF_NPROBE",
+        description="IVF lists scanned per query (higher = better recall, slower)"
+    )
+    IVF_REBUILD_RATIO: float = Field(
+        0.1, env="IVF_REBUILD_RATIO",
+        description="Rebuild the IVF index once rows added since the last build exceed this fraction"
+    )
+
+    # ─── Search ──────────────────────────────────────────────────────────────
+    SEARCH_CACHE_SIZE: int = Field(
+        1024, env="SEARCH_CACHE_SIZE",
+        description="Query embeddings kept in the in-process LRU cache"
+    )
+    SEARCH_CONCURRENCY: int = Field(
+        8, env="SEARCH_CONCURRENCY",
+        description="Vector queries issued in parallel by search_many()"
+    )
+    SEARCH_RESCORE_FACTOR: int = Field(
+        4, env="SEARCH_RESCORE_FACTOR",
+        description="Quantized local search: candidates per result re-ranked at full precision"
+    )
+
+    # ─── Near-duplicate detection (MinHash / LSH) ────────────────────────────
+    DEDUP_ENABLED: bool = Field(
+        True, env="DEDUP_ENABLED",
+        description="Skip summarization for near-copies of processed documents and reuse theirs"
+    )
+    DEDUP_THRESHOLD: float = Field(
+        0.85, env="DEDUP_THRESHOLD",
+        description="Estimated Jaccard similarity of 5-word shingles at which a document is a duplicate"
+    )
+    DEDUP_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "dedup",
+        description="Where MinHash signatures and the LSH band index live",
+    )
+
+    # ─── Keyword search (internal build-keyword-index) ───────────────────────
+    KEYWORD_INDEX_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "keyword-index",
+        description="Where the BM25 inverted index over raw text lives",
+    )
+    KEYWORD_DOC_BATCH: int = Field(
+        2000, env="KEYWORD_DOC_BATCH",
+        description="Documents tokenized per index transaction"
+    )
+    KEYWORD_PHRASE_CHECK: int = Field(
+        200, env="KEYWORD_PHRASE_CHECK",
+        description="Phrase queries: best-scoring candidates checked against the raw text"
+    )
+    BM25_K1: float = Field(
+        1.2, env="BM25_K1",
+        description="BM25 term-frequency saturation"
+    )
+    BM25_B: float = Field(
+        0.75, env="BM25_B",
+        description="BM25 document-length normalisation (0 = none, 1 = full)"
+    )
+    HYBRID_CANDIDATES: int = Field(
+        50, env="HYBRID_CANDIDATES",
+        description="Hybrid search: results taken from each of BM25 and vector search before fusion"
+    )
+    RRF_K: int = Field(
+        60, env="RRF_K",
+        description="Reciprocal rank fusion constant: score = Σ 1 / (RRF_K + rank)"
+    )
+
+    # ─── Chunk embeddings (internal-chunk) ───────────────────────────────────
+    CHUNK_TOKENS: int = Field(
+        160, env="CHUNK_TOKENS",
+        description="Words per chunk window (≈1.3 model tokens each; MiniLM truncates at 256)"
+    )
+    CHUNK_OVERLAP: int = Field(
+        32, env="CHUNK_OVERLAP",
+        description="Words shared by consecutive chunk windows"
+    )
+    CHUNK_BATCH_SIZE: int = Field(
+        128, env="CHUNK_BATCH_SIZE",
+        description="Chunks per model call when encoding"
+    )
+    CHUNK_DOC_BATCH: int = Field(
+        64, env="CHUNK_DOC_BATCH",
+        description="Documents chunked and encoded together by internal-chunk"
+    )
+
+    # ─── Related documents (internal build-related) ──────────────────────────
+    RELATED_TOP_K: int = Field(
+        10, env="RELATED_TOP_K",
+        description="Neighbours kept per document in its related list"
+    )
+    RELATED_QUERY_BLOCK: int = Field(
+        256, env="RELATED_QUERY_BLOCK",
+        description="Documents scored per matrix multiply (memory ≈ 65536 × this × 4 bytes)"
+    )
+
+    # ─── Resumable processing (internal-process) ─────────────────────────────
+    CHECKPOINT_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "checkpoints",
+        description="Per-document stage checkpoints of documents still being processed",
+    )
+    PROCESS_MAX_ATTEMPTS: int = Field(
+        3, env="PROCESS_MAX_ATTEMPTS",
+        description="Failed attempts after which a document is parked as “Dead Letter”"
+    )
+    LEASE_BACKEND: str = Field(
+        "directory", env="LEASE_BACKEND",
+        description="How workers claim documents: 'directory' (lease files) or 'sqlite' (one table)"
+    )
+    LEASE_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "leases",
+        description="Lease files (or leases.sqlite) shared by every worker on this metadata store",
+    )
+    LEASE_TTL: float = Field(
+        300.0, env="LEASE_TTL",
+        description="Seconds a claim lasts without a heartbeat before another worker may take it over"
+    )
+
+    # ─── Watch mode (internal run --watch) ───────────────────────────────────
+    WATCH_INTERVAL: float = Field(
+        300.0, env="WATCH_INTERVAL",
+        description="Seconds from the start of one discover + process pass to the next"
+    )
+
+    # ─── HTTP cache (Drive / Notion responses) ───────────────────────────────
+    HTTP_CACHE_ENABLED: bool = Field(
+        True, env="HTTP_CACHE_ENABLED",
+        description="Keep Drive listings and Notion blocks/files on disk and revalidate instead of re-downloading"
+    )
+    HTTP_CACHE_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "http-cache",
+        env="HTTP_CACHE_DIR",
+        description="Where cached API responses and their ETags / validators are kept"
+    )
+    HTTP_CACHE_MAX_MB: float = Field(
+        256.0, env="HTTP_CACHE_MAX_MB",
+        description="Size bound of the HTTP cache; least recently used responses are evicted past it"
+    )
+
+    # ─── Run metrics ─────────────────────────────────────────────────────────
+    METRICS_ENABLED: bool = Field(
+        True, env="METRICS_ENABLED",
+        description="Count API calls, bytes, tokens and stage latencies, and write a report per run"
+    )
+    METRICS_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "metrics",
+        description="Where each command's latest JSON run report (<command>.json) is written",
+    )
+    METRICS_TEXTFILE_DIR: Optional[Path] = Field(
+        None, env="METRICS_TEXTFILE_DIR",
+        description="node_exporter textfile collector directory; internal_<command>.prom is written there"
+    )
+
+    # ─── Profiling (--profile) ───────────────────────────────────────────────
+    PROFILE_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "profiles",
+        description="Where --profile writes <command>-<timestamp>/ (collapsed stacks + documents.json)",
+    )
+    PROFILE_INTERVAL: float = Field(
+        0.005, env="PROFILE_INTERVAL",
+        description="Seconds between stack samples under --profile"
+    )
+    PROFILE_MEMORY: bool = Field(
+        True, env="PROFILE_MEMORY",
+        description="Track each document's peak memory with tracemalloc under --profile"
+    )
+    PROFILE_TOP: int = Field(
+        10, env="PROFILE_TOP",
+        description="How many of the slowest documents --profile prints"
+    )
+
+    # ─── Columnar export (internal export) ───────────────────────────────────
+    EXPORT_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "export",
+        description="Where `internal export` writes its Parquet / Arrow parts",
+    )
+    EXPORT_BATCH_ROWS: int = Field(
+        1000, env="EXPORT_BATCH_ROWS",
+        description="Documents per Parquet row group / Arrow record batch"
+    )
+    EXPORT_COMPACT_RATIO: float = Field(
+        0.5, env="EXPORT_COMPACT_RATIO",
+        description="Rewrite the export into one part once this fraction of its rows are stale"
+    )
+
+    # ─── Embedding daemon (internal-daemon) ──────────────────────────────────
+    DAEMON_ENABLED: bool = Field(
+        True, env="DAEMON_ENABLED",
+        description="Let commands use a running embedding daemon instead of loading the model"
+    )
+    DAEMON_SOCKET: Path = Field(
+        default=Path(tempfile.gettempdir()) / f"pr-agent-{os.getuid()}.sock",
+        description="Unix socket the embedding daemon listens on",
+    )
+    DAEMON_MAX_BATCH: int = Field(
+        128, env="DAEMON_MAX_BATCH",
+        description="Most texts the daemon encodes in one model call"
+    )
+    DAEMON_MAX_WAIT_MS: float = Field(
+        5.0, env="DAEMON_MAX_WAIT_MS",
+        description="How long the daemon waits to fill a micro-batch"
+    )
+    DAEMON_CONNECT_TIMEOUT: float = Field(
+        0.5, env="DAEMON_CONNECT_TIMEOUT",
+        description="Seconds to wait for the daemon before falling back to in-process loading"
+    )
+    DAEMON_REQUEST_TIMEOUT: float = Field(
+        120.0, env="DAEMON_REQUEST_TIMEOUT",
+        description="Seconds to wait for a daemon reply"
+    )
+
 # ─── Gemini (Google Generative AI) settings ─────────────────────────────
-    GEMINI_API_KEY: str = Field(
-        ..., env="GEMINI_API_KEY",
+    GEMINI_API_KEY: Optional[str] = Field(
+        None, env="GEMINI_API_KEY",
         description="Your Google Generative AI API key for Gemini models"
     )
     GEMINI_MODEL:   str = Field(
@@ -77,6 +366,38 @@ class Settings(BaseSettings):
         description="Name of the Gemini model to use"
     )
 
+    # ─── Legacy-format conversion (pandoc) ────────────────────────────────────
+    PANDOC_WORKERS: int = Field(
+        2, env="PANDOC_WORKERS",
+        description="Number of resident `pandoc server` workers for .doc/.rtf/.odt/.html"
+    )
+    PANDOC_TIMEOUT: float = Field(
+        30.0, env="PANDOC_TIMEOUT",
+        description="Per-document conversion timeout in seconds"
+    )
+
+    # ─── OCR (internal-ocr) ──────────────────────────────────────────────────
+    OCR_CACHE_DIR: Path = Field(
+        default=BASE_DIR / "internal-processed-docs" / "ocr-cache",
+        description="Where per-page OCR results are cached, keyed by page hash",
+    )
+    OCR_WORKERS: int = Field(
+        0, env="OCR_WORKERS",
+        description="OCR worker processes (0 = one per CPU core)"
+    )
+    OCR_BATCH_SIZE: int = Field(
+        16, env="OCR_BATCH_SIZE",
+        description="Documents fetched and OCR'd together per batch"
+    )
+    OCR_DPI: int = Field(
+        300, env="OCR_DPI",
+        description="Resolution used when rendering PDF pages for OCR"
+    )
+    OCR_LANG: str = Field(
+        "eng", env="OCR_LANG",
+        description="Tesseract language(s), e.g. 'eng' or 'eng+deu'"
+    )
+
     # ─── General settings ────────────────────────────────────────────────────
     GDRIVE_SCOPES: ClassVar[list[str]] = ["https://www.googleapis.com/auth/drive.readonly"]
     EMBEDDING_MODEL: ClassVar[list[str]] = "all-MiniLM-L6-v2"
@@ -87,6 +408,16 @@ class Settings(BaseSettings):
     TOP_TOPIC_COUNT: ClassVar[list[str]] = 3
 
 
+    def require(self, *names: str):
+        """
+        Fail with a clear message when credentials a command needs are not
+        configured. Credentials are checked where they are used, not at
+        import, so metadata-only commands run without them.
+        """
+        missing = [n for n in names if not getattr(self, n)]
+        if missing:
+            raise RuntimeError(f"Missing required setting(s): {', '.join(missing)} (set them in .env)")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"